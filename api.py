@@ -0,0 +1,309 @@
+"""MBTI Matchplay - JSON HTTP API over the game engine.
+
+Lets mobile and bot clients play without Streamlit. Games are kept in
+memory and expire after GAME_IDLE_TTL seconds without requests (checked
+at most every GAME_PURGE_INTERVAL seconds), which also cancels their AI
+work.
+
+Endpoints:
+    POST   /games                  {"mbti"?: "INFP"}      -> new game
+    GET    /games/<id>                                     -> game state
+    POST   /games/<id>/answer      {"option": 0}           -> grade and reply
+                                   {"text": "..."}         (free-text answer, graded locally)
+                                   {..., "question_number": 3}  (retries get the first result)
+    POST   /games/<id>/advance                             -> next question or ending
+    DELETE /games/<id>
+
+Usage:
+    python api.py --port 8600
+"""
+
+import argparse
+import json
+import re
+import threading
+import time
+from concurrent.futures import Future
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlsplit
+
+from utils import metrics
+from utils.cancellation import cancel_session, get_cancellation
+from utils.engine import GameEngine, GameError, GameState
+from utils.events import get_event_log
+from utils.local_replies import generate_local_response, get_reply_engine
+from utils.scheduler import ai_context
+from utils.session_store import new_session_token
+
+
+GAME_IDLE_TTL = 3600
+MAX_GAMES = 100000
+# Seconds between scans for expired games
+GAME_PURGE_INTERVAL = 60
+
+_GAME_PATH = re.compile(r"^/games/([\w-]+)(?:/(answer|advance))?$")
+
+
+class GameRegistry:
+    """In-memory games with idle expiry."""
+
+    def __init__(self, idle_ttl: float = GAME_IDLE_TTL, max_games: int = MAX_GAMES):
+        self.idle_ttl = idle_ttl
+        self.max_games = max_games
+        self._lock = threading.Lock()
+        self._games = {}
+        self._purged_at = time.monotonic()
+
+    def add(self, state: GameState) -> str:
+        with self._lock:
+            self._purge(force=len(self._games) >= self.max_games)
+            if len(self._games) >= self.max_games:
+                raise GameError("Too many active games")
+            # state, last access, game lock, (answer key, result future) of the current question
+            self._games[state.session] = [state, time.monotonic(), threading.Lock(), None]
+        return state.session
+
+    def get(self, game_id: str) -> tuple:
+        """Return ``(state, lock)`` for a game, or ``(None, None)``."""
+        with self._lock:
+            self._purge()
+            entry = self._games.get(game_id)
+            if not entry:
+                return None, None
+            entry[1] = time.monotonic()
+        get_cancellation().touch(game_id)
+        return entry[0], entry[2]
+
+    def claim_answer(self, game_id: str, key: tuple) -> tuple:
+        """The result future for answer action ``key``; call with the game lock held.
+
+        Args:
+            key: ``(question index, option index or answer text)``
+
+        Returns:
+            ``(future, first)``: first is True if this action must be applied
+            and resolve the future, False for a repeat of the recorded action
+
+        Raises:
+            GameError: If the question was already answered differently
+        """
+        with self._lock:
+            entry = self._games[game_id]
+            if entry[3] and entry[3][0] == key:
+                return entry[3][1], False
+            # Never wait here: a pending future (reply still being generated) is
+            # an applied answer, only a finished failed one frees the question
+            if entry[3] and entry[3][0][0] == key[0]:
+                recorded = entry[3][1]
+                if not recorded.done() or recorded.exception(timeout=0) is None:
+                    raise GameError("The current question was already answered")
+            entry[3] = (key, Future())
+            return entry[3][1], True
+
+    def remove(self, game_id: str) -> bool:
+        with self._lock:
+            removed = self._games.pop(game_id, None) is not None
+        cancel_session(game_id, reason="deleted")
+        return removed
+
+    def _purge(self, force: bool = False):
+        """Drop games idle for ``idle_ttl``; called with the lock held.
+
+        Scans at most every GAME_PURGE_INTERVAL seconds (or idle_ttl, if
+        shorter) unless ``force`` is set.
+        """
+        now = time.monotonic()
+        if not force and now - self._purged_at < min(GAME_PURGE_INTERVAL, self.idle_ttl):
+            return
+        self._purged_at = now
+        cutoff = now - self.idle_ttl
+        for game_id, entry in list(self._games.items()):
+            if entry[1] < cutoff:
+                del self._games[game_id]
+                cancel_session(game_id, reason="expired")
+
+
+def _llm_reply(mbti, mbti_traits, question, answer, grade):
+    from utils.ai_client import generate_response
+    try:
+        return generate_response(mbti, mbti_traits, question, answer, grade)
+    except Exception:
+        return generate_local_response(mbti, mbti_traits, question, answer, grade)
+
+
+class GameAPIServer(ThreadingHTTPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+    request_queue_size = 128
+
+    def __init__(self, address, engine: GameEngine = None, registry: GameRegistry = None):
+        super().__init__(address, _GameAPIHandler)
+        self.engine = engine or GameEngine(
+            event_log=get_event_log(),
+            reply_fn=_llm_reply if get_reply_engine() == "llm" else None
+        )
+        self.registry = registry or GameRegistry()
+
+    @property
+    def url(self) -> str:
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}"
+
+
+class _GameAPIHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    # Headers and body are written separately; don't let Nagle delay replies
+    disable_nagle_algorithm = True
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_POST(self):
+        self._dispatch("POST")
+
+    def do_GET(self):
+        self._dispatch("GET")
+
+    def do_DELETE(self):
+        self._dispatch("DELETE")
+
+    def _dispatch(self, method: str):
+        length = int(self.headers.get("Content-Length") or 0)
+        try:
+            body = json.loads(self.rfile.read(length) or b"{}")
+        except (json.JSONDecodeError, UnicodeDecodeError):
+            self._send(400, {"error": "Invalid JSON"})
+            return
+        if not isinstance(body, dict):
+            self._send(400, {"error": "Request body must be a JSON object"})
+            return
+        path = urlsplit(self.path).path
+
+        engine, registry = self.server.engine, self.server.registry
+        try:
+            if path == "/games" and method == "POST":
+                state = engine.new_game(body.get("mbti"), session=new_session_token())
+                registry.add(state)
+                self._send(201, self._view(state))
+                return
+
+            match = _GAME_PATH.match(path)
+            state, lock = registry.get(match.group(1)) if match else (None, None)
+            if state is None:
+                self._send(404, {"error": "Unknown game"})
+                return
+            action = match.group(2)
+
+            if method == "GET" and not action:
+                with lock:
+                    self._send(200, self._view(state))
+            elif method == "DELETE" and not action:
+                registry.remove(state.session)
+                self._send(200, {"deleted": state.session})
+            elif method == "POST" and action == "answer":
+                self._answer(state, lock, body)
+            elif method == "POST" and action == "advance":
+                with lock:
+                    engine.advance(state)
+                    self._send(200, self._view(state))
+            else:
+                self._send(405, {"error": f"{method} not allowed here"})
+        except (GameError, ValueError, TypeError) as e:
+            self._send(409, {"error": str(e)})
+
+    def _answer(self, state: GameState, lock, body: dict):
+        """Apply an answer once per (question index, option or text).
+
+        A repeated request - a client retry or a double tap - is not applied
+        again and gets the first request's response, waiting for it if the
+        reply is still being generated.
+        """
+        engine, registry = self.server.engine, self.server.registry
+        with lock:
+            try:
+                q_idx = int(body.get("question_number", state.current_q_idx + 1)) - 1
+                choice = str(body["text"]) if "text" in body else int(body.get("option", -1))
+            except (TypeError, ValueError):
+                self._send(400, {"error": "question_number and option must be integers"})
+                return
+            result, first = registry.claim_answer(state.session, (q_idx, choice))
+            if first:
+                try:
+                    if q_idx != state.current_q_idx:
+                        raise GameError(f"Question {q_idx + 1} is not the current question")
+                    if "text" in body:
+                        entry = engine.answer_text(state, choice)
+                    else:
+                        entry = engine.answer(state, choice)
+                except Exception as e:
+                    result.set_exception(e)
+                    raise
+                view = self._view(state)
+
+        if not first:
+            metrics.incr("answer.duplicate_suppressed")
+            try:
+                view = result.result()
+            except GameError:
+                raise
+            except Exception as e:
+                self._send(502, {"error": f"Reply failed: {e}", "duplicate": True})
+                return
+            self._send(200, {**view, "duplicate": True})
+            return
+        try:
+            with ai_context("interactive", session=state.session):
+                reply = engine.reply(state, entry)
+        except Exception as e:
+            result.set_exception(e)
+            self._send(502, {"error": f"Reply failed: {e}"})
+            return
+        view["result"] = {"grade": entry["grade"], "delta": entry["delta"], "reply": reply}
+        result.set_result(view)
+        self._send(200, view)
+
+    def _view(self, state: GameState) -> dict:
+        question = self.server.engine.current_question(state)
+        return {
+            "game_id": state.session,
+            "mbti": state.mbti,
+            "affection": state.affection,
+            "question_number": state.current_q_idx + 1,
+            "total_questions": state.total_questions,
+            "answered": state.answered,
+            "ending": state.ending_type,
+            "question": {
+                "id": question["id"],
+                "text": question["q"],
+                "options": [option["text"] for option in question["options"]]
+            } if question else None
+        }
+
+    def _send(self, status: int, payload: dict):
+        data = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+
+def start_api_server(host: str = "127.0.0.1", port: int = 0, **kwargs) -> GameAPIServer:
+    """Start the API on a background thread (port 0 picks a free port)."""
+    server = GameAPIServer((host, port), **kwargs)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description="JSON HTTP API for MBTI Matchplay")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8600)
+    args = parser.parse_args()
+    server = GameAPIServer((args.host, args.port))
+    print(f"Game API listening on {server.url}")
+    server.serve_forever()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,11 +1,31 @@
 """MBTI Matchplay - MBTI 기반 선택형 미연시 게임"""
 
 import streamlit as st
-import json
 import random
-from pathlib import Path
-
-from utils.ai_client import generate_response, generate_character_images
+import time
+
+from utils.ai_client import generate_character_images, generate_response, generate_responses, get_reply_mode
+from utils.local_replies import generate_local_response, get_reply_engine
+from utils import metrics
+from utils.assets import portrait_url
+from utils.cancellation import cancel_session, get_cancellation
+from utils.config import get_setting
+from utils.content import get_content
+from utils.engine import MBTI_TYPES, GameEngine, GameState, calculate_grade
+from utils.profiling import PROFILE_MODES, Capture, rerun, span, timed
+from utils.events import get_event_log
+from utils.jobs import QueueFullError, get_job_queue
+from utils.image_profiles import PROFILE_ORDER, get_profile
+from utils.replies import (
+    REPLY_UPGRADE_WINDOW, collect_late_reply, prefetched_reply, reply_budget, submit_prefetch,
+    submit_reply, wait_for_reply
+)
+from utils.scheduler import ai_context
+from utils.speed_dating import (
+    SPEED_DATING_SIZE, SPEED_DATING_SIZES, advance_all, answer_all, create_cast_images, new_table, pick_cast,
+    submit_replies
+)
+from utils.session_store import get_session_store, new_session_token
 
 
 # Page config
@@ -16,13 +36,6 @@ st.set_page_config(
 )
 
 # Constants
-MBTI_TYPES = [
-    "INTJ", "INTP", "ENTJ", "ENTP",
-    "INFJ", "INFP", "ENFJ", "ENFP",
-    "ISTJ", "ISFJ", "ESTJ", "ESFJ",
-    "ISTP", "ISFP", "ESTP", "ESFP"
-]
-
 EXPRESSIONS = {
     "bad": ("pout", "삐짐"),
     "ok": ("smile", "미소"),
@@ -36,45 +49,181 @@ EYE_OPTIONS = ["갈색 눈", "검은 눈", "파란 눈", "초록 눈", "보라
 OUTFIT_OPTIONS = ["캐주얼 의상", "정장", "교복", "원피스", "후드티와 청바지", "세미정장"]
 ATMOSPHERE_OPTIONS = ["따뜻하고 친근한", "시크하고 도도한", "밝고 활발한", "차분하고 지적인", "신비롭고 몽환적인"]
 
-def calculate_grade(mbti: str, tags: list) -> tuple:
-    """Calculate grade based on MBTI match with answer tags.
+# Session state saved in checkpoints (portraits are stored separately by hash)
+CHECKPOINT_KEYS = [
+    "screen", "player_name", "mbti", "appearance_prefs", "affection",
+    "question_order", "current_q_idx", "current_expression", "character_name",
+    "log", "last_response", "last_grade", "show_response", "total_questions",
+    "ending_type", "current_suffix", "current_suffix_idx", "character_job_id",
+    "content_version", "mode", "cast", "cast_job_id"
+]
 
-    Args:
-        mbti: Character's MBTI (e.g., "INFP")
-        tags: List of MBTI dimension tags for the answer (e.g., ["I", "N", "F"])
+# Character creation stages reported by the background job
+CHARACTER_STAGES = {
+    "neutral": "기본 표정",
+    "pout": "삐진 표정",
+    "big_smile": "활짝 웃는 표정"
+}
 
-    Returns:
-        Tuple of (grade, delta) where grade is "good"/"ok"/"bad"
-    """
-    mbti_letters = list(mbti)  # ["I", "N", "F", "P"]
-    match_count = sum(1 for tag in tags if tag in mbti_letters)
+# Seconds between progress polls while a character is being created
+JOB_POLL_INTERVAL = 0.5
+# Longest free-text answer accepted on the game screen
+FREE_ANSWER_MAX_CHARS = 100
 
-    if match_count >= 3:
-        return ("good", 30)
-    elif match_count == 2:
-        return ("ok", 10)
-    else:
-        return ("bad", -10)
+LOADING_MESSAGES = [
+    "운명의 상대를 찾고 있어요...",
+    "두근두근, 설레는 만남이 다가와요...",
+    "당신만을 위한 이야기를 준비하고 있어요...",
+    "사랑의 마법을 걸고 있어요...",
+]
 
+# 게임 화면 스타일 (1:1 and speed-dating game screens)
+GAME_SCREEN_STYLE = """
+<style>
+    /* 전체 배경 */
+    .stApp {
+        background: linear-gradient(180deg, #fdf2f8 0%, #faf5ff 50%, #f0f9ff 100%) !important;
+    }
 
-@st.cache_data
-def load_questions():
-    """Load questions from JSON file."""
-    path = Path(__file__).parent / "data" / "questions.json"
-    with open(path, "r", encoding="utf-8") as f:
-        return json.load(f)["questions"]
+    /* 게임 헤더 카드 */
+    .game-header {
+        background: linear-gradient(135deg, #fce4ec 0%, #f3e5f5 50%, #e8eaf6 100%);
+        border-radius: 20px;
+        padding: 20px 24px;
+        margin-bottom: 16px;
+        box-shadow: 0 4px 16px rgba(156, 39, 176, 0.12);
+        border: 2px solid #e1bee7;
+    }
+    .char-name {
+        font-size: 28px;
+        font-weight: 700;
+        background: linear-gradient(135deg, #ec407a, #ab47bc);
+        -webkit-background-clip: text;
+        -webkit-text-fill-color: transparent;
+        background-clip: text;
+        margin: 0;
+    }
+    .char-mbti {
+        color: #9575cd;
+        font-size: 14px;
+        margin-top: 4px;
+    }
+    .question-count {
+        background: linear-gradient(135deg, #f8bbd9 0%, #e1bee7 100%);
+        color: #6a1b9a;
+        padding: 8px 16px;
+        border-radius: 20px;
+        font-weight: 600;
+        font-size: 14px;
+        display: inline-block;
+    }
 
+    /* 질문 카드 */
+    .question-card {
+        background: linear-gradient(135deg, #ffffff 0%, #fdf2f8 100%);
+        border: 2px solid #f0abfc;
+        border-radius: 16px;
+        padding: 20px;
+        margin: 16px 0;
+        box-shadow: 0 4px 12px rgba(168, 85, 247, 0.1);
+    }
+    .question-text {
+        color: #581c87;
+        font-size: 18px;
+        font-weight: 600;
+        line-height: 1.6;
+    }
 
-@st.cache_data
-def load_mbti_traits():
-    """Load MBTI traits from JSON file."""
-    path = Path(__file__).parent / "data" / "mbti_traits.json"
-    with open(path, "r", encoding="utf-8") as f:
-        return json.load(f)
+    /* 선택지 라벨 */
+    .options-label {
+        color: #9575cd;
+        font-size: 14px;
+        font-weight: 600;
+        margin: 16px 0 8px 0;
+        display: flex;
+        align-items: center;
+        gap: 8px;
+    }
+
+    /* 구분선 */
+    .game-divider {
+        text-align: center;
+        color: #e1bee7;
+        letter-spacing: 8px;
+        margin: 16px 0;
+    }
+
+    /* 버튼 스타일 */
+    .stButton > button {
+        background: linear-gradient(135deg, #f9a8d4 0%, #c084fc 100%) !important;
+        border: none !important;
+        border-radius: 12px !important;
+        color: white !important;
+        font-weight: 600 !important;
+        padding: 12px 24px !important;
+        transition: all 0.3s ease !important;
+        box-shadow: 0 4px 12px rgba(192, 132, 252, 0.3) !important;
+    }
+    .stButton > button:hover {
+        transform: translateY(-2px) !important;
+        box-shadow: 0 6px 20px rgba(192, 132, 252, 0.4) !important;
+        background: linear-gradient(135deg, #f472b6 0%, #a855f7 100%) !important;
+    }
+    .stButton > button[kind="primary"] {
+        background: linear-gradient(135deg, #ec4899 0%, #a855f7 50%, #6366f1 100%) !important;
+        font-size: 16px !important;
+        padding: 14px 28px !important;
+        border-radius: 25px !important;
+    }
+</style>
+"""
+
+# Query parameter holding the resumable session token
+SESSION_QUERY_PARAM = "s"
+DEBUG_QUERY_PARAM = "debug"
+
+@st.cache_resource
+def get_engine() -> GameEngine:
+    """Game rules shared by all sessions."""
+    return GameEngine(event_log=get_event_log())
+
+
+def game_state() -> GameState:
+    """The current game as an engine GameState."""
+    ss = st.session_state
+    return GameState(
+        mbti=ss.mbti,
+        question_order=ss.question_order,
+        affection=ss.affection,
+        current_q_idx=ss.current_q_idx,
+        total_questions=ss.total_questions,
+        log=ss.log,
+        answered=ss.show_response,
+        ending_type=ss.get("ending_type"),
+        session=ss.get("session_token"),
+        content_version=ss.get("content_version")
+    )
+
+
+def store_game_state(state: GameState):
+    """Write an engine GameState back into the session."""
+    ss = st.session_state
+    ss.mbti = state.mbti
+    ss.question_order = state.question_order
+    ss.affection = state.affection
+    ss.current_q_idx = state.current_q_idx
+    ss.total_questions = state.total_questions
+    ss.log = state.log
+    ss.show_response = state.answered
+    ss.ending_type = state.ending_type
+    ss.content_version = state.content_version
 
 
 def init_session_state():
     """Initialize session state variables."""
+    if "session_token" not in st.session_state:
+        restore_checkpoint()
+
     defaults = {
         "screen": "start",
         "player_name": "",
@@ -90,13 +239,473 @@ def init_session_state():
         "last_response": "",
         "last_grade": "ok",
         "show_response": False,
-        "total_questions": 12
+        "total_questions": 12,
+        "mode": "single"
     }
     for key, value in defaults.items():
         if key not in st.session_state:
             st.session_state[key] = value
 
 
+def set_character_images(images: dict):
+    """Store generated portraits in the session and the checkpoint blob store."""
+    refs, images = get_session_store().put_images(images)
+    st.session_state.character_images = images
+    st.session_state.character_image_refs = refs
+
+
+@timed()
+def save_checkpoint():
+    """Checkpoint the current game so it survives reconnects and restarts."""
+    token = st.session_state.get("session_token")
+    if not token:
+        return
+    state = {key: st.session_state[key] for key in CHECKPOINT_KEYS if key in st.session_state}
+    state["character_images"] = st.session_state.get("character_image_refs", {})
+    get_session_store().save(token, state)
+
+
+def restore_checkpoint() -> bool:
+    """Restore a checkpointed game named by the session token in the URL.
+
+    Returns:
+        True if a game was restored
+    """
+    token = st.query_params.get(SESSION_QUERY_PARAM)
+    if not token:
+        return False
+
+    store = get_session_store()
+    state = store.load(token)
+    if not state:
+        return False
+    refs = state.pop("character_images", {})
+    images = store.get_images(refs)
+    if images is None:
+        return False
+
+    cast_images = [store.get_images(member["image_refs"]) or {} for member in state.get("cast", [])]
+
+    for key, value in state.items():
+        st.session_state[key] = value
+    st.session_state.character_images = images
+    st.session_state.cast_images = cast_images
+    st.session_state.character_image_refs = refs
+    st.session_state.session_token = token
+    return True
+
+
+def reset_to_lobby():
+    """Discard the current game and its checkpoint, then return to the lobby."""
+    for job_id in (st.session_state.get("character_job_id"), st.session_state.get("cast_job_id")):
+        if job_id:
+            # Stop expression edits nobody will look at
+            get_job_queue().cancel(job_id)
+    token = st.session_state.get("session_token")
+    if token:
+        # Replies, prefetches and portraits still in flight are no longer wanted
+        cancel_session(token, reason="lobby")
+        get_session_store().delete(token)
+    if SESSION_QUERY_PARAM in st.query_params:
+        del st.query_params[SESSION_QUERY_PARAM]
+    for key in list(st.session_state.keys()):
+        del st.session_state[key]
+    st.rerun()
+
+
+def replay_same_character():
+    """Start a new game with the current character, reusing its portraits.
+
+    Keeps the name, MBTI, appearance and generated images; draws new
+    questions and resets affection and the log. No AI call is made.
+    """
+    ss = st.session_state
+    if not ss.character_images.get("neutral"):
+        reset_to_lobby()
+    store_game_state(get_engine().new_game(ss.mbti, session=ss.session_token))
+    ss.current_expression = "neutral"
+    ss.last_response = ""
+    ss.last_grade = "ok"
+    ss.current_suffix_idx = None
+    ss.pop("pending_reply", None)
+    ss.pop("answer_action", None)
+    cancel_session(ss.session_token, "reply", reason="superseded")
+    cancel_session(ss.session_token, "prefetch", reason="superseded")
+    ss.screen = "game"
+    metrics.incr("start.replay")
+    get_event_log().emit("start", session=ss.session_token, mbti=ss.mbti, ai_cost="none")
+    save_checkpoint()
+    st.rerun()
+
+
+def submit_character_job():
+    """Submit character image generation for this session to the job queue.
+
+    Resubmitting is idempotent: the queue returns the session's existing job.
+
+    Raises:
+        QueueFullError: If the server is already at its job limit
+    """
+    appearance = dict(st.session_state.appearance_prefs)
+    mbti = st.session_state.mbti
+    token = st.session_state.session_token
+
+    def create_character(job):
+        # The game screen shows the neutral portrait without rerunning while
+        # the other expressions are drawn; don't cancel them as idle
+        with get_cancellation().active(token):
+            return generate_character_images(
+                appearance,
+                mbti,
+                on_progress=job.report_stage,
+                should_cancel=lambda: job.cancelled
+            )
+
+    with ai_context("interactive", session=st.session_state.session_token, scope="character"):
+        job = get_job_queue().submit(
+            st.session_state.session_token,
+            create_character,
+            stages=list(CHARACTER_STAGES)
+        )
+    st.session_state.character_job_id = job.id
+    return job
+
+
+@timed()
+def sync_pending_reply() -> bool:
+    """Replace the fallback bubble with the real reply if it has arrived.
+
+    Returns:
+        True if a late reply is still expected for the current question
+    """
+    pending = st.session_state.get("pending_reply")
+    if not pending:
+        return False
+
+    still_showing = (
+        st.session_state.show_response
+        and st.session_state.current_q_idx == pending["q_idx"]
+    )
+    if not still_showing or time.time() - pending["started_at"] > REPLY_UPGRADE_WINDOW:
+        metrics.incr("reply.upgrade_dropped")
+        st.session_state.pending_reply = None
+        # Nobody will see it anymore
+        cancel_session(st.session_state.session_token, "reply", reason="superseded")
+        return False
+    if not pending["future"].done():
+        return True
+
+    reply = collect_late_reply(pending["future"])
+    st.session_state.pending_reply = None
+    if reply:
+        st.session_state.last_response = reply
+        save_checkpoint()
+    return False
+
+
+def prefetch_replies(question: dict, mbti_traits: dict):
+    """Generate the replies to every option of the question being shown.
+
+    One batched call per question (REPLY_MODE=batch) at speculative
+    priority, so the chosen option is usually answered before the click.
+    """
+    ss = st.session_state
+    prefetch = ss.get("reply_prefetch")
+    if prefetch and prefetch["key"] == (ss.current_q_idx, question["id"]):
+        return
+    if prefetch and not prefetch["future"].done():
+        cancel_session(ss.session_token, "prefetch", reason="superseded")
+    options = [
+        (option["text"], calculate_grade(ss.mbti, option.get("tags", []))[0])
+        for option in question["options"]
+    ]
+    with ai_context("speculative", session=ss.session_token, scope="prefetch"):
+        future = submit_prefetch(generate_responses, ss.mbti, mbti_traits, question["q"], options)
+    ss.reply_prefetch = {"key": (ss.current_q_idx, question["id"]), "future": future}
+
+
+def claim_answer(option) -> dict:
+    """The answer action record for the current question.
+
+    Answer actions are tagged with the question index (and id), and only the
+    first one for a question is applied. A repeat - the option clicked twice,
+    or another click handled during the rerun that follows an answer - gets
+    the first action's record back instead, so the grade is applied and the
+    reply generated at most once.
+
+    Args:
+        option: Option index, or the typed text of a free-text answer
+
+    Returns:
+        The record: key, option, and the ``entry``, reply ``future`` and
+        ``response`` filled in as the first action progresses
+    """
+    ss = st.session_state
+    key = (ss.current_q_idx, ss.question_order[ss.current_q_idx])
+    action = ss.get("answer_action")
+    if action and action["key"] == key:
+        metrics.incr("answer.duplicate_suppressed")
+        if action["option"] != option:
+            metrics.incr("answer.duplicate_conflicting")
+        return action
+    ss.answer_action = {"key": key, "option": option, "entry": None, "future": None, "response": None}
+    return ss.answer_action
+
+
+def answer_question(option: int = None, text: str = None):
+    """Grade an option click or typed answer once and show the character's reaction."""
+    action = claim_answer(text if text is not None else option)
+    if action["entry"] is None:
+        # Grade the answer, update affection and log the choice
+        state = game_state()
+        engine = get_engine()
+        action["entry"] = engine.answer_text(state, text) if text is not None else engine.answer(state, option)
+        store_game_state(state)
+    respond_to_answer(action, get_engine().content_for(game_state()).mbti_traits)
+
+
+def respond_to_answer(action: dict, mbti_traits: dict):
+    """Show the character's reaction to a graded answer action and rerun.
+
+    Uses the prefetched batch reply for option clicks when available, else
+    one AI call within the latency budget with a local reply as fallback.
+    A duplicate action reuses the first one's reply, or waits on its call.
+    """
+    ss = st.session_state
+    entry = action["entry"]
+    grade = entry["grade"]
+    ss.current_expression = EXPRESSIONS.get(grade, ("neutral", ""))[0]
+
+    reply_args = (ss.mbti, mbti_traits, entry["question"], entry["answer"], grade)
+    prefetch = ss.get("reply_prefetch")
+    response = action["response"]
+    if response is None and get_reply_engine() == "local":
+        # Offline mode: compose the reply locally, no AI call
+        response = generate_local_response(*reply_args)
+    elif response is None and entry["option"] is not None and prefetch and prefetch["key"] == (ss.current_q_idx, entry["question_id"]):
+        # Batched reply already generated for this option
+        response = prefetched_reply(prefetch["future"], entry["option"])
+    if prefetch and not prefetch["future"].done():
+        # Answered before the prefetch finished: its replies would go unused
+        cancel_session(ss.session_token, "prefetch", reason="superseded")
+    if not response:
+        # Generate AI response, waiting only up to the latency budget
+        if action["future"] is None:
+            with ai_context("interactive", session=ss.session_token, scope="reply"):
+                action["future"] = submit_reply(generate_response, *reply_args)
+        future = action["future"]
+        response = wait_for_reply(future, reply_budget())
+
+        # Local reply if API fails or is late; late replies replace it
+        if not response:
+            response = generate_local_response(*reply_args)
+            if not future.done():
+                ss.pending_reply = {
+                    "future": future,
+                    "q_idx": ss.current_q_idx,
+                    "started_at": time.time()
+                }
+    action["response"] = response
+
+    ss.last_response = response
+    ss.last_grade = grade
+    ss.show_response = True
+    save_checkpoint()
+    st.rerun()
+
+
+def cast_states() -> list:
+    """The speed-dating characters' games as engine GameStates."""
+    return [GameState.from_dict(member["game"]) for member in st.session_state.cast]
+
+
+def store_cast_states(states: list):
+    """Write the characters' GameStates back and keep the table-wide fields in sync."""
+    ss = st.session_state
+    for member, state in zip(ss.cast, states):
+        member["game"] = state.to_dict()
+    playing = [state for state in states if state.ending_type is None] or states
+    ss.question_order = playing[0].question_order
+    ss.current_q_idx = playing[0].current_q_idx
+    ss.total_questions = playing[0].total_questions
+    ss.show_response = any(state.answered for state in states)
+    ss.content_version = states[0].content_version
+
+
+def start_speed_dating(mbti: str, size: int):
+    """Seat ``size`` characters (``mbti`` and random other types) and start creating them."""
+    ss = st.session_state
+    mbtis = pick_cast(mbti, size)
+    ss.mode = "speed"
+    ss.mbti = mbti
+    ss.cast = [
+        {
+            "mbti": member_mbti,
+            "name": generate_character_name(member_mbti),
+            "expression": "neutral",
+            "last_response": "",
+            "last_grade": "ok",
+            "image_refs": {},
+            "game": None
+        }
+        for member_mbti in mbtis
+    ]
+    ss.cast_images = [{} for _ in mbtis]
+    store_cast_states(new_table(get_engine(), mbtis, session=ss.session_token))
+    submit_cast_job()
+
+
+def submit_cast_job():
+    """Submit portrait generation for the whole speed-dating cast to the job queue.
+
+    Raises:
+        QueueFullError: If the server is already at its job limit
+    """
+    appearance = dict(st.session_state.appearance_prefs)
+    mbtis = [member["mbti"] for member in st.session_state.cast]
+    token = st.session_state.session_token
+
+    def create_cast(job):
+        with get_cancellation().active(token):
+            return create_cast_images(job, appearance, mbtis)
+
+    with ai_context("interactive", session=token, scope="character"):
+        job = get_job_queue().submit(
+            f"{token}:cast",
+            create_cast,
+            stages=[f"{index}:{stage}" for index in range(len(mbtis)) for stage in CHARACTER_STAGES]
+        )
+    st.session_state.cast_job_id = job.id
+    return job
+
+
+def set_cast_images(index: int, images: dict):
+    """Store one cast member's portraits in the session and the checkpoint blob store."""
+    refs, images = get_session_store().put_images(images)
+    st.session_state.cast_images[index] = images
+    st.session_state.cast[index]["image_refs"] = refs
+
+
+@timed()
+def sync_cast_images() -> bool:
+    """Merge portraits finished by the cast job since the last rerun.
+
+    Returns:
+        True if portraits are still being generated
+    """
+    ss = st.session_state
+    job = get_job_queue().get(ss.get("cast_job_id"))
+    if job is None:
+        ss.cast_job_id = None
+    changed = False
+    for index, images in enumerate(ss.cast_images):
+        arrived = {}
+        if job:
+            for stage in CHARACTER_STAGES:
+                value = job.partial.get(f"{index}:{stage}")
+                if value and stage not in images:
+                    arrived[stage] = value
+        if job is None or not job.active:
+            # Finished or lost: show neutral for whatever is missing
+            neutral = arrived.get("neutral") or images.get("neutral")
+            for stage in CHARACTER_STAGES:
+                if not images.get(stage) and not arrived.get(stage) and neutral:
+                    arrived[stage] = neutral
+        if arrived:
+            set_cast_images(index, {**images, **arrived})
+            changed = True
+    if job and not job.active:
+        ss.cast_job_id = None
+    if changed:
+        save_checkpoint()
+    return bool(job and job.active)
+
+
+def respond_to_speed_answer(option: int = None, text: str = None):
+    """Apply one answer to every character at the table and collect their replies.
+
+    All replies are requested together and waited for within one latency
+    budget; late ones get a local line now and replace it when they arrive.
+    Like ``answer_question``, a duplicate action reuses the first one.
+    """
+    ss = st.session_state
+    engine = get_engine()
+    action = claim_answer(text if text is not None else option)
+    states = cast_states()
+    if action["entry"] is None:
+        action["entry"] = answer_all(engine, states, option=option, text=text)
+        store_cast_states(states)
+    entries = action["entry"]
+    mbti_traits = engine.content_for(states[0]).mbti_traits
+
+    if action["response"] is None:
+        started = time.perf_counter()
+        if action["future"] is None:
+            if get_reply_engine() == "local":
+                action["future"] = [None] * len(entries)
+            else:
+                with ai_context("interactive", session=ss.session_token, scope="reply"):
+                    action["future"] = submit_replies(states, entries, mbti_traits)
+        deadline = time.monotonic() + reply_budget()
+        responses = []
+        pending = []
+        for state, entry, future in zip(states, entries, action["future"]):
+            response = None
+            if entry is not None:
+                if future:
+                    response = wait_for_reply(future, max(0.0, deadline - time.monotonic()))
+                response = response or generate_local_response(
+                    state.mbti, mbti_traits, entry["question"], entry["answer"], entry["grade"]
+                )
+            responses.append(response)
+            pending.append(future if future and not future.done() else None)
+        action["response"] = responses
+        metrics.observe("speed_dating.turn_latency", time.perf_counter() - started)
+        if any(pending):
+            ss.cast_replies = {"futures": pending, "q_idx": ss.current_q_idx, "started_at": time.time()}
+
+    for member, entry, response in zip(ss.cast, entries, action["response"]):
+        if entry is not None:
+            member["expression"] = EXPRESSIONS.get(entry["grade"], ("neutral", ""))[0]
+            member["last_response"] = response
+            member["last_grade"] = entry["grade"]
+    save_checkpoint()
+    st.rerun()
+
+
+@timed()
+def sync_cast_replies() -> bool:
+    """Put late speed-dating replies into their characters' panels as they arrive.
+
+    Returns:
+        True if replies for the current question are still expected
+    """
+    ss = st.session_state
+    pending = ss.get("cast_replies")
+    if not pending:
+        return False
+    if pending["q_idx"] != ss.current_q_idx or time.time() - pending["started_at"] > REPLY_UPGRADE_WINDOW:
+        ss.cast_replies = None
+        cancel_session(ss.session_token, "reply", reason="superseded")
+        return False
+
+    changed = False
+    for index, future in enumerate(pending["futures"]):
+        if future is None or not future.done():
+            continue
+        pending["futures"][index] = None
+        reply = collect_late_reply(future)
+        if reply:
+            ss.cast[index]["last_response"] = reply
+            changed = True
+    if changed:
+        save_checkpoint()
+    if not any(pending["futures"]):
+        ss.cast_replies = None
+        return False
+    return True
+
+
 def generate_character_name(mbti: str) -> str:
     """Generate a random Korean name based on MBTI."""
     first_names_female = [
@@ -115,16 +724,11 @@ def generate_character_name(mbti: str) -> str:
     return random.choice(first_names_male)
 
 
-def render_loading_screen(message: str = "로딩 중..."):
+@timed()
+def render_loading_screen(message: str = "로딩 중...", sub_message: str = None):
     """Render a romantic loading screen with heart animation."""
-    loading_messages = [
-        "운명의 상대를 찾고 있어요...",
-        "두근두근, 설레는 만남이 다가와요...",
-        "당신만을 위한 이야기를 준비하고 있어요...",
-        "사랑의 마법을 걸고 있어요...",
-    ]
-    import random
-    sub_message = random.choice(loading_messages)
+    if sub_message is None:
+        sub_message = random.choice(LOADING_MESSAGES)
 
     st.markdown(f"""
     <style>
@@ -218,6 +822,7 @@ def render_loading_screen(message: str = "로딩 중..."):
     """, unsafe_allow_html=True)
 
 
+@timed()
 def render_affection_bar():
     """Render affection gauge bar."""
     affection = st.session_state.affection
@@ -238,16 +843,101 @@ def render_affection_bar():
     """, unsafe_allow_html=True)
 
 
+@timed()
+def sync_character_images() -> bool:
+    """Merge expressions finished by the background job since the last rerun.
+
+    Returns:
+        True if expressions are still being generated
+    """
+    job_id = st.session_state.get("character_job_id")
+    if not job_id:
+        return False
+
+    images = st.session_state.character_images
+    job = get_job_queue().get(job_id)
+    if job is None:
+        # Resumed on a server without the job: keep neutral for what is missing
+        for stage in CHARACTER_STAGES:
+            if not images.get(stage):
+                images[stage] = images.get("neutral")
+        st.session_state.character_job_id = None
+        set_character_images(images)
+        save_checkpoint()
+        return False
+
+    stages, partial = job.snapshot()
+    arrived = {
+        stage: value for stage, value in partial.items()
+        if value and not images.get(stage)
+    }
+    # Shown under the portrait; these expressions fall back to neutral
+    st.session_state.failed_expressions = [
+        stage for stage, state in stages.items() if state == "failed"
+    ]
+    if job.active:
+        if arrived:
+            set_character_images({**images, **arrived})
+            save_checkpoint()
+        return True
+
+    if job.status == "done" and job.result:
+        # Keep the portraits already on screen
+        kept = {stage: img for stage, img in images.items() if img}
+        set_character_images({**job.result, **kept, **arrived})
+    else:
+        for stage in CHARACTER_STAGES:
+            if not images.get(stage):
+                images[stage] = images.get("neutral")
+        set_character_images(images)
+    st.session_state.character_job_id = None
+    save_checkpoint()
+    return False
+
+
+def portrait_urls() -> dict:
+    """Asset URLs of the available portraits, published once per image."""
+    refs = st.session_state.get("character_image_refs", {})
+    known = st.session_state.setdefault("character_image_urls", {})
+    urls = {}
+    for expr, img in st.session_state.character_images.items():
+        ref = refs.get(expr)
+        if not img or not ref:
+            continue
+        if ref not in known:
+            known[ref] = portrait_url(ref, img)
+        urls[expr] = known[ref]
+    return urls
+
+
+@timed()
 def render_character_image():
-    """Render current character image based on expression."""
+    """Render current character image based on expression.
+
+    Shows the neutral portrait while the requested expression is still
+    being generated.
+    """
     expr = st.session_state.current_expression
     images = st.session_state.character_images
 
+    if not images.get(expr) and images.get("neutral"):
+        expr = "neutral"
+
     if expr in images and images[expr]:
-        img_data = images[expr]
+        # Every available expression is on the page (only the current one
+        # visible), so the browser loads each portrait once and switching
+        # expressions later only changes which one is shown
+        urls = portrait_urls()
+        tags = []
+        for url in dict.fromkeys(urls.values()):
+            display = "inline-block" if url == urls[expr] else "none"
+            tags.append(
+                f'<img src="{url}" style="display: {display}; max-width: 300px; border-radius: 16px; '
+                f'box-shadow: 0 8px 24px rgba(156, 39, 176, 0.2); border: 3px solid #f8bbd9;">'
+            )
         st.markdown(
             f'''<div style="text-align: center;">
-                <img src="data:image/png;base64,{img_data}" style="max-width: 300px; border-radius: 16px; box-shadow: 0 8px 24px rgba(156, 39, 176, 0.2); border: 3px solid #f8bbd9;">
+                {"".join(tags)}
             </div>''',
             unsafe_allow_html=True
         )
@@ -266,6 +956,7 @@ def render_character_image():
         """, unsafe_allow_html=True)
 
 
+@timed()
 def render_start_screen():
     """Render the start/setup screen."""
     # Global styles for the start screen
@@ -548,7 +1239,7 @@ def render_start_screen():
 
     # Show MBTI info
     if selected_mbti:
-        traits = load_mbti_traits().get(selected_mbti, {})
+        traits = get_content().current().mbti_traits.get(selected_mbti, {})
         if traits:
             st.markdown(f"""
             <div style="background: linear-gradient(135deg, #f3e5f5 0%, #fce4ec 100%); padding: 20px; border-radius: 16px; margin: 12px 0; border-left: 4px solid #ab47bc;">
@@ -585,6 +1276,15 @@ def render_start_screen():
 
     st.markdown('<p class="decorative-dots">• • •</p>', unsafe_allow_html=True)
 
+    # Play mode: one character, or several at once
+    speed_dating = st.toggle("💞 스피드 데이팅 (여러 명과 동시에 만나기)", key="speed_dating_toggle")
+    cast_size = SPEED_DATING_SIZE
+    if speed_dating:
+        cast_size = st.select_slider("만날 상대 수", options=SPEED_DATING_SIZES, value=SPEED_DATING_SIZE)
+        st.caption("선택한 MBTI와 다른 MBTI 상대들이 함께 나와요. 같은 질문에 한 번 답하면 모두가 각자 반응해요.")
+
+    st.markdown('<p class="decorative-dots">• • •</p>', unsafe_allow_html=True)
+
     # Start button with custom styling
     can_start = player_name and selected_mbti
 
@@ -623,45 +1323,40 @@ def render_start_screen():
             "atmosphere": atmosphere
         }
 
-        # Generate character
-        st.session_state.character_name = generate_character_name(selected_mbti)
-
-        # Select 12 random questions
-        questions = load_questions()
-        st.session_state.question_order = random.sample(range(len(questions)), 12)
-        st.session_state.current_q_idx = 0
-        st.session_state.total_questions = 12
-
-        # Reset game state
-        st.session_state.affection = 30
-        st.session_state.log = []
-        st.session_state.current_expression = "neutral"
+        if not st.session_state.get("session_token"):
+            st.session_state.session_token = new_session_token()
 
-        # Generate character images with custom loading screen
-        loading_placeholder = st.empty()
-        with loading_placeholder.container():
-            render_loading_screen("당신의 이상형을 그리는 중")
+        try:
+            if speed_dating:
+                # Every character's portraits are generated concurrently by one job
+                start_speed_dating(selected_mbti, cast_size)
+            else:
+                # Generate character
+                st.session_state.mode = "single"
+                st.session_state.character_name = generate_character_name(selected_mbti)
 
-        images = generate_character_images(
-            st.session_state.appearance_prefs,
-            selected_mbti
-        )
-        loading_placeholder.empty()
-
-        # 이미지가 제대로 생성되었는지 확인
-        has_valid_image = images and any(images.get(expr) for expr in ["smile", "pout", "big_smile", "neutral"])
+                # New game: 12 random questions, starting affection
+                store_game_state(get_engine().new_game(selected_mbti, session=st.session_state.session_token))
+                st.session_state.current_expression = "neutral"
 
-        if has_valid_image:
-            st.session_state.character_images = images
-            # Transition to game
-            st.session_state.screen = "game"
-            st.rerun()
-        else:
+                # Generate character images in the background job queue
+                submit_character_job()
+        except QueueFullError:
             st.markdown("""
-            <div style="background: linear-gradient(135deg, #fee2e2 0%, #fecaca 100%); padding: 20px; border-radius: 16px; text-align: center; border: 2px solid #f87171;">
-                <p style="color: #b91c1c; font-size: 16px; margin: 0;">😢 캐릭터 이미지를 생성하지 못했어요.<br>잠시 후 다시 시도해주세요.</p>
+            <div style="background: linear-gradient(135deg, #fff3e0 0%, #ffe0b2 100%); padding: 20px; border-radius: 16px; text-align: center; border: 2px solid #ffb74d;">
+                <p style="color: #e65100; font-size: 16px; margin: 0;">⏳ 지금 만남을 준비하는 사람이 너무 많아요.<br>잠시 후 다시 시도해주세요.</p>
             </div>
             """, unsafe_allow_html=True)
+        else:
+            st.query_params[SESSION_QUERY_PARAM] = st.session_state.session_token
+            st.session_state.screen = "speed_creating" if speed_dating else "creating"
+            metrics.incr("start.speed" if speed_dating else "start.new")
+            get_event_log().emit(
+                "start", session=st.session_state.session_token, mbti=selected_mbti, ai_cost="generated",
+                mode=st.session_state.mode
+            )
+            save_checkpoint()
+            st.rerun()
 
     if not can_start:
         st.markdown("""
@@ -671,111 +1366,72 @@ def render_start_screen():
         """, unsafe_allow_html=True)
 
 
-def render_game_screen():
-    """Render the main game screen."""
-    questions = load_questions()
-    mbti_traits = load_mbti_traits()
-
-    # 게임 화면 스타일
+@timed()
+def render_generation_error():
+    """Render the message shown when character images could not be generated."""
     st.markdown("""
-    <style>
-        /* 전체 배경 */
-        .stApp {
-            background: linear-gradient(180deg, #fdf2f8 0%, #faf5ff 50%, #f0f9ff 100%) !important;
-        }
+    <div style="background: linear-gradient(135deg, #fee2e2 0%, #fecaca 100%); padding: 20px; border-radius: 16px; text-align: center; border: 2px solid #f87171;">
+        <p style="color: #b91c1c; font-size: 16px; margin: 0;">😢 캐릭터 이미지를 생성하지 못했어요.<br>잠시 후 다시 시도해주세요.</p>
+    </div>
+    """, unsafe_allow_html=True)
+    if st.button("🏠 로비로", use_container_width=True):
+        reset_to_lobby()
+
+
+@timed()
+def render_creating_screen():
+    """Render character creation progress and poll the background job."""
+    job = get_job_queue().get(st.session_state.get("character_job_id"))
+    if job is None:
+        # Resumed on a server that does not know the job - resubmit it
+        try:
+            job = submit_character_job()
+        except QueueFullError:
+            render_generation_error()
+            return
+
+    # The first question only needs the neutral portrait - start as soon as it exists
+    neutral = job.partial.get("neutral")
+    if job.status == "done" or neutral:
+        images = job.result if job.status == "done" else {"neutral": neutral, "smile": neutral}
+        # 이미지가 제대로 생성되었는지 확인
+        has_valid_image = images and any(images.get(expr) for expr in ["smile", "pout", "big_smile", "neutral"])
+        if has_valid_image:
+            set_character_images(images)
+            metrics.observe("start.time_to_game", time.time() - job.created_at)
+            # Transition to game
+            st.session_state.screen = "game"
+            save_checkpoint()
+            st.rerun()
+        render_generation_error()
+        return
 
-        /* 게임 헤더 카드 */
-        .game-header {
-            background: linear-gradient(135deg, #fce4ec 0%, #f3e5f5 50%, #e8eaf6 100%);
-            border-radius: 20px;
-            padding: 20px 24px;
-            margin-bottom: 16px;
-            box-shadow: 0 4px 16px rgba(156, 39, 176, 0.12);
-            border: 2px solid #e1bee7;
-        }
-        .char-name {
-            font-size: 28px;
-            font-weight: 700;
-            background: linear-gradient(135deg, #ec407a, #ab47bc);
-            -webkit-background-clip: text;
-            -webkit-text-fill-color: transparent;
-            background-clip: text;
-            margin: 0;
-        }
-        .char-mbti {
-            color: #9575cd;
-            font-size: 14px;
-            margin-top: 4px;
-        }
-        .question-count {
-            background: linear-gradient(135deg, #f8bbd9 0%, #e1bee7 100%);
-            color: #6a1b9a;
-            padding: 8px 16px;
-            border-radius: 20px;
-            font-weight: 600;
-            font-size: 14px;
-            display: inline-block;
-        }
+    if not job.active:
+        render_generation_error()
+        return
 
-        /* 질문 카드 */
-        .question-card {
-            background: linear-gradient(135deg, #ffffff 0%, #fdf2f8 100%);
-            border: 2px solid #f0abfc;
-            border-radius: 16px;
-            padding: 20px;
-            margin: 16px 0;
-            box-shadow: 0 4px 12px rgba(168, 85, 247, 0.1);
-        }
-        .question-text {
-            color: #581c87;
-            font-size: 18px;
-            font-weight: 600;
-            line-height: 1.6;
-        }
+    render_loading_screen(
+        "당신의 이상형을 그리는 중",
+        sub_message=random.Random(job.id).choice(LOADING_MESSAGES)
+    )
+    done = sum(1 for state in job.stages.values() if state != "pending")
+    st.progress(job.progress, text=f"{done}/{len(job.stages)} 완료")
+    for stage, label in CHARACTER_STAGES.items():
+        icon = "💖" if job.stages.get(stage) == "done" else "🤍" if job.stages.get(stage) == "pending" else "💔"
+        st.markdown(f'<p style="text-align: center; color: #7b1fa2; margin: 4px 0;">{icon} {label}</p>', unsafe_allow_html=True)
 
-        /* 선택지 라벨 */
-        .options-label {
-            color: #9575cd;
-            font-size: 14px;
-            font-weight: 600;
-            margin: 16px 0 8px 0;
-            display: flex;
-            align-items: center;
-            gap: 8px;
-        }
+    time.sleep(JOB_POLL_INTERVAL)
+    st.rerun()
 
-        /* 구분선 */
-        .game-divider {
-            text-align: center;
-            color: #e1bee7;
-            letter-spacing: 8px;
-            margin: 16px 0;
-        }
 
-        /* 버튼 스타일 */
-        .stButton > button {
-            background: linear-gradient(135deg, #f9a8d4 0%, #c084fc 100%) !important;
-            border: none !important;
-            border-radius: 12px !important;
-            color: white !important;
-            font-weight: 600 !important;
-            padding: 12px 24px !important;
-            transition: all 0.3s ease !important;
-            box-shadow: 0 4px 12px rgba(192, 132, 252, 0.3) !important;
-        }
-        .stButton > button:hover {
-            transform: translateY(-2px) !important;
-            box-shadow: 0 6px 20px rgba(192, 132, 252, 0.4) !important;
-            background: linear-gradient(135deg, #f472b6 0%, #a855f7 100%) !important;
-        }
-        .stButton > button[kind="primary"] {
-            background: linear-gradient(135deg, #ec4899 0%, #a855f7 50%, #6366f1 100%) !important;
-            font-size: 16px !important;
-            padding: 14px 28px !important;
-            border-radius: 25px !important;
-        }
-    </style>
-    """, unsafe_allow_html=True)
+@timed()
+def render_game_screen():
+    """Render the main game screen."""
+    mbti_traits = get_engine().content_for(game_state()).mbti_traits
+    generating = sync_character_images()
+    awaiting_reply = sync_pending_reply()
+
+    st.markdown(GAME_SCREEN_STYLE, unsafe_allow_html=True)
 
     # Header
     char_name = st.session_state.character_name
@@ -796,12 +1452,13 @@ def render_game_screen():
     </div>
     """, unsafe_allow_html=True)
 
-    col1, col2 = st.columns([3, 1])
+    col1, col2, col3 = st.columns([2, 1, 1])
     with col2:
+        if st.button("🔁 처음부터", use_container_width=True, help="같은 상대와 새 질문으로 다시 시작해요"):
+            replay_same_character()
+    with col3:
         if st.button("🏠 로비로", use_container_width=True):
-            for key in list(st.session_state.keys()):
-                del st.session_state[key]
-            st.rerun()
+            reset_to_lobby()
 
     # Affection bar
     render_affection_bar()
@@ -810,12 +1467,15 @@ def render_game_screen():
 
     # Character image
     render_character_image()
+    if st.session_state.get("failed_expressions"):
+        st.caption("😢 일부 표정을 그리지 못해서 기본 표정으로 보여줄게요.")
 
     st.markdown('<p class="game-divider">• • •</p>', unsafe_allow_html=True)
 
     # Current question
-    q_idx = st.session_state.question_order[st.session_state.current_q_idx]
-    question = questions[q_idx]
+    engine = get_engine()
+    with span("question_store.get"):
+        question = engine.current_question(game_state())
     player_name = st.session_state.player_name
 
     # Add player name to question with random suffix (fixed per question)
@@ -846,79 +1506,39 @@ def render_game_screen():
 
         # Next question button
         if st.button("다음 질문 →", use_container_width=True, type="primary"):
-            st.session_state.show_response = False
-            st.session_state.current_q_idx += 1
-            st.session_state.current_expression = "neutral"
-
-            # Check ending conditions
-            if st.session_state.affection <= 0:
-                st.session_state.screen = "ending"
-                st.session_state.ending_type = "failure"
-            elif st.session_state.affection >= 100:
+            state = game_state()
+            if engine.advance(state):
                 st.session_state.screen = "ending"
-                st.session_state.ending_type = "success"
-            elif st.session_state.current_q_idx >= st.session_state.get("total_questions", 12):
-                # Game finished - check final affection
-                if st.session_state.affection >= 80:
-                    st.session_state.screen = "ending"
-                    st.session_state.ending_type = "success"
-                else:
-                    st.session_state.screen = "ending"
-                    st.session_state.ending_type = "failure"
+            store_game_state(state)
+            st.session_state.current_expression = "neutral"
 
+            save_checkpoint()
             st.rerun()
     else:
         # Answer options
+        if get_reply_engine() == "llm" and get_reply_mode() == "batch":
+            prefetch_replies(question, mbti_traits)
         st.markdown('<p class="options-label">💭 선택지</p>', unsafe_allow_html=True)
         for i, option in enumerate(question["options"]):
-            if st.button(option["text"], key=f"option_{i}", use_container_width=True):
-                # Calculate grade based on MBTI match
-                tags = option.get("tags", [])
-                grade, delta = calculate_grade(st.session_state.mbti, tags)
-
-                # Update affection
-                st.session_state.affection = max(0, min(100, st.session_state.affection + delta))
-
-                # Update expression
-                expr_key, expr_name = EXPRESSIONS.get(grade, ("neutral", ""))
-                st.session_state.current_expression = expr_key
-
-                # Log the choice
-                st.session_state.log.append({
-                    "question": question["q"],
-                    "answer": option["text"],
-                    "grade": grade,
-                    "delta": delta
-                })
-
-                # Generate AI response
-                response = None
-                try:
-                    response = generate_response(
-                        st.session_state.mbti,
-                        mbti_traits,
-                        question["q"],
-                        option["text"],
-                        grade
-                    )
-                except Exception:
-                    pass
-
-                # Fallback response if API fails
-                if not response:
-                    if grade == "good":
-                        response = f"{player_name}, 정말 좋아! 그렇게 생각해줘서 고마워 💕"
-                    elif grade == "ok":
-                        response = f"음, 그렇구나~ 괜찮아, {player_name}!"
-                    else:
-                        response = f"{player_name}... 음... 그건 좀 아쉽네..."
-
-                st.session_state.last_response = response
-                st.session_state.last_grade = grade
-                st.session_state.show_response = True
-                st.rerun()
+            # Keyed by question too, so a stale click never lands on the next question
+            if st.button(option["text"], key=f"option_{st.session_state.current_q_idx}_{i}", use_container_width=True):
+                answer_question(option=i)
+
+        # Free-text answer, graded locally against the options
+        with st.form(f"free_answer_{st.session_state.current_q_idx}", clear_on_submit=True, border=False):
+            text = st.text_input("✍️ 직접 답하기", max_chars=FREE_ANSWER_MAX_CHARS,
+                                 placeholder="선택지 대신 내 말로 답해보세요")
+            if st.form_submit_button("보내기", use_container_width=True) and text.strip():
+                answer_question(text=text)
+
+    # Poll until the expression the character should be showing, or a late reply, arrives
+    waiting_for_image = generating and not st.session_state.character_images.get(st.session_state.current_expression)
+    if waiting_for_image or awaiting_reply:
+        time.sleep(JOB_POLL_INTERVAL)
+        st.rerun()
 
 
+@timed()
 def render_ending_screen():
     """Render the ending screen."""
     is_success = st.session_state.ending_type == "success"
@@ -1114,39 +1734,357 @@ def render_ending_screen():
         </div>
         """, unsafe_allow_html=True)
 
+        event_log = get_event_log()
         for i, log in enumerate(st.session_state.log):
+            if log["option"] is None:
+                share_text = "직접 입력한 답변"
+            else:
+                # Share of other players who picked the same option
+                share = event_log.choice_share(log["question_id"], log["option"])
+                share_text = f"다른 플레이어 {share:.0%}가 같은 선택" if share is not None else "이 질문에 처음 답한 플레이어"
             grade_emoji = "😊" if log["grade"] == "good" else "🙂" if log["grade"] == "ok" else "😤"
             grade_color = "#4a7c59" if log["grade"] == "good" else "#7c6b4a" if log["grade"] == "ok" else "#7c4a5a"
             st.markdown(f"""
             <div style="background: #ffffff; padding: 12px 16px; border-radius: 10px; margin: 8px 0; border-left: 3px solid {grade_color};">
                 <p style="margin: 0; color: #581c87; font-weight: 600;">Q{i+1}. {log['question']}</p>
                 <p style="margin: 6px 0 0 0; color: #6b5b7a;">→ {log['answer']} {grade_emoji} <span style="color: {grade_color};">({log['delta']:+d})</span></p>
+                <p style="margin: 4px 0 0 0; color: #9b8aa8; font-size: 13px;">👥 {share_text}</p>
             </div>
             """, unsafe_allow_html=True)
 
     st.markdown('<p class="ending-divider">• • •</p>', unsafe_allow_html=True)
 
-    # Restart button
-    if st.button("🔄 로비로 돌아가기", use_container_width=True, type="primary"):
-        # Clear session state
-        for key in list(st.session_state.keys()):
-            del st.session_state[key]
+    # Restart buttons
+    if st.button("💞 같은 상대와 다시 만나기", use_container_width=True, type="primary"):
+        replay_same_character()
+    if st.button("🔄 로비로 돌아가기", use_container_width=True):
+        reset_to_lobby()
+
+
+def cast_portrait(index: int) -> str:
+    """``<img>`` tag for a cast member's current expression, or a placeholder."""
+    member = st.session_state.cast[index]
+    images = st.session_state.cast_images[index]
+    expr = member["expression"] if images.get(member["expression"]) else "neutral"
+    ref = member["image_refs"].get(expr)
+    if not images.get(expr) or not ref:
+        return '<div style="font-size: 40px; padding: 40px 0; text-align: center;">💭</div>'
+    known = st.session_state.setdefault("character_image_urls", {})
+    if ref not in known:
+        known[ref] = portrait_url(ref, images[expr])
+    return (
+        f'<img src="{known[ref]}" style="width: 100%; border-radius: 14px; '
+        f'box-shadow: 0 4px 12px rgba(156, 39, 176, 0.2); border: 2px solid #f8bbd9;">'
+    )
+
+
+def render_cast_panel(index: int, state: GameState, mbti_traits: dict, reply_pending: bool):
+    """One character's column: portrait, affection and reaction to the last answer."""
+    member = st.session_state.cast[index]
+    mbti_name = mbti_traits.get(member["mbti"], {}).get("name", "")
+    affection = state.affection
+    color = "#9b8aa8" if affection < 30 else "#e4a0b7" if affection < 70 else "#f06292"
+    status = ""
+    if state.ending_type == "success":
+        status = '<p style="color: #d81b60; font-weight: 600; margin: 6px 0;">💘 마음을 얻었어요!</p>'
+    elif state.ending_type:
+        status = '<p style="color: #7c4a5a; font-weight: 600; margin: 6px 0;">👋 자리를 떠났어요</p>'
+
+    st.markdown(f"""
+    <div style="text-align: center; opacity: {0.55 if state.ending_type == "failure" else 1};">
+        {cast_portrait(index)}
+        <p style="margin: 8px 0 0 0; color: #6b5b7a; font-weight: 700;">{member["name"]}</p>
+        <p style="margin: 0; color: #9575cd; font-size: 13px;">{member["mbti"]} · {mbti_name}</p>
+        <div style="background: #f3e5f5; border-radius: 8px; height: 10px; margin: 8px 0; overflow: hidden;">
+            <div style="background: {color}; height: 100%; width: {affection}%;"></div>
+        </div>
+        <p style="margin: 0; color: #5c4a6b; font-size: 13px;">호감도 {affection}/100</p>
+        {status}
+    </div>
+    """, unsafe_allow_html=True)
+
+    if state.answered and member["last_response"]:
+        expr_name = EXPRESSIONS.get(member["last_grade"], ("neutral", ""))[1]
+        typing = " 💬" if reply_pending else ""
+        st.markdown(f"""
+        <div style="background: #fff0f5; padding: 12px; border-radius: 12px; margin: 8px 0; color: #3d3450; font-size: 14px; border-left: 3px solid #f8bbd9;">
+            <span style="color: #9b8aa8;">({expr_name}){typing}</span><br>{member["last_response"]}
+        </div>
+        """, unsafe_allow_html=True)
+
+
+@timed()
+def render_speed_creating_screen():
+    """Render cast creation, showing each character as soon as their portrait exists."""
+    ss = st.session_state
+    job = get_job_queue().get(ss.get("cast_job_id"))
+    if job is None and not all(images.get("neutral") for images in ss.cast_images):
+        # Resumed on a server that does not know the job - resubmit it
+        try:
+            job = submit_cast_job()
+        except QueueFullError:
+            render_generation_error()
+            return
+    generating = sync_cast_images()
+
+    # The first question only needs every character's neutral portrait
+    if all(images.get("neutral") for images in ss.cast_images):
+        if job:
+            metrics.observe("start.time_to_game", time.time() - job.created_at)
+        ss.screen = "speed_game"
+        save_checkpoint()
+        st.rerun()
+    if not generating:
+        render_generation_error()
+        return
+
+    render_loading_screen(
+        "스피드 데이팅 상대들을 준비하는 중",
+        sub_message=random.Random(job.id).choice(LOADING_MESSAGES)
+    )
+    done = sum(1 for state in job.stages.values() if state != "pending")
+    st.progress(job.progress, text=f"{done}/{len(job.stages)} 완료")
+    for index, column in enumerate(st.columns(len(ss.cast))):
+        with column:
+            st.markdown(cast_portrait(index), unsafe_allow_html=True)
+            st.markdown(
+                f'<p style="text-align: center; color: #7b1fa2; margin: 4px 0;">{ss.cast[index]["mbti"]}</p>',
+                unsafe_allow_html=True
+            )
+
+    time.sleep(JOB_POLL_INTERVAL)
+    st.rerun()
+
+
+@timed()
+def render_speed_game_screen():
+    """Render the speed-dating table: one shared question, a panel per character."""
+    ss = st.session_state
+    engine = get_engine()
+    states = cast_states()
+    mbti_traits = engine.content_for(states[0]).mbti_traits
+    generating = sync_cast_images()
+    awaiting_replies = sync_cast_replies()
+
+    st.markdown(GAME_SCREEN_STYLE, unsafe_allow_html=True)
+    st.markdown(f"""
+    <div class="game-header">
+        <div style="display: flex; justify-content: space-between; align-items: center; flex-wrap: wrap; gap: 12px;">
+            <div>
+                <h2 class="char-name">💞 스피드 데이팅</h2>
+                <p class="char-mbti">{len(ss.cast)}명과 동시에 대화 중</p>
+            </div>
+            <div class="question-count">💬 질문 {ss.current_q_idx + 1}/{ss.total_questions}</div>
+        </div>
+    </div>
+    """, unsafe_allow_html=True)
+    _, col = st.columns([3, 1])
+    with col:
+        if st.button("🏠 로비로", use_container_width=True):
+            reset_to_lobby()
+
+    for index, column in enumerate(st.columns(len(ss.cast))):
+        with column:
+            pending = awaiting_replies and ss.cast_replies["futures"][index] is not None
+            render_cast_panel(index, states[index], mbti_traits, pending)
+
+    st.markdown('<p class="game-divider">• • •</p>', unsafe_allow_html=True)
+
+    if ss.show_response:
+        if st.button("다음 질문 →", use_container_width=True, type="primary"):
+            if advance_all(engine, states):
+                ss.screen = "speed_ending"
+            store_cast_states(states)
+            for member in ss.cast:
+                member["expression"] = "neutral"
+            save_checkpoint()
+            st.rerun()
+    else:
+        question = engine.current_question(next(state for state in states if not engine.is_over(state)))
+        st.markdown(f"""
+        <div class="question-card">
+            <p class="question-text">Q{ss.current_q_idx + 1}. {ss.player_name}~ {question['q']}</p>
+        </div>
+        """, unsafe_allow_html=True)
+        st.markdown('<p class="options-label">💭 선택지</p>', unsafe_allow_html=True)
+        for i, option in enumerate(question["options"]):
+            if st.button(option["text"], key=f"option_{ss.current_q_idx}_{i}", use_container_width=True):
+                respond_to_speed_answer(option=i)
+        with st.form(f"free_answer_{ss.current_q_idx}", clear_on_submit=True, border=False):
+            text = st.text_input("✍️ 직접 답하기", max_chars=FREE_ANSWER_MAX_CHARS,
+                                 placeholder="선택지 대신 내 말로 답해보세요")
+            if st.form_submit_button("보내기", use_container_width=True) and text.strip():
+                respond_to_speed_answer(text=text)
+
+    # Poll while portraits or late replies are still arriving
+    if generating or awaiting_replies:
+        time.sleep(JOB_POLL_INTERVAL)
         st.rerun()
 
 
+@timed()
+def render_speed_ending_screen():
+    """Render the speed-dating results, best match first."""
+    ss = st.session_state
+    states = cast_states()
+    st.markdown(GAME_SCREEN_STYLE, unsafe_allow_html=True)
+    winners = sum(1 for state in states if state.ending_type == "success")
+    st.markdown(f"""
+    <div class="game-header" style="text-align: center;">
+        <h2 class="char-name">{"💘 " + str(winners) + "명의 마음을 얻었어요!" if winners else "💔 이번에는 인연이 없었어요"}</h2>
+        <p class="char-mbti">{ss.player_name}님의 스피드 데이팅 결과</p>
+    </div>
+    """, unsafe_allow_html=True)
+
+    ranking = sorted(range(len(states)), key=lambda index: -states[index].affection)
+    for rank, index in enumerate(ranking, start=1):
+        member, state = ss.cast[index], states[index]
+        good = sum(1 for entry in state.log if entry["grade"] == "good")
+        col1, col2 = st.columns([1, 3])
+        with col1:
+            st.markdown(cast_portrait(index), unsafe_allow_html=True)
+        with col2:
+            result = "💘 커플 성사" if state.ending_type == "success" else "💔 아쉬운 이별"
+            st.markdown(f"""
+            <div style="padding: 8px 0;">
+                <p style="margin: 0; color: #581c87; font-weight: 700;">{rank}위 · {member["name"]} ({member["mbti"]})</p>
+                <p style="margin: 6px 0 0 0; color: #6b5b7a;">{result} · 호감도 {state.affection}/100 · 좋은 선택 {good}회</p>
+            </div>
+            """, unsafe_allow_html=True)
+
+    st.markdown('<p class="game-divider">• • •</p>', unsafe_allow_html=True)
+    if st.button("🔄 로비로 돌아가기", use_container_width=True, type="primary"):
+        reset_to_lobby()
+
+
+def debug_enabled() -> bool:
+    """Whether the debug sidebar was requested with ``?debug=...``.
+
+    If a DEBUG_KEY setting exists, the query parameter must match it.
+    """
+    value = st.query_params.get(DEBUG_QUERY_PARAM)
+    if not value:
+        return False
+    key = get_setting("DEBUG_KEY")
+    return not key or value == key
+
+
+def render_debug_sidebar():
+    """Show per-rerun timings, AI latencies and profiler capture controls."""
+    history = st.session_state.setdefault("profile_history", [])
+    with st.sidebar:
+        st.markdown("### 🛠 디버그")
+        if history:
+            last = history[-1]
+            st.caption(f"직전 rerun: {last['total'] * 1000:.1f}ms")
+            st.dataframe(
+                [
+                    {"구간": "· " * depth + name, "ms": round(elapsed * 1000, 2)}
+                    for name, elapsed, depth in last["spans"] if elapsed is not None
+                ],
+                hide_index=True, use_container_width=True
+            )
+
+            totals = {}
+            for record in history:
+                for name, elapsed, _ in record["spans"]:
+                    if elapsed is not None:
+                        totals.setdefault(name, []).append(elapsed)
+            st.caption(f"최근 {len(history)}회 평균")
+            st.dataframe(
+                sorted(
+                    (
+                        {"구간": name, "호출": len(values), "평균 ms": round(sum(values) / len(values) * 1000, 2)}
+                        for name, values in totals.items()
+                    ),
+                    key=lambda row: -row["평균 ms"]
+                ),
+                hide_index=True, use_container_width=True
+            )
+
+        content = get_content()
+        st.caption(f"콘텐츠 버전: {content.current().id} (이 게임: {st.session_state.get('content_version') or '-'})")
+        if content.last_error:
+            st.warning(f"콘텐츠 리로드 실패: {content.last_error}")
+        event_log = get_event_log()
+        free, generated = event_log.count("starts:none"), event_log.count("starts:generated")
+        if free + generated:
+            st.caption(f"AI 비용 없는 게임 시작: {free}/{free + generated} ({free / (free + generated):.0%})")
+
+        snapshot = metrics.snapshot()
+        counters = snapshot["counters"]
+        cancel_rows = [
+            {"레인": lane, "취소(미전송)": counters.get(f"ai.cancelled.{lane}", 0), "낭비(결과 버림)": counters.get(f"ai.wasted.{lane}", 0)}
+            for lane in ("openai.chat", "gemini.image")
+            if counters.get(f"ai.cancelled.{lane}") or counters.get(f"ai.wasted.{lane}")
+        ]
+        if cancel_rows:
+            st.caption("떠난 세션의 AI 호출 (프로세스 전체)")
+            st.dataframe(cancel_rows, hide_index=True, use_container_width=True)
+        if counters.get("answer.duplicate_suppressed"):
+            st.caption(
+                f"중복 답변 차단: {counters['answer.duplicate_suppressed']}회 "
+                f"(다른 선택지 {counters.get('answer.duplicate_conflicting', 0)}회)"
+            )
+        profile_counts = ", ".join(
+            f"{name} {counters[f'image.profile.{name}']}회"
+            for name in PROFILE_ORDER if counters.get(f"image.profile.{name}")
+        )
+        st.caption(
+            f"이미지 프로필: {get_profile()['name']} (자동 하향 {counters.get('image.profile.downgraded', 0)}회)"
+            + (f" · 생성 {profile_counts}" if profile_counts else "")
+        )
+
+        series = snapshot["series"]
+        ai_rows = [
+            {"호출": name, "횟수": summary["count"], "p50 ms": round(summary["p50"] * 1000), "p90 ms": round(summary["p90"] * 1000)}
+            for name, summary in series.items() if "latency" in name or "queue_wait" in name
+        ]
+        if ai_rows:
+            st.caption("AI 호출 지연과 대기열 대기 (프로세스 전체)")
+            st.dataframe(ai_rows, hide_index=True, use_container_width=True)
+
+        capture = st.session_state.get("profile_capture")
+        if capture and not capture.done:
+            st.info(f"{capture.mode} 캡처 중... 남은 rerun {capture.remaining}회")
+            return
+        if capture and capture.path:
+            st.success(f"저장됨: {capture.path}")
+            st.code(capture.report)
+        mode = st.selectbox("프로파일러", PROFILE_MODES, key="debug_profile_mode")
+        reruns = st.number_input("캡처할 rerun 수", min_value=1, max_value=50, value=5, key="debug_profile_reruns")
+        if st.button("다음 rerun 캡처", key="debug_profile_start"):
+            st.session_state.profile_capture = Capture(mode, int(reruns))
+            st.rerun()
 
 
 def main():
     """Main application entry point."""
     init_session_state()
-
-    # Route to appropriate screen
-    if st.session_state.screen == "start":
-        render_start_screen()
-    elif st.session_state.screen == "game":
-        render_game_screen()
-    elif st.session_state.screen == "ending":
-        render_ending_screen()
+    if st.session_state.get("session_token"):
+        # Sessions that stop rerunning (closed tab) have their AI work cancelled
+        get_cancellation().touch(st.session_state.session_token)
+
+    debug = debug_enabled()
+    if debug:
+        render_debug_sidebar()
+
+    with rerun(debug, st.session_state.get("profile_history"), st.session_state.get("profile_capture")):
+        # Route to appropriate screen
+        if st.session_state.screen == "start":
+            render_start_screen()
+        elif st.session_state.screen == "creating":
+            render_creating_screen()
+        elif st.session_state.screen == "game":
+            render_game_screen()
+        elif st.session_state.screen == "ending":
+            render_ending_screen()
+        elif st.session_state.screen == "speed_creating":
+            render_speed_creating_screen()
+        elif st.session_state.screen == "speed_game":
+            render_speed_game_screen()
+        elif st.session_state.screen == "speed_ending":
+            render_speed_ending_screen()
 
 
 if __name__ == "__main__":
@@ -0,0 +1 @@
+"""Benchmarks, load tools and local stand-in servers for development."""
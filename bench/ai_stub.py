@@ -0,0 +1,271 @@
+"""Local stand-ins for the OpenAI and Gemini HTTP APIs.
+
+Serves just enough of ``/v1/chat/completions`` and
+``/v1beta/models/<model>:generateContent`` for ``utils.ai_client`` to run
+offline, with configurable latency, jitter and error rate per endpoint.
+
+Usage:
+    python -m bench.ai_stub --port 8765 --chat-latency 0.4 --image-latency 2
+    OPENAI_BASE_URL=http://127.0.0.1:8765/v1 \\
+    GEMINI_BASE_URL=http://127.0.0.1:8765 streamlit run app.py
+"""
+
+import argparse
+import base64
+import json
+import random
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from io import BytesIO
+
+from PIL import Image, ImageDraw
+
+
+STUB_REPLIES = [
+    "그렇구나, 네 얘기 들으니까 좀 더 알고 싶어졌어.",
+    "음, 나쁘지 않네. 다음엔 어떤 대답을 할지 궁금해.",
+    "와, 그거 진짜 좋다! 우리 잘 맞는 것 같아.",
+    "흠... 솔직히 그건 좀 의외야. 그래도 말해줘서 고마워.",
+]
+
+# Distinct images per shape kept by a stub drawing grainy images
+GRAIN_VARIANTS = 8
+# Height of the image for an ImageConfig imageSize ("1K" and up)
+IMAGE_SIZES = {"1K": 1024, "2K": 2048, "4K": 4096}
+
+
+class EndpointConfig:
+    """Simulated behavior of one endpoint."""
+
+    def __init__(self, latency: float = 0.0, jitter: float = 0.0, error_rate: float = 0.0):
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+
+    def delay(self, rng: random.Random) -> float:
+        return max(0.0, self.latency + rng.uniform(-self.jitter, self.jitter))
+
+
+class AIStubServer(ThreadingHTTPServer):
+    """Threaded HTTP server imitating the OpenAI and Gemini APIs."""
+
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, address, chat: EndpointConfig = None, image: EndpointConfig = None,
+                 seed: int = 0, image_size: int = 256, image_grain: float = 0.0):
+        super().__init__(address, _AIStubHandler)
+        self.chat = chat or EndpointConfig()
+        self.image = image or EndpointConfig()
+        self.image_size = image_size
+        self.image_grain = image_grain
+        self._grain = {}
+        self._rendered = {}
+        self.rng = random.Random(seed)
+        self.lock = threading.Lock()
+        self.requests = {"chat": 0, "image": 0, "errors": 0}
+
+    @property
+    def url(self) -> str:
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def next_random(self, fn):
+        with self.lock:
+            return fn(self.rng)
+
+    def grain(self, size: tuple) -> Image.Image:
+        """Fixed noise texture of ``size`` (the same for every image of that size)."""
+        with self.lock:
+            if size not in self._grain:
+                noise = Image.effect_noise(size, 64)
+                self._grain[size] = Image.merge("RGB", (noise, noise, noise))
+            return self._grain[size]
+
+    def rendered(self, key: tuple, render) -> bytes:
+        """Reuse one of GRAIN_VARIANTS renders per ``key`` once they exist.
+
+        Grainy renders cost far more CPU than a provider call costs the
+        caller, and would make the stub the bottleneck under load.
+        """
+        with self.lock:
+            variants = self._rendered.setdefault(key, [])
+            if len(variants) >= GRAIN_VARIANTS:
+                return self.rng.choice(variants)
+        data = render()
+        with self.lock:
+            variants.append(data)
+        return data
+
+
+class _AIStubHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length", 0))
+        body = json.loads(self.rfile.read(length) or b"{}")
+        server = self.server
+
+        if self.path.endswith("/chat/completions"):
+            kind, config = "chat", server.chat
+        elif ":generateContent" in self.path:
+            kind, config = "image", server.image
+        else:
+            self._send(404, {"error": {"message": f"Unknown path {self.path}"}})
+            return
+
+        delay, roll = server.next_random(lambda rng: (config.delay(rng), rng.random()))
+        time.sleep(delay)
+        with server.lock:
+            server.requests[kind] += 1
+            if roll < config.error_rate:
+                server.requests["errors"] += 1
+
+        if roll < config.error_rate:
+            self._send(503, {"error": {"code": 503, "message": "Stub overloaded", "status": "UNAVAILABLE"}})
+        elif kind == "chat":
+            self._send(200, self._chat_response(body))
+        else:
+            self._send(200, self._image_response(body))
+
+    def _chat_response(self, body: dict) -> dict:
+        if (body.get("response_format") or {}).get("type") == "json_object":
+            # Batched replies: one per "[n]" option line in the prompt
+            prompt = body["messages"][-1]["content"]
+            count = len(re.findall(r"^\[\d+\]", prompt, re.MULTILINE))
+            replies = self.server.next_random(lambda rng: [rng.choice(STUB_REPLIES) for _ in range(count)])
+            reply = json.dumps({str(n): text for n, text in enumerate(replies, 1)}, ensure_ascii=False)
+        else:
+            reply = self.server.next_random(lambda rng: rng.choice(STUB_REPLIES))
+        prompt_tokens = sum(len(m.get("content", "")) for m in body.get("messages", [])) // 2
+        return {
+            "id": "chatcmpl-stub",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": body.get("model", "stub"),
+            "choices": [{
+                "index": 0,
+                "message": {"role": "assistant", "content": reply},
+                "finish_reason": "stop"
+            }],
+            "usage": {
+                "prompt_tokens": prompt_tokens,
+                "completion_tokens": len(reply) // 2,
+                "total_tokens": prompt_tokens + len(reply) // 2
+            }
+        }
+
+    def _image_response(self, body: dict) -> dict:
+        text = json.dumps(body.get("contents", ""), ensure_ascii=False)
+        panels = 3 if "THREE portraits" in text else 1
+        image_config = (body.get("generationConfig") or {}).get("imageConfig") or {}
+        key = (panels, image_config.get("aspectRatio"), image_config.get("imageSize"))
+        if self.server.image_grain:
+            data = self.server.rendered(key, lambda: _render_portrait(self.server, *key))
+        else:
+            data = _render_portrait(self.server, *key)
+        return {
+            "candidates": [{
+                "content": {
+                    "role": "model",
+                    "parts": [{"inlineData": {"mimeType": "image/png", "data": base64.b64encode(data).decode("ascii")}}]
+                },
+                "finishReason": "STOP"
+            }]
+        }
+
+    def _send(self, status: int, payload: dict):
+        data = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+
+def _render_portrait(server: AIStubServer, panels: int, aspect_ratio: str = None, image_size: str = None) -> bytes:
+    """Draw a simple face portrait (or a sheet of ``panels`` faces) as PNG.
+
+    Without ``aspect_ratio`` each panel is square; ``image_size`` overrides
+    the server's image height.
+    """
+    size = IMAGE_SIZES.get(image_size, server.image_size)
+    width = size * panels
+    if aspect_ratio:
+        w, h = (int(n) for n in aspect_ratio.split(":"))
+        width = round(size * w / h)
+    # Per panel: x scale (panel width) and y scale (image height)
+    sx, sy = width // panels, size
+    background = server.next_random(lambda rng: tuple(rng.randint(180, 250) for _ in range(3)))
+    image = Image.new("RGB", (width, size), background)
+    draw = ImageDraw.Draw(image)
+    for i in range(panels):
+        x = i * sx
+        draw.ellipse((x + sx * 0.2, sy * 0.15, x + sx * 0.8, sy * 0.85), fill=(250, 220, 200))
+        draw.ellipse((x + sx * 0.35, sy * 0.4, x + sx * 0.42, sy * 0.47), fill=(40, 30, 30))
+        draw.ellipse((x + sx * 0.58, sy * 0.4, x + sx * 0.65, sy * 0.47), fill=(40, 30, 30))
+        mouth = [(0, 180), (200, 340), (10, 170)][i % 3]
+        if i % 3:
+            # Puffed cheeks / blush so expressions differ visibly
+            blush = sx * (0.06 if i % 3 == 1 else 0.04)
+            for cx in (0.3, 0.7):
+                draw.ellipse((x + sx * cx - blush, sy * 0.58 - blush, x + sx * cx + blush, sy * 0.58 + blush), fill=(245, 150, 160))
+        draw.arc((x + sx * 0.38, sy * 0.55, x + sx * 0.62, sy * 0.72), *mouth, fill=(200, 40, 60), width=4)
+    if server.image_grain:
+        # Texture like a rendered image, so encoded size grows with resolution
+        image = Image.blend(image, server.grain(image.size), server.image_grain)
+    buffer = BytesIO()
+    # Grainy images are large; fast compression keeps the stub's own CPU time low
+    image.save(buffer, format="PNG", compress_level=1 if server.image_grain else 6)
+    return buffer.getvalue()
+
+
+def start_ai_stub(host: str = "127.0.0.1", port: int = 0, **kwargs) -> AIStubServer:
+    """Start a stub server on a background thread (port 0 picks a free port)."""
+    server = AIStubServer((host, port), **kwargs)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def add_stub_arguments(parser: argparse.ArgumentParser):
+    """Add latency/jitter/error-rate options shared by tools that start a stub."""
+    parser.add_argument("--chat-latency", type=float, default=0.3, help="seconds per chat completion")
+    parser.add_argument("--chat-jitter", type=float, default=0.1)
+    parser.add_argument("--chat-error-rate", type=float, default=0.0)
+    parser.add_argument("--image-latency", type=float, default=1.0, help="seconds per image call")
+    parser.add_argument("--image-jitter", type=float, default=0.2)
+    parser.add_argument("--image-error-rate", type=float, default=0.0)
+    parser.add_argument("--image-px", type=int, default=256, help="height of generated images")
+    parser.add_argument("--image-grain", type=float, default=0.0, help="noise texture blended in (0-1)")
+    parser.add_argument("--stub-seed", type=int, default=0)
+
+
+def stub_kwargs(args) -> dict:
+    """Keyword arguments for start_ai_stub from parsed add_stub_arguments options."""
+    return {
+        "chat": EndpointConfig(args.chat_latency, args.chat_jitter, args.chat_error_rate),
+        "image": EndpointConfig(args.image_latency, args.image_jitter, args.image_error_rate),
+        "seed": args.stub_seed,
+        "image_size": args.image_px,
+        "image_grain": args.image_grain
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    add_stub_arguments(parser)
+    args = parser.parse_args()
+    server = AIStubServer((args.host, args.port), **stub_kwargs(args))
+    print(f"AI stub listening on {server.url}")
+    server.serve_forever()
+
+
+if __name__ == "__main__":
+    main()
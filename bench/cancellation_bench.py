@@ -0,0 +1,142 @@
+"""Wasted AI calls when players leave, with and without cancellation.
+
+Simulates players who start creating a character and go back to the lobby
+partway through, and players who answer before their reply prefetch
+finished and then leave while the reply is still being generated. Each
+scenario runs with AI_CANCELLATION=off (work runs to completion, the
+previous behavior) and on, and reports per lane the provider calls made,
+the calls wasted (finished after the player left) and the calls cancelled
+before being sent. Provider slots are kept low (rate-limited provider) so
+calls queue, which is where cancellation pays off: calls already sent are
+left to finish either way. Runs against the AI stub process unless
+OPENAI_BASE_URL is already set.
+
+Usage:
+    python -m bench.cancellation_bench --players 20
+    python -m bench.cancellation_bench --players 40 --image-latency 1.0 --chat-latency 0.5
+"""
+
+import argparse
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor, wait
+from pathlib import Path
+
+from .ai_stub import add_stub_arguments
+from .loadtest import _start_stub
+
+
+PROJECT_ROOT = Path(__file__).parent.parent
+LANES = ("gemini.image", "openai.chat")
+
+
+def play(index: int, run_id: str, args, rng: random.Random):
+    """One player: character creation, a prefetch and a reply, leaving early."""
+    from utils.ai_client import generate_character_images, generate_response, generate_responses
+    from utils.cancellation import cancel_session
+    from utils.content import get_content
+    from utils.jobs import get_job_queue
+    from utils.replies import submit_prefetch, submit_reply
+    from utils.scheduler import ai_context
+
+    session = f"{run_id}-{index}"
+    appearance = {"gender": "여성", "hair": session}
+    content = get_content().current()
+    question = content.questions.get(content.questions.sample_ids(1, rng=rng)[0])
+    options = [(option["text"], "ok") for option in question["options"]]
+
+    with ai_context("interactive", session=session, scope="character"):
+        job = get_job_queue().submit(
+            session,
+            lambda job: generate_character_images(appearance, "INFP", should_cancel=lambda: job.cancelled)
+        )
+    # Leaves somewhere during creation (neutral plus two edits)
+    time.sleep(rng.uniform(0, 3 * args.image_latency))
+    get_job_queue().cancel(job.id)
+    cancel_session(session, reason="lobby")
+
+    # Answers before the prefetch is back, then leaves while the reply runs
+    session = f"{session}-game"
+    with ai_context("speculative", session=session, scope="prefetch"):
+        prefetch = submit_prefetch(generate_responses, "INFP", content.mbti_traits, question["q"], options)
+    time.sleep(rng.uniform(0, args.chat_latency))
+    if not prefetch.done():
+        cancel_session(session, "prefetch", reason="superseded")
+    with ai_context("interactive", session=session, scope="reply"):
+        reply = submit_reply(generate_response, "INFP", content.mbti_traits, question["q"], options[0][0], "ok")
+    time.sleep(rng.uniform(0, 2 * args.chat_latency))
+    cancel_session(session, reason="lobby")
+    return [reply, prefetch]
+
+
+def run(args, mode: str) -> dict:
+    from utils import metrics
+
+    os.environ["AI_CANCELLATION"] = mode
+    metrics.reset()
+    rng = random.Random(args.seed)
+    run_id = f"{mode}-{time.time_ns()}"
+    with ThreadPoolExecutor(max_workers=args.players) as pool:
+        players = [pool.submit(play, index, run_id, args, random.Random(rng.random())) for index in range(args.players)]
+        futures = [future for player in players for future in player.result()]
+    wait(futures)
+    # Let character jobs finish their last calls
+    from utils.jobs import get_job_queue
+    while get_job_queue().depth:
+        time.sleep(0.1)
+
+    counters = metrics.snapshot()["counters"]
+    result = {}
+    for lane in LANES:
+        result[lane] = {
+            "wasted": counters.get(f"ai.wasted.{lane}", 0),
+            "cancelled": counters.get(f"ai.cancelled.{lane}", 0)
+        }
+    result["calls"] = sum(counters.get(f"ai.calls.{priority}", 0) for priority in ("interactive", "speculative", "batch"))
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--players", type=int, default=20)
+    parser.add_argument("--chat-slots", type=int, default=4, help="concurrent chat calls (AI_CHAT_SLOTS)")
+    parser.add_argument("--image-slots", type=int, default=2, help="concurrent image calls (AI_IMAGE_SLOTS)")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--output", help="write JSON results to this file")
+    add_stub_arguments(parser)
+    args = parser.parse_args()
+
+    stub = None if os.environ.get("OPENAI_BASE_URL") else _start_stub(args)
+    os.environ.setdefault("OPENAI_API_KEY", "stub")
+    os.environ.setdefault("GEMINI_API_KEY", "stub")
+    os.environ.setdefault("DATA_DIR", tempfile.mkdtemp(prefix="matchplay-cancel-"))
+    # Every call goes to the provider
+    os.environ["REPLY_CACHE_VARIANTS"] = "0"
+    os.environ["REPLY_MODE"] = "batch"
+    os.environ["JOB_QUEUE_DEPTH"] = str(max(32, 2 * args.players))
+    os.environ["JOB_WORKERS"] = str(args.players)
+    os.environ["AI_CHAT_SLOTS"] = str(args.chat_slots)
+    os.environ["AI_IMAGE_SLOTS"] = str(args.image_slots)
+    sys.path.insert(0, str(PROJECT_ROOT))
+
+    try:
+        result = {mode: run(args, mode) for mode in ("off", "on")}
+    finally:
+        if stub:
+            stub.terminate()
+    for mode, row in result.items():
+        lanes = "  ".join(
+            f"{lane}: wasted={row[lane]['wasted']} cancelled={row[lane]['cancelled']}" for lane in LANES
+        )
+        print(f"cancellation {mode:>3}: provider calls={row['calls']}  {lanes}")
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(result, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,156 @@
+"""Throughput benchmark for the headless game engine and its JSON API.
+
+Plays complete seeded games (new_game -> answer/advance until the ending)
+with replies from the local reply engine, so no AI calls are made.
+``--http`` drives the same games through ``api.py`` with keep-alive
+client threads instead of calling the engine directly.
+
+Usage:
+    python -m bench.engine_bench --games 5000
+    python -m bench.engine_bench --games 2000 --http --clients 8
+"""
+
+import argparse
+import http.client
+import json
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+
+PROJECT_ROOT = Path(__file__).parent.parent
+
+
+def play_engine_game(engine, rng: random.Random, with_reply: bool = True) -> int:
+    """Play one game directly on the engine; returns the number of answers."""
+    state = engine.new_game(rng=rng)
+    answers = 0
+    while not engine.is_over(state):
+        question = engine.current_question(state)
+        entry = engine.answer(state, rng.randrange(len(question["options"])))
+        if with_reply:
+            engine.reply(state, entry)
+        engine.advance(state)
+        answers += 1
+    return answers
+
+
+def play_http_game(conn: http.client.HTTPConnection, rng: random.Random) -> int:
+    """Play one game through the JSON API; returns the number of answers."""
+    def call(method, path, body=None):
+        conn.request(method, path, body=json.dumps(body or {}), headers={"Content-Type": "application/json"})
+        response = conn.getresponse()
+        payload = json.loads(response.read())
+        if response.status >= 300:
+            raise RuntimeError(f"{method} {path}: {response.status} {payload}")
+        return payload
+
+    view = call("POST", "/games")
+    game = f"/games/{view['game_id']}"
+    answers = 0
+    while not view["ending"]:
+        call("POST", f"{game}/answer", {"option": rng.randrange(len(view["question"]["options"]))})
+        view = call("POST", f"{game}/advance")
+        answers += 1
+    call("DELETE", game)
+    return answers
+
+
+def run_engine(args) -> dict:
+    from utils.engine import GameEngine
+    from utils.events import get_event_log
+
+    engine = GameEngine(event_log=get_event_log() if args.events else None)
+    rng = random.Random(args.seed)
+    for _ in range(args.warmup):
+        play_engine_game(engine, rng)
+
+    started = time.perf_counter()
+    answers = sum(play_engine_game(engine, rng, not args.no_reply) for _ in range(args.games))
+    return _result(args.games, answers, time.perf_counter() - started)
+
+
+def run_http(args) -> dict:
+    from api import start_api_server
+
+    server = start_api_server()
+    host, port = server.server_address[:2]
+    per_client = [args.games // args.clients + (i < args.games % args.clients) for i in range(args.clients)]
+    totals = [0] * args.clients
+    errors = []
+
+    def client(index: int):
+        conn = http.client.HTTPConnection(host, port)
+        rng = random.Random(args.seed + index)
+        try:
+            for _ in range(per_client[index]):
+                totals[index] += play_http_game(conn, rng)
+        except Exception as e:
+            errors.append(str(e))
+        finally:
+            conn.close()
+
+    warm = http.client.HTTPConnection(host, port)
+    for _ in range(args.warmup):
+        play_http_game(warm, random.Random(-1))
+    warm.close()
+
+    threads = [threading.Thread(target=client, args=(i,)) for i in range(args.clients)]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+    server.shutdown()
+    result = _result(args.games, sum(totals), elapsed)
+    result["clients"] = args.clients
+    result["errors"] = errors[:5]
+    return result
+
+
+def _result(games: int, answers: int, elapsed: float) -> dict:
+    return {
+        "games": games,
+        "answers": answers,
+        "seconds": elapsed,
+        "games_per_s": games / elapsed,
+        "answers_per_s": answers / elapsed,
+        "us_per_answer": elapsed / max(1, answers) * 1e6
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--games", type=int, default=5000)
+    parser.add_argument("--warmup", type=int, default=50)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--http", action="store_true", help="play through the JSON API")
+    parser.add_argument("--clients", type=int, default=4, help="concurrent API clients (--http)")
+    parser.add_argument("--events", action="store_true", help="emit gameplay events")
+    parser.add_argument("--no-reply", action="store_true", help="skip composing replies")
+    parser.add_argument("--output", help="write JSON results to this file")
+    args = parser.parse_args()
+
+    os.environ.setdefault("DATA_DIR", tempfile.mkdtemp(prefix="matchplay-engine-"))
+    os.environ["REPLY_ENGINE"] = "local"
+    sys.path.insert(0, str(PROJECT_ROOT))
+
+    result = run_http(args) if args.http else run_engine(args)
+    result["mode"] = "http" if args.http else "engine"
+    print(
+        f"{result['mode']}: {result['games']} games in {result['seconds']:.2f}s  "
+        f"games/s={result['games_per_s']:.0f}  answers/s={result['answers_per_s']:.0f}  "
+        f"{result['us_per_answer']:.1f}us/answer"
+    )
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(result, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
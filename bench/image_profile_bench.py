@@ -0,0 +1,157 @@
+"""Image generation latency and size per profile, and auto-downgrade under load.
+
+For every profile in ``utils.image_profiles`` generates ``--characters``
+portrait sets (three expressions each) and ``--endings`` ending scenes one
+after another, recording latency, provider calls and the size of the stored
+images. Then a burst of ``--burst`` characters is started at once with the
+configured profile, with auto-downgrade off and on, to show setup latency
+when the image queue is deep. Runs against the AI stub process (drawing
+textured 1024 px images like the real model) unless GEMINI_BASE_URL is
+already set.
+
+Usage:
+    python -m bench.image_profile_bench --characters 5
+    python -m bench.image_profile_bench --burst 24 --image-slots 6 --image-latency 1.0
+"""
+
+import argparse
+import base64
+import json
+import os
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+from .ai_stub import add_stub_arguments
+from .loadtest import _start_stub
+
+
+PROJECT_ROOT = Path(__file__).parent.parent
+EXPRESSIONS = ("neutral", "pout", "big_smile")
+
+
+def _image_bytes(img_base64: str) -> int:
+    return len(base64.b64decode(img_base64)) if img_base64 else 0
+
+
+def profile_row(name: str, args, run_id: str) -> dict:
+    """Sequential portrait and ending generation with one profile."""
+    from utils import metrics
+    from utils.ai_client import generate_character_images, generate_ending_image
+    from utils.image_profiles import get_profile
+
+    profile = get_profile(name)
+    metrics.reset()
+    latencies, sizes = [], []
+    for index in range(args.characters):
+        appearance = {"gender": "여성", "hair": f"{run_id}-{name}-{index}"}
+        started = time.perf_counter()
+        images = generate_character_images(appearance, "INFP", profile=profile)
+        latencies.append(time.perf_counter() - started)
+        sizes.extend(_image_bytes(images.get(expr)) for expr in EXPRESSIONS)
+    calls = metrics.counter("ai.calls.interactive")
+
+    ending_latencies, ending_sizes = [], []
+    for index in range(args.endings):
+        appearance = {"gender": "여성", "hair": f"{run_id}-{name}-ending-{index}"}
+        started = time.perf_counter()
+        image = generate_ending_image(appearance, "INFP", success=index % 2 == 0, profile=profile)
+        ending_latencies.append(time.perf_counter() - started)
+        ending_sizes.append(_image_bytes(image))
+
+    return {
+        "portrait_p50": metrics.percentile(latencies, 50),
+        "portrait_p90": metrics.percentile(latencies, 90),
+        "calls_per_character": calls / args.characters if args.characters else None,
+        "portrait_kb": sum(sizes) / len(sizes) / 1024 if sizes else None,
+        "ending_p50": metrics.percentile(ending_latencies, 50),
+        "ending_kb": sum(ending_sizes) / len(ending_sizes) / 1024 if ending_sizes else None
+    }
+
+
+def burst(args, run_id: str, downgrade: bool) -> dict:
+    """``--burst`` characters started together with the configured profile."""
+    from utils import metrics
+    from utils.ai_client import generate_character_images
+    from utils.image_profiles import IMAGE_PROFILES
+
+    os.environ["IMAGE_PROFILE_DOWNGRADE_DEPTH"] = str(args.downgrade_depth if downgrade else 0)
+    metrics.reset()
+
+    def create(index: int) -> float:
+        appearance = {"gender": "여성", "hair": f"{run_id}-burst-{downgrade}-{index}"}
+        started = time.perf_counter()
+        generate_character_images(appearance, "INFP")
+        return time.perf_counter() - started
+
+    with ThreadPoolExecutor(max_workers=args.burst) as pool:
+        latencies = list(pool.map(create, range(args.burst)))
+    return {
+        "setup_p50": metrics.percentile(latencies, 50),
+        "setup_p90": metrics.percentile(latencies, 90),
+        "calls": metrics.counter("ai.calls.interactive"),
+        "profiles": {
+            name: metrics.counter(f"image.profile.{name}")
+            for name in IMAGE_PROFILES if metrics.counter(f"image.profile.{name}")
+        }
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--characters", type=int, default=5, help="portrait sets per profile")
+    parser.add_argument("--endings", type=int, default=2, help="ending scenes per profile")
+    parser.add_argument("--profiles", nargs="+", help="profiles to measure (default: all)")
+    parser.add_argument("--burst", type=int, default=24, help="characters started at once (0 skips the burst)")
+    parser.add_argument("--profile", default="standard", help="configured profile during the burst")
+    parser.add_argument("--downgrade-depth", type=int, default=6, help="IMAGE_PROFILE_DOWNGRADE_DEPTH when on")
+    parser.add_argument("--image-slots", type=int, default=6, help="concurrent image calls (AI_IMAGE_SLOTS)")
+    parser.add_argument("--output", help="write JSON results to this file")
+    add_stub_arguments(parser)
+    parser.set_defaults(image_px=1024, image_grain=0.1)
+    args = parser.parse_args()
+
+    stub = None if os.environ.get("GEMINI_BASE_URL") else _start_stub(args)
+    os.environ.setdefault("OPENAI_API_KEY", "stub")
+    os.environ.setdefault("GEMINI_API_KEY", "stub")
+    os.environ.setdefault("DATA_DIR", tempfile.mkdtemp(prefix="matchplay-images-"))
+    # Every call goes to the provider
+    os.environ["IMAGE_CACHE_TTL"] = "0"
+    os.environ["AI_IMAGE_SLOTS"] = str(args.image_slots)
+    os.environ["IMAGE_PROFILE"] = args.profile
+    sys.path.insert(0, str(PROJECT_ROOT))
+    from utils.image_profiles import PROFILE_ORDER
+
+    run_id = str(time.time_ns())
+    try:
+        result = {"profiles": {}, "burst": {}}
+        os.environ["IMAGE_PROFILE_DOWNGRADE_DEPTH"] = "0"
+        for name in args.profiles or PROFILE_ORDER:
+            result["profiles"][name] = profile_row(name, args, run_id)
+        if args.burst:
+            result["burst"] = {mode: burst(args, run_id, mode == "on") for mode in ("off", "on")}
+    finally:
+        if stub:
+            stub.terminate()
+
+    for name, row in result["profiles"].items():
+        ending = f"  ending p50={row['ending_p50']:.2f}s {row['ending_kb']:.0f}KB" if row["ending_kb"] else ""
+        print(
+            f"{name:>10}: portraits p50={row['portrait_p50']:.2f}s p90={row['portrait_p90']:.2f}s "
+            f"calls/character={row['calls_per_character']:.1f}  {row['portrait_kb']:.0f}KB/image{ending}"
+        )
+    for mode, row in result["burst"].items():
+        profiles = ", ".join(f"{name}={count}" for name, count in row["profiles"].items())
+        print(
+            f"burst of {args.burst}, downgrade {mode:>3}: setup p50={row['setup_p50']:.2f}s "
+            f"p90={row['setup_p90']:.2f}s  calls={row['calls']}  profiles: {profiles}"
+        )
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(result, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
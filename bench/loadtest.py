@@ -0,0 +1,384 @@
+"""Concurrent-session load test for the Streamlit app.
+
+Drives N simulated players at once through start -> answers -> ending with
+Streamlit's ``AppTest``, while ``utils.ai_client`` talks to a local AI stub
+server (run in a separate process so this process's CPU time is the app's).
+Each concurrency level reports throughput, per-click latency percentiles,
+CPU use and RSS per session; the first level whose p95 click latency exceeds
+``--degrade-factor`` times the single-level baseline is the degradation point.
+
+With ``--record`` the stub traffic is saved to a cassette that ``--replay``
+later serves without the stub (see ``utils.cassette``), so optimizations
+can be compared against identical AI traffic.
+
+Replies come from the local reply engine by default so the chat stub only
+matters with ``--reply-engine llm``. Player choices are seeded, and results carry the run configuration and
+environment, so JSON outputs from different runs can be compared directly.
+
+Usage:
+    python -m bench.loadtest --players 1,4,8,16 --output loadtest.json
+    python -m bench.loadtest --players 8 --baseline loadtest.json
+    python -m bench.loadtest --players 4 --record traffic.jsonl
+    python -m bench.loadtest --players 4 --replay traffic.jsonl --baseline loadtest.json
+"""
+
+import argparse
+import json
+import os
+import platform
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+from .ai_stub import add_stub_arguments
+
+
+PROJECT_ROOT = Path(__file__).parent.parent
+APP_PATH = str(PROJECT_ROOT / "app.py")
+
+MBTI_TYPES = [
+    "INTJ", "INTP", "ENTJ", "ENTP", "INFJ", "INFP", "ENFJ", "ENFP",
+    "ISTJ", "ISFJ", "ESTJ", "ESFJ", "ISTP", "ISFP", "ESTP", "ESFP"
+]
+
+# Safety limit on clicks per simulated game
+MAX_CLICKS = 60
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def _wait_for_port(port: int, timeout: float = 10.0):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            socket.create_connection(("127.0.0.1", port), timeout=0.2).close()
+            return
+        except OSError:
+            time.sleep(0.05)
+    raise RuntimeError(f"Stub server did not start on port {port}")
+
+
+def _rss_bytes() -> int:
+    """Current resident set size of this process."""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError):
+        import resource
+        # ru_maxrss is a peak, in KiB on Linux and bytes on macOS
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak if sys.platform == "darwin" else peak * 1024
+
+
+def _percentiles(values: list) -> dict:
+    from utils.metrics import percentile
+
+    if not values:
+        return {}
+    return {
+        "count": len(values),
+        "p50": percentile(values, 50),
+        "p90": percentile(values, 90),
+        "p95": percentile(values, 95),
+        "p99": percentile(values, 99),
+        "max": max(values)
+    }
+
+
+def share_apptest_runtime():
+    """Let AppTest instances run concurrently in one process, like one server.
+
+    Each ``AppTest.run`` installs its own mock ``Runtime`` singleton and
+    toggles the ``global.appTest`` option, then resets both, so concurrent
+    runs clobber each other. Install one shared mock runtime (which also
+    gives all sessions one ``st.cache_data`` store, as on a real server) and
+    make the per-run swaps no-ops. Runs also share one script cache, as on a
+    real server, which avoids recompiling app.py on every click (concurrent
+    ``compile`` calls are not thread-safe on some CPython versions).
+    """
+    import contextlib
+    from unittest.mock import MagicMock
+
+    from streamlit import config
+    from streamlit.runtime import Runtime
+    from streamlit.runtime.caching.storage.dummy_cache_storage import MemoryCacheStorageManager
+    from streamlit.runtime.dataframe_source_manager import DataframeSourceManager
+    from streamlit.runtime.media_file_manager import MediaFileManager
+    from streamlit.runtime.memory_media_file_storage import MemoryMediaFileStorage
+    from streamlit.runtime.scriptrunner.script_cache import ScriptCache
+    from streamlit.testing.v1 import app_test, local_script_runner
+
+    runtime = MagicMock(spec=Runtime)
+    runtime.media_file_mgr = MediaFileManager(MemoryMediaFileStorage("/mock/media"))
+    runtime.dataframe_source_mgr = DataframeSourceManager()
+    runtime.cache_storage_manager = MemoryCacheStorageManager()
+    Runtime._instance = runtime
+
+    class _PerRunRuntime:
+        """Absorbs AppTest's per-run ``Runtime._instance`` assignments."""
+        _instance = None
+
+    app_test.Runtime = _PerRunRuntime
+    script_cache = ScriptCache()
+    app_test.ScriptCache = lambda: script_cache
+    local_script_runner.ScriptCache = lambda: script_cache
+    config.set_option("global.appTest", True)
+    app_test.patch_config_options = lambda options: contextlib.nullcontext()
+
+
+def _find_button(at, label: str = None, key: str = None):
+    """Return the rendered button with ``label`` or ``key``, or None."""
+    for button in at.button:
+        if (label and button.label == label) or (key and button.key == key):
+            return button
+    return None
+
+
+def play_game(seed: int, timeout: float) -> dict:
+    """Play one full game and time every click.
+
+    Returns:
+        Dictionary with the AppTest instance, per-click timings and errors
+    """
+    from streamlit.testing.v1 import AppTest
+
+    rng = random.Random(seed)
+    at = AppTest.from_file(APP_PATH, default_timeout=timeout)
+    clicks = []
+    errors = []
+
+    def timed(action: str, element=None):
+        started = time.perf_counter()
+        try:
+            if element is None:
+                at.run()
+            else:
+                element.run()
+        except Exception as e:
+            errors.append(f"{action}: {e}")
+        clicks.append((action, time.perf_counter() - started))
+
+    timed("load")
+    at.text_input(key="input_name").input(f"플레이어{seed}")
+    at.selectbox[0].select(rng.choice(MBTI_TYPES))
+    for key in ("gender_select", "face_select", "hair_select", "eyes_select", "outfit_select", "atmosphere_select"):
+        widget = at.selectbox(key=key)
+        widget.select(rng.choice(widget.options))
+    timed("setup")
+
+    start_button = _find_button(at, "💕 시작하기")
+    if start_button is None:
+        errors.append("start: button not rendered")
+    else:
+        timed("start", start_button.click())
+
+    for _ in range(MAX_CLICKS):
+        if errors or at.exception or at.session_state["screen"] != "game":
+            break
+        if at.session_state["show_response"]:
+            button = _find_button(at, "다음 질문 →")
+            action = "next"
+        else:
+            button = _find_button(at, key=f"option_{at.session_state['current_q_idx']}_{rng.randrange(3)}")
+            action = "answer"
+        if button is None:
+            errors.append(f"{action}: button not rendered")
+            break
+        timed(action, button.click())
+
+    errors.extend(str(e.value) for e in at.exception)
+    finished = "screen" in at.session_state and at.session_state["screen"] == "ending"
+    return {"app": at, "clicks": clicks, "errors": errors, "finished": finished}
+
+
+def run_level(players: int, games_per_player: int, seed: int, timeout: float) -> dict:
+    """Run ``players`` concurrent players, each playing ``games_per_player`` games."""
+    rss_before = _rss_bytes()
+    cpu_before = time.process_time()
+    started = time.perf_counter()
+
+    def player(index: int) -> list:
+        return [
+            play_game(seed * 100000 + index * 1000 + game, timeout)
+            for game in range(games_per_player)
+        ]
+
+    with ThreadPoolExecutor(max_workers=players) as pool:
+        results = [game for games in pool.map(player, range(players)) for game in games]
+
+    duration = time.perf_counter() - started
+    cpu_seconds = time.process_time() - cpu_before
+    # Measured while every finished session is still referenced
+    rss_after = _rss_bytes()
+
+    by_action = {}
+    for game in results:
+        for action, elapsed in game["clicks"]:
+            by_action.setdefault(action, []).append(elapsed)
+    interactive = [
+        elapsed for game in results for action, elapsed in game["clicks"]
+        if action in ("answer", "next")
+    ]
+    total_clicks = sum(len(game["clicks"]) for game in results)
+
+    return {
+        "players": players,
+        "games": len(results),
+        "finished": sum(1 for game in results if game["finished"]),
+        "errors": sum(len(game["errors"]) for game in results),
+        "error_samples": [e for game in results for e in game["errors"]][:5],
+        "duration_s": duration,
+        "games_per_s": len(results) / duration,
+        "clicks_per_s": total_clicks / duration,
+        "latency_s": {action: _percentiles(values) for action, values in by_action.items()},
+        "click_latency_s": _percentiles(interactive),
+        "cpu_s": cpu_seconds,
+        "cpu_utilization": cpu_seconds / duration,
+        "rss_mb": rss_after / 2**20,
+        "rss_per_session_mb": (rss_after - rss_before) / 2**20 / max(1, len(results))
+    }
+
+
+def _environment(args) -> dict:
+    import streamlit
+
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            cwd=PROJECT_ROOT, capture_output=True, text=True
+        ).stdout.strip()
+    except OSError:
+        commit = None
+    return {
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "git_commit": commit,
+        "python": platform.python_version(),
+        "streamlit": streamlit.__version__,
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "args": vars(args)
+    }
+
+
+def _start_stub(args) -> subprocess.Popen:
+    port = _free_port()
+    command = [
+        sys.executable, "-m", "bench.ai_stub", "--port", str(port),
+        "--chat-latency", str(args.chat_latency), "--chat-jitter", str(args.chat_jitter),
+        "--chat-error-rate", str(args.chat_error_rate),
+        "--image-latency", str(args.image_latency), "--image-jitter", str(args.image_jitter),
+        "--image-error-rate", str(args.image_error_rate), "--stub-seed", str(args.stub_seed),
+        "--image-px", str(args.image_px), "--image-grain", str(args.image_grain)
+    ]
+    process = subprocess.Popen(command, cwd=PROJECT_ROOT, stdout=subprocess.DEVNULL)
+    _wait_for_port(port)
+    url = f"http://127.0.0.1:{port}"
+    os.environ["OPENAI_BASE_URL"] = f"{url}/v1"
+    os.environ["GEMINI_BASE_URL"] = url
+    return process
+
+
+def configure_environment(args):
+    """Point the app at stub backends and an isolated data directory."""
+    os.environ.setdefault("OPENAI_API_KEY", "stub")
+    os.environ.setdefault("GEMINI_API_KEY", "stub")
+    os.environ["DATA_DIR"] = args.data_dir or tempfile.mkdtemp(prefix="matchplay-load-")
+    os.environ["JOB_QUEUE_DEPTH"] = str(max(64, 4 * max(args.players)))
+    os.environ["REPLY_ENGINE"] = args.reply_engine
+    if args.record or args.replay:
+        os.environ["AI_CASSETTE_MODE"] = "record" if args.record else "replay"
+        os.environ["AI_CASSETTE_PATH"] = str(Path(args.record or args.replay).resolve())
+        os.environ["AI_CASSETTE_TIMING"] = args.replay_timing
+        os.environ["AI_CASSETTE_UNMATCHED"] = "fallback"
+    if not args.cache:
+        # Every player pays for real (stubbed) generation
+        os.environ["IMAGE_CACHE_TTL"] = "0"
+        os.environ["REPLY_CACHE_VARIANTS"] = "0"
+
+
+def _print_level(level: dict):
+    click = level["click_latency_s"]
+    print(
+        f"players={level['players']:>3}  games={level['games']:>3}  "
+        f"games/s={level['games_per_s']:.2f}  clicks/s={level['clicks_per_s']:.1f}  "
+        f"click p50={click.get('p50', 0) * 1000:.0f}ms p95={click.get('p95', 0) * 1000:.0f}ms  "
+        f"cpu={level['cpu_utilization']:.0%}  rss/session={level['rss_per_session_mb']:.1f}MB  "
+        f"errors={level['errors']}"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--players", default="1,2,4,8", help="comma-separated concurrency levels")
+    parser.add_argument("--games", type=int, default=1, help="games per player per level")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--warmup", type=int, default=1, help="unmeasured games played first")
+    parser.add_argument("--timeout", type=float, default=120, help="seconds allowed per click")
+    parser.add_argument("--degrade-factor", type=float, default=2.0)
+    parser.add_argument("--cache", action="store_true", help="keep the shared image/reply caches on")
+    parser.add_argument("--reply-engine", choices=["local", "llm"], default="local",
+                        help="local composes replies in-process; llm calls the stubbed chat API")
+    parser.add_argument("--record", metavar="CASSETTE", help="record stub AI traffic to this cassette")
+    parser.add_argument("--replay", metavar="CASSETTE", help="serve AI calls from this cassette instead of the stub")
+    parser.add_argument("--replay-timing", choices=["instant", "recorded"], default="recorded")
+    parser.add_argument("--data-dir", help="data directory (default: fresh temp dir)")
+    parser.add_argument("--output", help="write JSON results to this file")
+    parser.add_argument("--baseline", help="previous JSON results to compare against")
+    add_stub_arguments(parser)
+    args = parser.parse_args()
+    args.players = [int(n) for n in args.players.split(",")]
+
+    configure_environment(args)
+    sys.path.insert(0, str(PROJECT_ROOT))
+    share_apptest_runtime()
+    stub = None if args.replay else _start_stub(args)
+    try:
+        # Imports, caches and the script cache warm up outside the measurement
+        for game in range(args.warmup):
+            play_game(-1 - game, args.timeout)
+        levels = []
+        for players in args.players:
+            level = run_level(players, args.games, args.seed, args.timeout)
+            _print_level(level)
+            levels.append(level)
+    finally:
+        if stub:
+            stub.terminate()
+
+    baseline_p95 = levels[0]["click_latency_s"].get("p95") if levels else None
+    degradation = next(
+        (
+            level["players"] for level in levels[1:]
+            if baseline_p95 and level["click_latency_s"].get("p95", 0) > args.degrade_factor * baseline_p95
+        ),
+        None
+    )
+    print(f"degradation point: {degradation or 'not reached'} players")
+
+    results = {"environment": _environment(args), "levels": levels, "degradation_point": degradation}
+
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            previous = {level["players"]: level for level in json.load(f)["levels"]}
+        for level in levels:
+            before = previous.get(level["players"])
+            if before and before["click_latency_s"].get("p95"):
+                ratio = level["click_latency_s"]["p95"] / before["click_latency_s"]["p95"]
+                print(f"players={level['players']:>3}  p95 vs baseline: {ratio:.2f}x")
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(results, f, ensure_ascii=False, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,156 @@
+"""Compression and reconstruction report for delta-encoded portraits.
+
+Runs ``utils.portrait_delta`` over generated portraits and reports, per
+expression, the stored size against the full image, whether the full image
+had to be kept, reconstruction error, and encode/decode times.
+
+Portraits come from a recorded cassette (edit calls are matched to the
+image they edited through the recorded input hashes; expression sheets are
+split first) or from directories holding ``neutral.png`` next to the other
+expressions.
+
+Usage:
+    python -m bench.portrait_delta_report --cassette .matchplay/cassettes/ai.jsonl
+    python -m bench.portrait_delta_report --images portraits/char1 portraits/char2
+"""
+
+import argparse
+import base64
+import hashlib
+import json
+import sys
+import time
+from io import BytesIO
+from pathlib import Path
+
+from PIL import Image, ImageChops, ImageStat
+
+
+PROJECT_ROOT = Path(__file__).parent.parent
+
+
+def characters_from_cassette(path) -> list:
+    """``{expression: png bytes}`` per character found in a cassette."""
+    from utils.expression_sheet import SheetValidationError, split_expression_sheet
+
+    images = {}
+    edits = []
+    sheets = []
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            entry = json.loads(line) if line.strip() else None
+            if not entry or entry["api"] != "gemini.image" or not (entry.get("response") or {}).get("image"):
+                continue
+            data = base64.b64decode(entry["response"]["image"])
+            if entry.get("inputs"):
+                edits.append((entry["inputs"][0], data))
+            else:
+                images[hashlib.sha256(data).hexdigest()] = data
+                sheets.append(data)
+
+    characters = {}
+    for base_sha, data in edits:
+        if base_sha in images:
+            character = characters.setdefault(base_sha, {"neutral": images[base_sha]})
+            character[f"edit{len(character)}"] = data
+    for data in sheets:
+        try:
+            panels = split_expression_sheet(data)
+        except SheetValidationError:
+            continue
+        characters.setdefault(hashlib.sha256(data).hexdigest(), panels)
+    return [character for character in characters.values() if len(character) > 1]
+
+
+def characters_from_dirs(dirs: list) -> list:
+    characters = []
+    for directory in dirs:
+        files = {path.stem: path.read_bytes() for path in Path(directory).glob("*.png")}
+        if "neutral" in files and len(files) > 1:
+            characters.append(files)
+    return characters
+
+
+def mean_error(a: bytes, b: bytes) -> float:
+    """Mean absolute pixel difference (0-255) between two images."""
+    diff = ImageChops.difference(Image.open(BytesIO(a)).convert("RGB"), Image.open(BytesIO(b)).convert("RGB"))
+    return sum(ImageStat.Stat(diff).mean) / 3
+
+
+def report(characters: list) -> dict:
+    from utils import metrics
+    from utils.portrait_delta import decode_delta, encode_delta
+
+    rows = []
+    full_bytes = stored_bytes = 0
+    for character in characters:
+        neutral = character["neutral"]
+        full_bytes += len(neutral)
+        stored_bytes += len(neutral)
+        for expr, data in character.items():
+            if expr == "neutral":
+                continue
+            started = time.perf_counter()
+            blob = encode_delta(neutral, "0" * 64, data)
+            encode_s = time.perf_counter() - started
+            row = {"expression": expr, "full": len(data), "stored": len(blob or data),
+                   "delta": blob is not None, "encode_ms": encode_s * 1000}
+            if blob:
+                started = time.perf_counter()
+                rebuilt = decode_delta(neutral, blob)
+                row["decode_ms"] = (time.perf_counter() - started) * 1000
+                row["mean_error"] = mean_error(data, rebuilt)
+            rows.append(row)
+            full_bytes += len(data)
+            stored_bytes += row["stored"]
+
+    deltas = [row for row in rows if row["delta"]]
+    decode = [row["decode_ms"] for row in deltas]
+    return {
+        "characters": len(characters),
+        "variants": len(rows),
+        "stored_as_delta": len(deltas),
+        "full_bytes": full_bytes,
+        "stored_bytes": stored_bytes,
+        "compression_ratio": full_bytes / stored_bytes if stored_bytes else None,
+        "delta_ratio_mean": sum(row["stored"] / row["full"] for row in deltas) / len(deltas) if deltas else None,
+        "mean_error_max": max((row["mean_error"] for row in deltas), default=None),
+        "encode_ms_mean": sum(row["encode_ms"] for row in rows) / len(rows) if rows else None,
+        "decode_ms_p50": metrics.percentile(decode, 50),
+        "decode_ms_p99": metrics.percentile(decode, 99),
+        "rows": rows
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--cassette", help="cassette recorded with AI_CASSETTE_MODE=record")
+    parser.add_argument("--images", nargs="*", default=[], help="directories with neutral.png and variants")
+    parser.add_argument("--output", help="write JSON results to this file")
+    args = parser.parse_args()
+    sys.path.insert(0, str(PROJECT_ROOT))
+
+    characters = characters_from_dirs(args.images)
+    if args.cassette:
+        characters += characters_from_cassette(args.cassette)
+    if not characters:
+        parser.error("no portraits found")
+
+    result = report(characters)
+    for row in result["rows"]:
+        detail = (f"delta {row['stored'] / row['full']:.1%}  error={row['mean_error']:.2f}  "
+                  f"decode={row['decode_ms']:.1f}ms") if row["delta"] else "stored in full"
+        print(f"{row['expression']:>10}  {row['full']:>8}B -> {row['stored']:>8}B  {detail}")
+    print(
+        f"{result['characters']} characters, {result['stored_as_delta']}/{result['variants']} variants as deltas  "
+        f"total {result['full_bytes']}B -> {result['stored_bytes']}B "
+        f"(x{result['compression_ratio']:.2f})  decode p50={result['decode_ms_p50'] or 0:.1f}ms "
+        f"p99={result['decode_ms_p99'] or 0:.1f}ms"
+    )
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(result, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,317 @@
+"""Reply prompt evaluation over every (MBTI, question, option) combination.
+
+Generates the character reply for all 16 MBTI types x every question x every
+option (about 2,400 combinations), optionally ``--samples`` times each, for
+every prompt version: the current RESPONSE_PROMPT and any ``--prompt
+LABEL=FILE`` template, each with every ``--model``. Calls are made exactly
+like the game's (``utils.ai_client``), uncached, in the scheduler's batch
+class with ``--concurrency`` calls in flight.
+
+Each finished call is appended to the ``--checkpoint`` JSONL file, so an
+interrupted run resumes where it stopped (failed calls are retried on the
+next run). Replies are scored locally, with no further calls:
+
+    banmal      - no sentence ends in a polite form (~요, ~니다, ~ㅂ니까, ...)
+    sentences   - sentence count within SENTENCE_RANGE (the prompt asks for 2-3)
+    length      - characters per reply
+    duplicates  - share of replies repeating an earlier one of the same version
+
+and latency and token percentiles are reported per prompt version. Runs
+against the AI stub process unless OPENAI_BASE_URL is already set.
+
+Usage:
+    python -m bench.prompt_eval
+    python -m bench.prompt_eval --prompt v2=prompts/response_v2.txt --samples 3
+    OPENAI_BASE_URL=https://api.openai.com/v1 python -m bench.prompt_eval --model gpt-4o-mini --model gpt-4.1-mini
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import re
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from pathlib import Path
+
+from .ai_stub import add_stub_arguments
+from .loadtest import _start_stub
+
+
+PROJECT_ROOT = Path(__file__).parent.parent
+SENTENCE_RANGE = (2, 3)
+# Replies shorter or longer than this (characters) count as off length
+LENGTH_RANGE = (15, 200)
+PROGRESS_EVERY = 5.0
+
+_SENTENCE_SPLIT = re.compile(r"(?<=[.!?…~])\s+|\n+")
+_TRAILING = re.compile(r"[\s.,!?…~\"'”’)\]]+$")
+_NORMALIZE = re.compile(r"[\W_]+")
+
+
+def split_sentences(text: str) -> list:
+    return [sentence for sentence in _SENTENCE_SPLIT.split(text.strip()) if _NORMALIZE.sub("", sentence)]
+
+
+def _polite(sentence: str) -> bool:
+    """Whether a sentence ends in a polite (존댓말) form."""
+    end = _TRAILING.sub("", sentence)
+    if end.endswith(("요", "죠", "니다", "십시오")):
+        return True
+    # ~습니까 / ~ㅂ니까 (합니까, 입니까); ~니까 alone is a 반말 connective ending
+    if end.endswith("니까") and len(end) > 2:
+        syllable = ord(end[-3]) - 0xAC00
+        return 0 <= syllable < 11172 and syllable % 28 == 17
+    return False
+
+
+def score_reply(text: str) -> dict:
+    """Local checks of one reply (see the module docstring)."""
+    sentences = split_sentences(text)
+    return {
+        "banmal": not any(_polite(sentence) for sentence in sentences),
+        "sentences": len(sentences),
+        "sentences_ok": SENTENCE_RANGE[0] <= len(sentences) <= SENTENCE_RANGE[1],
+        "length": len(text),
+        "length_ok": LENGTH_RANGE[0] <= len(text) <= LENGTH_RANGE[1]
+    }
+
+
+def load_versions(args) -> list:
+    """Prompt versions to evaluate: ``(label, model, template, prompt_hash)``."""
+    from utils.ai_client import REPLY_MODEL
+    from utils.prompts import RESPONSE_PROMPT
+
+    templates = [("current", RESPONSE_PROMPT)]
+    for spec in args.prompt or []:
+        label, _, path = spec.partition("=")
+        if not path:
+            raise SystemExit(f"--prompt expects LABEL=FILE, got {spec!r}")
+        templates.append((label, Path(path).read_text(encoding="utf-8")))
+
+    versions = []
+    for label, template in templates:
+        # Fail before the sweep on templates with unknown placeholders
+        try:
+            template.format(
+                mbti="", speech_style="", values="", likes="", dislikes="", flirting_style="",
+                sensitive_points="", emotion="", question="", answer=""
+            )
+        except (KeyError, IndexError, ValueError) as e:
+            raise SystemExit(f"Prompt {label!r} is not a valid RESPONSE_PROMPT template: {e!r}")
+        prompt_hash = hashlib.sha256(template.encode("utf-8")).hexdigest()[:12]
+        for model in args.model or [REPLY_MODEL]:
+            versions.append((label, model, template, prompt_hash))
+    return versions
+
+
+def combinations(args) -> list:
+    """``(mbti, question_id, option_index, answer, emotion)`` to evaluate."""
+    from utils.content import get_content
+    from utils.engine import MBTI_TYPES, calculate_grade
+
+    questions = get_content().current().questions
+    question_ids = questions.ids()[:args.questions] if args.questions else questions.ids()
+    items = []
+    for mbti in args.mbti or MBTI_TYPES:
+        for question_id in question_ids:
+            question = questions.get(question_id)
+            for index, option in enumerate(question["options"]):
+                emotion = calculate_grade(mbti, option.get("tags", []))[0]
+                items.append((mbti, question_id, index, option["text"], emotion))
+    return items
+
+
+def _key(record: dict) -> tuple:
+    return (
+        record["version"], record["model"], record["prompt_hash"],
+        record["mbti"], record["question_id"], record["option"], record["sample"]
+    )
+
+
+def read_checkpoint(path: Path) -> list:
+    if not path.exists():
+        return []
+    records = []
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            try:
+                records.append(json.loads(line))
+            except json.JSONDecodeError:
+                # Torn last line of an interrupted run
+                continue
+    return records
+
+
+def run(args, checkpoint: Path) -> tuple:
+    """Generate every missing reply, appending each to ``checkpoint``.
+
+    Returns:
+        (records of this run's versions, failed calls, seconds spent)
+    """
+    from utils.ai_client import _character_fields, _chat_call, _reply_request
+    from utils.content import get_content
+    from utils.scheduler import ai_context
+
+    versions = load_versions(args)
+    items = combinations(args)
+    content = get_content().current()
+
+    tasks = {}
+    for label, model, template, prompt_hash in versions:
+        for mbti, question_id, index, answer, emotion in items:
+            for sample in range(args.samples):
+                record = {
+                    "version": label, "model": model, "prompt_hash": prompt_hash, "mbti": mbti,
+                    "question_id": question_id, "option": index, "sample": sample, "emotion": emotion
+                }
+                tasks[_key(record)] = (record, template, answer)
+    # Finished calls of this sweep; the checkpoint may also hold other sweeps
+    finished = {}
+    for record in read_checkpoint(checkpoint):
+        if _key(record) in tasks:
+            finished[_key(record)] = record
+    records = list(finished.values())
+    pending = [task for key, task in tasks.items() if key not in finished]
+    print(f"{len(pending)} calls to make, {len(records)} already in {checkpoint}", flush=True)
+
+    def generate(task) -> dict:
+        record, template, answer = task
+        prompt = template.format(
+            **_character_fields(record["mbti"], content.mbti_traits),
+            emotion=record["emotion"],
+            question=content.questions.get(record["question_id"])["q"],
+            answer=answer
+        )
+        with ai_context("batch", session=f"eval-{record['version']}"):
+            started = time.perf_counter()
+            result = _chat_call(_reply_request(prompt, record["model"]))
+            latency = time.perf_counter() - started
+        usage = result.get("usage") or {}
+        return {
+            **record,
+            "text": (result["text"] or "").strip(),
+            "latency": latency,
+            "prompt_tokens": usage.get("prompt"),
+            "completion_tokens": usage.get("completion")
+        }
+
+    failed = 0
+    started = last_report = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.concurrency) as pool, open(checkpoint, "a+", encoding="utf-8") as out:
+        # Start on a fresh line after a torn one
+        if out.tell() and (out.seek(out.tell() - 1) or out.read(1) != "\n"):
+            out.write("\n")
+        futures = [pool.submit(generate, task) for task in pending]
+        for finished, future in enumerate(as_completed(futures), 1):
+            try:
+                record = future.result()
+            except Exception as e:
+                failed += 1
+                if failed <= 3:
+                    print(f"call failed: {e!r}", file=sys.stderr)
+                continue
+            out.write(json.dumps(record, ensure_ascii=False) + "\n")
+            out.flush()
+            records.append(record)
+            if time.perf_counter() - last_report >= PROGRESS_EVERY:
+                last_report = time.perf_counter()
+                rate = finished / (last_report - started)
+                print(f"  {finished}/{len(pending)} calls, {rate:.0f}/s", flush=True)
+    return records, failed, time.perf_counter() - started
+
+
+def report(records: list) -> dict:
+    """Scores, latency and token percentiles per prompt version."""
+    from utils import metrics
+
+    by_version = {}
+    for record in records:
+        by_version.setdefault(f"{record['version']}@{record['model']}", []).append(record)
+
+    result = {}
+    for version, rows in sorted(by_version.items()):
+        scores = [score_reply(row["text"]) for row in rows]
+        normalized = [_NORMALIZE.sub("", row["text"]) for row in rows]
+        # Samples of one combination that repeat each other
+        by_combination = {}
+        for row, text in zip(rows, normalized):
+            by_combination.setdefault((row["mbti"], row["question_id"], row["option"]), []).append(text)
+        repeated = sum(len(texts) - len(set(texts)) for texts in by_combination.values())
+
+        def series(name: str) -> list:
+            return [row[name] for row in rows if row.get(name) is not None]
+
+        def percentiles(values: list) -> dict:
+            return {f"p{pct}": metrics.percentile(values, pct) for pct in (50, 90, 99)}
+
+        n = len(rows)
+        result[version] = {
+            "replies": n,
+            "banmal_rate": sum(score["banmal"] for score in scores) / n,
+            "sentences_ok_rate": sum(score["sentences_ok"] for score in scores) / n,
+            "sentences_mean": sum(score["sentences"] for score in scores) / n,
+            "length_ok_rate": sum(score["length_ok"] for score in scores) / n,
+            "length": percentiles([score["length"] for score in scores]),
+            "duplicate_rate": 1 - len(set(normalized)) / n,
+            "sample_duplicate_rate": repeated / n,
+            "latency": percentiles(series("latency")),
+            "prompt_tokens": percentiles(series("prompt_tokens")),
+            "completion_tokens": percentiles(series("completion_tokens"))
+        }
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--prompt", action="append", metavar="LABEL=FILE", help="extra RESPONSE_PROMPT template")
+    parser.add_argument("--model", action="append", help="reply model (repeatable; default REPLY_MODEL)")
+    parser.add_argument("--samples", type=int, default=1, help="replies per combination")
+    parser.add_argument("--concurrency", type=int, default=32, help="calls in flight (AI_CHAT_SLOTS)")
+    parser.add_argument("--mbti", nargs="+", help="only these MBTI types")
+    parser.add_argument("--questions", type=int, help="only the first N questions")
+    parser.add_argument("--checkpoint", default="prompt_eval.jsonl", help="JSONL file of finished calls")
+    parser.add_argument("--output", help="write JSON results to this file")
+    add_stub_arguments(parser)
+    args = parser.parse_args()
+
+    stub = None if os.environ.get("OPENAI_BASE_URL") else _start_stub(args)
+    os.environ.setdefault("OPENAI_API_KEY", "stub")
+    os.environ.setdefault("DATA_DIR", tempfile.mkdtemp(prefix="matchplay-eval-"))
+    # The evaluation is this process's only AI work: let the batch class use every slot
+    os.environ["AI_CHAT_SLOTS"] = str(args.concurrency)
+    os.environ["AI_BACKGROUND_SHARE"] = "1"
+    sys.path.insert(0, str(PROJECT_ROOT))
+
+    try:
+        records, failed, elapsed = run(args, Path(args.checkpoint))
+    finally:
+        if stub:
+            stub.terminate()
+    result = report(records)
+
+    for version, row in result.items():
+        print(
+            f"{version}: {row['replies']} replies  banmal={row['banmal_rate']:.1%}  "
+            f"sentences {SENTENCE_RANGE[0]}-{SENTENCE_RANGE[1]}={row['sentences_ok_rate']:.1%} "
+            f"(mean {row['sentences_mean']:.1f})  length p50={row['length']['p50']} "
+            f"in range={row['length_ok_rate']:.1%}  duplicates={row['duplicate_rate']:.1%} "
+            f"(across samples {row['sample_duplicate_rate']:.1%})"
+        )
+        latency, prompt, completion = row["latency"], row["prompt_tokens"], row["completion_tokens"]
+        if latency["p50"] is not None:
+            print(
+                f"  latency p50={latency['p50'] * 1000:.0f}ms p90={latency['p90'] * 1000:.0f}ms "
+                f"p99={latency['p99'] * 1000:.0f}ms  tokens prompt p50={prompt['p50']} p90={prompt['p90']} "
+                f"completion p50={completion['p50']} p90={completion['p90']}"
+            )
+    print(f"this run: {elapsed:.1f}s, {failed} failed calls (retried on the next run)")
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(result, f, indent=2, ensure_ascii=False)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,125 @@
+"""Minimal in-memory Redis-protocol server for exercising RedisBackend locally.
+
+Supports the subset of commands the app uses (PING, GET, MGET, SET with
+EX/PX, PEXPIRE, DEL, EXISTS, FLUSHDB, AUTH, SELECT). Not for production use.
+
+Usage:
+    python -m bench.redis_stub --port 6390
+    STATE_BACKEND_URL=redis://localhost:6390/0 streamlit run app.py
+"""
+
+import argparse
+import socketserver
+import threading
+import time
+
+
+class RedisStubServer(socketserver.ThreadingTCPServer):
+    """Threaded TCP server sharing one expiring key-value dictionary."""
+
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, address):
+        super().__init__(address, _RedisStubHandler)
+        self.data = {}
+        self.lock = threading.Lock()
+
+    def lookup(self, key: bytes):
+        entry = self.data.get(key)
+        if entry is None:
+            return None
+        value, expires_at = entry
+        if expires_at is not None and expires_at <= time.time():
+            del self.data[key]
+            return None
+        return value
+
+
+class _RedisStubHandler(socketserver.StreamRequestHandler):
+
+    def handle(self):
+        while True:
+            try:
+                args = self._read_command()
+            except (ConnectionError, ValueError):
+                return
+            if args is None:
+                return
+            self.wfile.write(self._dispatch(args))
+
+    def _read_command(self):
+        line = self.rfile.readline()
+        if not line:
+            return None
+        if not line.startswith(b"*"):
+            # Inline command (e.g., typed into telnet)
+            return line.strip().split()
+        args = []
+        for _ in range(int(line[1:-2])):
+            length = int(self.rfile.readline()[1:-2])
+            args.append(self.rfile.read(length + 2)[:-2])
+        return args
+
+    def _dispatch(self, args: list) -> bytes:
+        server = self.server
+        name = args[0].upper().decode()
+        with server.lock:
+            if name in ("PING", "AUTH", "SELECT"):
+                return b"+PONG\r\n" if name == "PING" else b"+OK\r\n"
+            if name == "GET":
+                return _bulk(server.lookup(args[1]))
+            if name == "MGET":
+                values = [server.lookup(key) for key in args[1:]]
+                return b"*%d\r\n" % len(values) + b"".join(_bulk(v) for v in values)
+            if name == "SET":
+                expires_at = None
+                options = [a.upper() for a in args[3:]]
+                if b"PX" in options:
+                    expires_at = time.time() + int(args[3 + options.index(b"PX") + 1]) / 1000
+                elif b"EX" in options:
+                    expires_at = time.time() + int(args[3 + options.index(b"EX") + 1])
+                server.data[args[1]] = (args[2], expires_at)
+                return b"+OK\r\n"
+            if name == "PEXPIRE":
+                value = server.lookup(args[1])
+                if value is not None:
+                    server.data[args[1]] = (value, time.time() + int(args[2]) / 1000)
+                return b":%d\r\n" % (value is not None)
+            if name in ("DEL", "EXISTS"):
+                count = sum(1 for key in args[1:] if server.lookup(key) is not None)
+                if name == "DEL":
+                    for key in args[1:]:
+                        server.data.pop(key, None)
+                return b":%d\r\n" % count
+            if name == "FLUSHDB":
+                server.data.clear()
+                return b"+OK\r\n"
+        return b"-ERR unknown command '%s'\r\n" % name.encode()
+
+
+def _bulk(value) -> bytes:
+    if value is None:
+        return b"$-1\r\n"
+    return b"$%d\r\n%s\r\n" % (len(value), value)
+
+
+def start_redis_stub(host: str = "127.0.0.1", port: int = 0) -> RedisStubServer:
+    """Start a stub server on a background thread (port 0 picks a free port)."""
+    server = RedisStubServer((host, port))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=6390)
+    args = parser.parse_args()
+    server = RedisStubServer((args.host, args.port))
+    print(f"Redis stub listening on {args.host}:{args.port}")
+    server.serve_forever()
+
+
+if __name__ == "__main__":
+    main()
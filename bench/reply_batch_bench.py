@@ -0,0 +1,135 @@
+"""Batched vs per-option reply generation: latency and tokens per question.
+
+For each sampled question, generates the replies to all of its options
+twice: with one ``generate_responses`` call (REPLY_MODE=batch) and with one
+``generate_response`` call per option, issued concurrently. Reports latency
+and prompt/completion tokens per question for both. Runs against the AI stub
+process unless OPENAI_BASE_URL is already set (e.g., the real API).
+
+Usage:
+    python -m bench.reply_batch_bench --questions 30
+    OPENAI_BASE_URL=https://api.openai.com/v1 python -m bench.reply_batch_bench --questions 10
+"""
+
+import argparse
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+from .ai_stub import add_stub_arguments
+from .loadtest import _start_stub
+
+
+PROJECT_ROOT = Path(__file__).parent.parent
+
+
+def _tokens() -> tuple:
+    from utils import metrics
+
+    return metrics.samples("openai.tokens.prompt"), metrics.samples("openai.tokens.completion")
+
+
+def _measure(fn) -> dict:
+    prompt_before, completion_before = (len(series) for series in _tokens())
+    started = time.perf_counter()
+    fn()
+    elapsed = time.perf_counter() - started
+    prompt, completion = _tokens()
+    return {
+        "latency": elapsed,
+        "prompt_tokens": sum(prompt[prompt_before:]),
+        "completion_tokens": sum(completion[completion_before:])
+    }
+
+
+def run(args) -> dict:
+    from utils import metrics
+    from utils.ai_client import MalformedReplies, generate_response, generate_responses
+    from utils.content import get_content
+    from utils.engine import MBTI_TYPES, calculate_grade
+
+    content = get_content().current()
+    rng = random.Random(args.seed)
+    pool = ThreadPoolExecutor(max_workers=4)
+    rows = {"batch": [], "separate": []}
+    malformed = 0
+
+    for question_id in content.questions.sample_ids(args.questions, rng=rng):
+        question = content.questions.get(question_id)
+        mbti = rng.choice(MBTI_TYPES)
+        options = [
+            (option["text"], calculate_grade(mbti, option.get("tags", []))[0])
+            for option in question["options"]
+        ]
+
+        def batch():
+            try:
+                generate_responses(mbti, content.mbti_traits, question["q"], options)
+            except MalformedReplies:
+                nonlocal malformed
+                malformed += 1
+
+        def separate():
+            futures = [
+                pool.submit(generate_response, mbti, content.mbti_traits, question["q"], answer, emotion)
+                for answer, emotion in options
+            ]
+            for future in futures:
+                future.result()
+
+        rows["batch"].append(_measure(batch))
+        rows["separate"].append(_measure(separate))
+    pool.shutdown()
+
+    result = {"questions": args.questions, "batch_malformed": malformed}
+    for mode, measured in rows.items():
+        latencies = [row["latency"] for row in measured]
+        result[mode] = {
+            "latency_p50": metrics.percentile(latencies, 50),
+            "latency_p90": metrics.percentile(latencies, 90),
+            "prompt_tokens_per_question": sum(row["prompt_tokens"] for row in measured) / len(measured),
+            "completion_tokens_per_question": sum(row["completion_tokens"] for row in measured) / len(measured)
+        }
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--questions", type=int, default=30)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--output", help="write JSON results to this file")
+    add_stub_arguments(parser)
+    args = parser.parse_args()
+
+    stub = None if os.environ.get("OPENAI_BASE_URL") else _start_stub(args)
+    os.environ.setdefault("OPENAI_API_KEY", "stub")
+    os.environ.setdefault("DATA_DIR", tempfile.mkdtemp(prefix="matchplay-batch-"))
+    # Every call goes to the provider
+    os.environ["REPLY_CACHE_VARIANTS"] = "0"
+    sys.path.insert(0, str(PROJECT_ROOT))
+
+    try:
+        result = run(args)
+    finally:
+        if stub:
+            stub.terminate()
+    for mode in ("batch", "separate"):
+        row = result[mode]
+        print(
+            f"{mode:>8}: latency p50={row['latency_p50'] * 1000:.0f}ms p90={row['latency_p90'] * 1000:.0f}ms  "
+            f"tokens/question prompt={row['prompt_tokens_per_question']:.0f} "
+            f"completion={row['completion_tokens_per_question']:.0f}"
+        )
+    print(f"malformed batches: {result['batch_malformed']}/{result['questions']}")
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(result, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,142 @@
+"""Interactive queue wait under growing background AI load.
+
+Simulated players make interactive chat calls (one at a time, each with its
+own session) through ``utils.ai_client`` against the AI stub process,
+while a number of background workers keep issuing speculative and batch
+calls. For each background level the interactive queue wait and end-to-end
+latency are reported; with the scheduler working, interactive p99 should
+stay flat as background load grows.
+
+Usage:
+    python -m bench.scheduler_bench --players 8 --background 0,16,64
+    python -m bench.scheduler_bench --background-share 1.0   # no reserved slots
+"""
+
+import argparse
+import json
+import os
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+from .ai_stub import add_stub_arguments
+from .loadtest import _start_stub
+
+
+PROJECT_ROOT = Path(__file__).parent.parent
+# Seconds a background worker pauses after its call was dropped
+DROP_BACKOFF = 0.05
+
+
+def _chat(n: int):
+    from utils.ai_client import _chat_completion
+
+    return _chat_completion(
+        model="gpt-4o-mini",
+        messages=[{"role": "user", "content": f"bench {n}"}],
+        max_tokens=50
+    )
+
+
+def run_level(players: int, calls: int, background: int) -> dict:
+    from utils import metrics
+    from utils.scheduler import CallDropped, ai_context
+
+    metrics.reset()
+    stop = threading.Event()
+    latencies = []
+    lock = threading.Lock()
+
+    def background_worker(index: int):
+        priority = "speculative" if index % 2 else "batch"
+        with ai_context(priority, session=f"bg-{index}"):
+            n = 0
+            while not stop.is_set():
+                n += 1
+                try:
+                    _chat(n)
+                except CallDropped:
+                    # A real prefetcher would give up; don't spin on the lock
+                    stop.wait(DROP_BACKOFF)
+
+    def player(index: int):
+        with ai_context("interactive", session=f"player-{index}"):
+            for n in range(calls):
+                started = time.perf_counter()
+                _chat(n)
+                with lock:
+                    latencies.append(time.perf_counter() - started)
+
+    workers = [threading.Thread(target=background_worker, args=(i,), daemon=True) for i in range(background)]
+    for thread in workers:
+        thread.start()
+    # Let the background load reach steady state first
+    time.sleep(0.5 if background else 0)
+
+    started = time.perf_counter()
+    threads = [threading.Thread(target=player, args=(i,)) for i in range(players)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+    stop.set()
+    for thread in workers:
+        thread.join()
+
+    waits = metrics.samples("ai.queue_wait.interactive")
+    return {
+        "background": background,
+        "seconds": elapsed,
+        "interactive_calls": len(latencies),
+        "interactive_wait_p50": metrics.percentile(waits, 50),
+        "interactive_wait_p99": metrics.percentile(waits, 99),
+        "interactive_latency_p50": metrics.percentile(latencies, 50),
+        "interactive_latency_p99": metrics.percentile(latencies, 99),
+        "background_calls": metrics.counter("ai.calls.speculative") + metrics.counter("ai.calls.batch"),
+        "speculative_dropped": metrics.counter("ai.dropped.speculative")
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--players", type=int, default=8, help="concurrent interactive callers")
+    parser.add_argument("--calls", type=int, default=20, help="interactive calls per player")
+    parser.add_argument("--background", default="0,16,64", help="comma-separated background worker counts")
+    parser.add_argument("--slots", type=int, default=16, help="chat lane slots (AI_CHAT_SLOTS)")
+    parser.add_argument("--background-share", type=float, help="AI_BACKGROUND_SHARE override")
+    parser.add_argument("--output", help="write JSON results to this file")
+    add_stub_arguments(parser)
+    parser.set_defaults(chat_latency=0.1, chat_jitter=0.02)
+    args = parser.parse_args()
+
+    stub = _start_stub(args)
+    os.environ.update({
+        "OPENAI_API_KEY": "stub",
+        "DATA_DIR": tempfile.mkdtemp(prefix="matchplay-sched-"),
+        "AI_CHAT_SLOTS": str(args.slots)
+    })
+    if args.background_share is not None:
+        os.environ["AI_BACKGROUND_SHARE"] = str(args.background_share)
+    sys.path.insert(0, str(PROJECT_ROOT))
+
+    results = []
+    for background in [int(n) for n in args.background.split(",")]:
+        level = run_level(args.players, args.calls, background)
+        results.append(level)
+        print(
+            f"background={background:>3}  interactive wait p50={level['interactive_wait_p50'] * 1000:6.1f}ms "
+            f"p99={level['interactive_wait_p99'] * 1000:6.1f}ms  "
+            f"latency p99={level['interactive_latency_p99'] * 1000:6.1f}ms  "
+            f"background calls={level['background_calls']}  dropped={level['speculative_dropped']}"
+        )
+    stub.terminate()
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
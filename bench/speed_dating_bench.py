@@ -0,0 +1,111 @@
+"""Speed-dating turn latency against table size.
+
+Plays turns of ``utils.speed_dating`` tables of 1 to 4 characters: every
+turn answers a random option for all characters and waits for all their
+replies (fanned out with ``submit_replies``). Reports per table size the
+turn latency, i.e., the slowest reply, next to the single-character case,
+and the portrait setup time when ``--portraits`` is given. Runs against the
+AI stub process unless OPENAI_BASE_URL is already set (e.g., the real API).
+
+Usage:
+    python -m bench.speed_dating_bench --turns 20
+    python -m bench.speed_dating_bench --turns 10 --portraits --image-latency 0.5
+"""
+
+import argparse
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+from concurrent.futures import wait
+from pathlib import Path
+
+from .ai_stub import add_stub_arguments
+from .loadtest import _start_stub
+
+
+PROJECT_ROOT = Path(__file__).parent.parent
+
+
+def run(args) -> dict:
+    from utils import metrics
+    from utils.engine import GameEngine
+    from utils.speed_dating import answer_all, advance_all, create_cast_images, new_table, pick_cast, submit_replies
+
+    engine = GameEngine()
+    rng = random.Random(args.seed)
+    result = {"turns": args.turns, "sizes": {}}
+    for size in args.sizes:
+        mbtis = pick_cast(rng.choice(["INFP", "ESTJ", "ENTP", "ISFJ"]), size, rng=rng)
+        row = {}
+        if args.portraits:
+            class Job:
+                cancelled = False
+
+                def report_stage(self, stage, value=None, ok=True):
+                    pass
+
+            appearance = {"gender": "여성", "hair": f"run-{args.seed}-{size}"}
+            started = time.perf_counter()
+            create_cast_images(Job(), appearance, mbtis, limit=args.concurrency)
+            row["setup"] = time.perf_counter() - started
+
+        latencies = []
+        states = new_table(engine, mbtis, rng=rng)
+        traits = engine.content_for(states[0]).mbti_traits
+        for _ in range(args.turns):
+            if all(engine.is_over(state) for state in states):
+                states = new_table(engine, mbtis, rng=rng)
+            question = engine.current_question(next(state for state in states if not engine.is_over(state)))
+            entries = answer_all(engine, states, option=rng.randrange(len(question["options"])))
+            started = time.perf_counter()
+            wait([future for future in submit_replies(states, entries, traits, limit=args.concurrency) if future])
+            latencies.append(time.perf_counter() - started)
+            advance_all(engine, states)
+        row["turn_p50"] = metrics.percentile(latencies, 50)
+        row["turn_p90"] = metrics.percentile(latencies, 90)
+        result["sizes"][size] = row
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--turns", type=int, default=20)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1, 2, 3, 4])
+    parser.add_argument("--concurrency", type=int, default=4, help="fan-out limit per table")
+    parser.add_argument("--portraits", action="store_true", help="also time portrait setup per table")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--output", help="write JSON results to this file")
+    add_stub_arguments(parser)
+    args = parser.parse_args()
+
+    stub = None if os.environ.get("OPENAI_BASE_URL") else _start_stub(args)
+    os.environ.setdefault("OPENAI_API_KEY", "stub")
+    os.environ.setdefault("GEMINI_API_KEY", "stub")
+    os.environ.setdefault("DATA_DIR", tempfile.mkdtemp(prefix="matchplay-speed-"))
+    # Every call goes to the provider
+    os.environ["REPLY_CACHE_VARIANTS"] = "0"
+    sys.path.insert(0, str(PROJECT_ROOT))
+
+    try:
+        result = run(args)
+    finally:
+        if stub:
+            stub.terminate()
+    single = result["sizes"].get(1, {}).get("turn_p50")
+    for size, row in result["sizes"].items():
+        relative = f"  x{row['turn_p50'] / single:.2f} of 1 character" if single else ""
+        setup = f"  setup={row['setup']:.2f}s" if "setup" in row else ""
+        print(
+            f"{size} characters: turn p50={row['turn_p50'] * 1000:.0f}ms "
+            f"p90={row['turn_p90'] * 1000:.0f}ms{relative}{setup}"
+        )
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(result, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,24 +1,235 @@
 """AI client for OpenAI and Google Gemini API interactions."""
 
-import streamlit as st
 from openai import OpenAI
 from google import genai
 import base64
+import hashlib
+import json
+import random
+import time
 import requests
+import threading
 from io import BytesIO
-from .prompts import CHARACTER_IMAGE_PROMPT, RESPONSE_PROMPT, ENDING_IMAGE_PROMPT
+from . import metrics
+from .cassette import cassette_call, decode_bytes, encode_bytes
+from .config import get_setting
+from .expression_sheet import SHEET_ASPECT_RATIO, SheetValidationError, panel_consistency, split_expression_sheet
+from .image_profiles import fit_image, generation_config, select_profile
+from .profiling import timed
+from .cancellation import CallCancelled
+from .scheduler import get_scheduler
+from .prompts import (
+    BATCH_RESPONSE_PROMPT, CHARACTER_IMAGE_PROMPT, EXPRESSION_SHEET_PROMPT, IMAGE_DETAIL_PROMPTS, RESPONSE_PROMPT,
+    ENDING_IMAGE_PROMPT
+)
+from .session_store import get_session_store
+from .state_backend import get_backend
+
+
+# Shared cache defaults (override with settings of the same name)
+IMAGE_CACHE_TTL = 24 * 3600
+REPLY_CACHE_TTL = 24 * 3600
+# Reply cache, off by default (REPLY_CACHE_VARIANTS setting). When set to N > 0,
+# the first N replies generated for an identical prompt are stored and, once
+# there are N, every replica serves one of them at random for REPLY_CACHE_TTL
+# instead of calling the model, so players can see the same reply as others.
+REPLY_CACHE_VARIANTS = 0
+
+# Portrait generation mode (PORTRAIT_MODE setting):
+#   "edit"  - one generation plus two edit calls per character
+#   "sheet" - one call for a three-panel expression sheet, split locally
+PORTRAIT_MODES = ("edit", "sheet")
+
+IMAGE_MODEL = "gemini-2.5-flash-image"
+REPLY_MODEL = "gpt-4o-mini"
+REPLY_SYSTEM_PROMPT = "You are a character in a Korean dating simulation game. Respond naturally in Korean."
+
+# Reply generation mode (REPLY_MODE setting):
+#   "single" - one call for the chosen option after the click
+#   "batch"  - one call per question for every option, prefetched while the
+#              player reads the question
+REPLY_MODES = ("single", "batch")
+
+
+class MalformedReplies(ValueError):
+    """Raised when a batched reply response is not the expected JSON object."""
+
+
+_openai_clients = {}
+_openai_clients_lock = threading.Lock()
 
 
 def get_client() -> OpenAI:
-    """Get OpenAI client with API key from Streamlit secrets."""
-    return OpenAI(api_key=st.secrets["OPENAI_API_KEY"])
+    """Get OpenAI client with API key from Streamlit secrets.
+
+    OPENAI_BASE_URL points the client at another endpoint (e.g., a local stub).
+    One client is shared per key and endpoint: building one loads the TLS
+    certificates (~40ms of CPU), and a shared client reuses connections.
+    """
+    settings = (get_setting("OPENAI_API_KEY"), get_setting("OPENAI_BASE_URL"))
+    with _openai_clients_lock:
+        if settings not in _openai_clients:
+            _openai_clients[settings] = OpenAI(api_key=settings[0], base_url=settings[1])
+        return _openai_clients[settings]
 
 
 def get_gemini_client():
-    """Get Google Gemini client with API key from Streamlit secrets."""
-    return genai.Client(api_key=st.secrets["GEMINI_API_KEY"])
+    """Get Google Gemini client with API key from Streamlit secrets.
+
+    GEMINI_BASE_URL points the client at another endpoint (e.g., a local stub).
+    """
+    base_url = get_setting("GEMINI_BASE_URL")
+    http_options = genai.types.HttpOptions(base_url=base_url) if base_url else None
+    return genai.Client(api_key=get_setting("GEMINI_API_KEY"), http_options=http_options)
+
+
+def _chat_completion(**request) -> str:
+    """Single choke point for OpenAI chat calls; returns the reply text.
+
+    Waits for a scheduler slot in the caller's ai_context priority class.
+    """
+    return _chat_call(request)["text"]
+
+
+def _chat_call(request: dict) -> dict:
+    """Make a chat call (see _chat_completion).
+
+    Returns:
+        ``text`` and ``usage`` (``prompt``/``completion`` tokens, or None)
+    """
+    def live_call():
+        client = get_client()
+        response = client.chat.completions.create(**request)
+        usage = response.usage
+        return {
+            "text": response.choices[0].message.content,
+            "usage": {"prompt": usage.prompt_tokens, "completion": usage.completion_tokens} if usage else None
+        }
+
+    with get_scheduler("openai.chat").slot():
+        result = cassette_call("openai.chat", request, live_call)
+    if result.get("usage"):
+        metrics.observe("openai.tokens.prompt", result["usage"]["prompt"])
+        metrics.observe("openai.tokens.completion", result["usage"]["completion"])
+    return result
+
+
+def _generate_image(contents, image_config: dict = None) -> bytes:
+    """Single choke point for Gemini image calls (scheduled like _chat_completion).
+
+    Args:
+        contents: Prompt text, or a list of prompt text and input image bytes
+        image_config: ``ImageConfig`` options, e.g., aspect_ratio (see
+            ``utils.image_profiles.generation_config``)
+
+    Returns:
+        Bytes of the first image in the response, or None
+    """
+    request = {"model": IMAGE_MODEL, "contents": contents}
+    if image_config:
+        request["image_config"] = image_config
+
+    def live_call():
+        from PIL import Image
+
+        parts = contents
+        if isinstance(contents, list):
+            # Send input images as they are encoded; a PIL image would be re-encoded by the SDK
+            parts = [
+                genai.types.Part.from_bytes(data=part, mime_type=Image.MIME[Image.open(BytesIO(part)).format])
+                if isinstance(part, bytes) else part
+                for part in contents
+            ]
+        # Keep a reference: the client closes its connection when collected
+        client = get_gemini_client()
+        response = client.models.generate_content(
+            model=IMAGE_MODEL,
+            contents=parts,
+            config=genai.types.GenerateContentConfig(
+                response_modalities=["IMAGE"],
+                image_config=genai.types.ImageConfig(**image_config) if image_config else None
+            )
+        )
+        return {"image": encode_bytes(_extract_image_bytes(response))}
+
+    with get_scheduler("gemini.image").slot():
+        return decode_bytes(cassette_call("gemini.image", request, live_call)["image"])
+
+
+def _cache_key(*parts) -> str:
+    """Stable hash of JSON-serializable cache key parts."""
+    raw = json.dumps(parts, ensure_ascii=False, sort_keys=True)
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
 
+def _get_cached_reply(key: str) -> tuple:
+    """Look up cached replies for a prompt (only with REPLY_CACHE_VARIANTS set).
+
+    Returns:
+        Tuple of (reply or None, list of cached variants)
+    """
+    variants_wanted = int(get_setting("REPLY_CACHE_VARIANTS", REPLY_CACHE_VARIANTS))
+    if variants_wanted <= 0:
+        return None, []
+    variants = _cached_variants(key)
+    if len(variants) >= variants_wanted:
+        metrics.incr("cache.reply.hit")
+        return random.choice(variants), variants
+    metrics.incr("cache.reply.miss")
+    return None, variants
+
+
+def _cached_variants(key: str) -> list:
+    try:
+        cached = get_backend().get(f"reply:{key}")
+    except Exception:
+        return []
+    return json.loads(cached) if cached else []
+
+
+def _put_cached_reply(key: str, variants: list, reply: str):
+    """Add a freshly generated reply to the cached variants for a prompt."""
+    if int(get_setting("REPLY_CACHE_VARIANTS", REPLY_CACHE_VARIANTS)) <= 0:
+        return
+    try:
+        get_backend().put(
+            f"reply:{key}",
+            json.dumps(variants + [reply], ensure_ascii=False).encode("utf-8"),
+            ttl=float(get_setting("REPLY_CACHE_TTL", REPLY_CACHE_TTL))
+        )
+    except Exception:
+        pass
 
+
+def _get_cached_images(key: str) -> dict:
+    """Look up previously generated portraits for an appearance, or None."""
+    if float(get_setting("IMAGE_CACHE_TTL", IMAGE_CACHE_TTL)) <= 0:
+        return None
+    try:
+        cached = get_backend().get(f"images:{key}")
+        images = get_session_store().get_images(json.loads(cached)) if cached else None
+    except Exception:
+        images = None
+    metrics.incr("cache.images.hit" if images else "cache.images.miss")
+    return images
+
+
+def _put_cached_images(key: str, images: dict):
+    """Share generated portraits with every replica through the state backend."""
+    if float(get_setting("IMAGE_CACHE_TTL", IMAGE_CACHE_TTL)) <= 0:
+        return
+    try:
+        refs, _ = get_session_store().put_images(images)
+        get_backend().put(
+            f"images:{key}",
+            json.dumps(refs).encode("utf-8"),
+            ttl=float(get_setting("IMAGE_CACHE_TTL", IMAGE_CACHE_TTL))
+        )
+    except Exception:
+        pass
+
+
+@timed()
 def generate_response(
     mbti: str,
     mbti_traits: dict,
@@ -38,57 +249,291 @@ def generate_response(
     Returns:
         Generated response text in Korean
     """
-    client = get_client()
-
-    traits = mbti_traits.get(mbti, {})
-
     prompt = RESPONSE_PROMPT.format(
-        mbti=mbti,
-        speech_style=traits.get("speech_style", ""),
-        values=traits.get("values", ""),
-        likes=traits.get("likes", ""),
-        dislikes=traits.get("dislikes", ""),
-        flirting_style=traits.get("flirting_style", ""),
-        sensitive_points=traits.get("sensitive_points", ""),
+        **_character_fields(mbti, mbti_traits),
         emotion=emotion,
         question=question,
         answer=answer
     )
 
-    response = client.chat.completions.create(
-        model="gpt-4o-mini",
+    cache_key = _cache_key(REPLY_MODEL, prompt)
+    cached, variants = _get_cached_reply(cache_key)
+    if cached:
+        return cached
+
+    reply = _chat_completion(**_reply_request(prompt)).strip()
+    _put_cached_reply(cache_key, variants, reply)
+    return reply
+
+
+def _reply_request(prompt: str, model: str = REPLY_MODEL) -> dict:
+    """Chat request for one character reply to a formatted RESPONSE_PROMPT."""
+    return {
+        "model": model,
+        "messages": [
+            {"role": "system", "content": REPLY_SYSTEM_PROMPT},
+            {"role": "user", "content": prompt}
+        ],
+        "max_tokens": 200,
+        "temperature": 0.8
+    }
+
+
+def _character_fields(mbti: str, mbti_traits: dict) -> dict:
+    traits = mbti_traits.get(mbti, {})
+    return {
+        "mbti": mbti,
+        "speech_style": traits.get("speech_style", ""),
+        "values": traits.get("values", ""),
+        "likes": traits.get("likes", ""),
+        "dislikes": traits.get("dislikes", ""),
+        "flirting_style": traits.get("flirting_style", ""),
+        "sensitive_points": traits.get("sensitive_points", "")
+    }
+
+
+def get_reply_mode() -> str:
+    mode = str(get_setting("REPLY_MODE", "single")).lower()
+    return mode if mode in REPLY_MODES else "single"
+
+
+def parse_batch_replies(text: str, count: int) -> list:
+    """Validate a batched reply response.
+
+    Args:
+        text: Model output, expected to be {"1": reply, ..., "<count>": reply}
+        count: Number of options asked for
+
+    Returns:
+        The replies in option order
+
+    Raises:
+        MalformedReplies: If the output is not a JSON object with a non-empty
+            string for every option
+    """
+    try:
+        data = json.loads(text)
+    except (TypeError, ValueError) as e:
+        raise MalformedReplies(f"Not JSON: {e}")
+    if not isinstance(data, dict):
+        raise MalformedReplies(f"Expected a JSON object, got {type(data).__name__}")
+    replies = []
+    for n in range(1, count + 1):
+        reply = data.get(str(n))
+        if not isinstance(reply, str) or not reply.strip():
+            raise MalformedReplies(f"No reply for option {n}")
+        replies.append(reply.strip())
+    return replies
+
+
+@timed()
+def generate_responses(
+    mbti: str,
+    mbti_traits: dict,
+    question: str,
+    options: list
+) -> list:
+    """Generate the replies to every option of a question in one call.
+
+    Each reply is also added to the reply cache under the key
+    generate_response uses for that option.
+
+    Args:
+        mbti: Character's MBTI type
+        mbti_traits: Dictionary containing MBTI personality traits
+        question: The question being asked
+        options: ``(answer, emotion)`` per option, in display order
+
+    Returns:
+        Reply text per option, in the same order
+
+    Raises:
+        MalformedReplies: If the model output fails validation; callers fall
+            back to generate_response for the chosen option
+    """
+    fields = _character_fields(mbti, mbti_traits)
+    prompt = BATCH_RESPONSE_PROMPT.format(
+        **fields,
+        question=question,
+        options="\n".join(f'[{n}] "{answer}" (emotion: {emotion})' for n, (answer, emotion) in enumerate(options, 1))
+    )
+    text = _chat_completion(
+        model=REPLY_MODEL,
         messages=[
-            {"role": "system", "content": "You are a character in a Korean dating simulation game. Respond naturally in Korean."},
+            {"role": "system", "content": REPLY_SYSTEM_PROMPT},
             {"role": "user", "content": prompt}
         ],
-        max_tokens=200,
-        temperature=0.8
+        max_tokens=200 * len(options),
+        temperature=0.8,
+        response_format={"type": "json_object"}
+    )
+    try:
+        replies = parse_batch_replies(text, len(options))
+    except MalformedReplies:
+        metrics.incr("reply.batch.malformed")
+        raise
+
+    variants_wanted = int(get_setting("REPLY_CACHE_VARIANTS", REPLY_CACHE_VARIANTS))
+    for (answer, emotion), reply in zip(options, replies):
+        if variants_wanted <= 0:
+            break
+        single_prompt = RESPONSE_PROMPT.format(**fields, emotion=emotion, question=question, answer=answer)
+        cache_key = _cache_key(REPLY_MODEL, single_prompt)
+        variants = _cached_variants(cache_key)
+        if len(variants) < variants_wanted:
+            _put_cached_reply(cache_key, variants, reply)
+    return replies
+
+
+def _extract_image_bytes(response) -> bytes:
+    """Return the first inline image in a Gemini response, or None."""
+    if response.candidates and response.candidates[0].content.parts:
+        for part in response.candidates[0].content.parts:
+            if hasattr(part, 'inline_data') and part.inline_data:
+                return part.inline_data.data
+    return None
+
+
+def _with_detail(prompt: str, profile: dict) -> str:
+    """Append the profile's rendering detail instructions to an image prompt."""
+    detail = IMAGE_DETAIL_PROMPTS.get(profile["detail"])
+    return f"{prompt}\n{detail}" if detail else prompt
+
+
+def _generate_with_expression_sheet(appearance: dict, mbti: str, profile: dict) -> dict:
+    """Generate all three expressions with a single expression sheet call.
+
+    Returns:
+        Images dictionary like generate_character_images, or None if the
+        sheet could not be generated or failed validation
+    """
+    prompt = EXPRESSION_SHEET_PROMPT.format(
+        gender=appearance.get("gender", "female"),
+        face_type=appearance.get("face_type", "cute"),
+        hair=appearance.get("hair", "long black hair"),
+        eyes=appearance.get("eyes", "brown eyes"),
+        outfit=appearance.get("outfit", "casual clothes"),
+        atmosphere=appearance.get("atmosphere", "warm and friendly")
     )
+    prompt += f"\n\nThis character has {mbti} personality - reflect subtle personality traits in the portraits."
+    prompt = _with_detail(prompt, profile)
+    # Wide sheet whatever the profile's portrait aspect ratio
+    image_config = {**generation_config(profile), "aspect_ratio": SHEET_ASPECT_RATIO}
 
-    return response.choices[0].message.content.strip()
+    started = time.perf_counter()
+    try:
+        sheet = _generate_image(prompt, image_config)
+        if not sheet:
+            raise SheetValidationError("No image in response")
+        panels = split_expression_sheet(sheet, max_side=profile["max_side"])
+    except CallCancelled:
+        raise
+    except Exception:
+        # Counts the wasted sheet call; the edit flow's calls are counted separately
+        metrics.incr("portrait.sheet.fallback")
+        return None
 
+    metrics.incr("portrait.characters.sheet")
+    metrics.incr("portrait.calls.sheet")
+    metrics.observe("portrait.latency.sheet", time.perf_counter() - started)
+    metrics.observe("portrait.consistency.sheet", panel_consistency(panels)["histogram_similarity"])
 
+    images = {expr: base64.b64encode(data).decode('utf-8') for expr, data in panels.items()}
+    images["smile"] = images["neutral"]
+    return images
+
+
+def portrait_mode_report() -> dict:
+    """Compare the edit and sheet portrait modes from recorded metrics.
+
+    Returns:
+        Per-mode characters generated, API calls, latency and consistency,
+        plus calls and latency saved per character by the sheet mode
+    """
+    report = {}
+    for mode in PORTRAIT_MODES:
+        characters = metrics.counter(f"portrait.characters.{mode}")
+        latencies = metrics.samples(f"portrait.latency.{mode}")
+        consistency = metrics.samples(f"portrait.consistency.{mode}")
+        report[mode] = {
+            "characters": characters,
+            "calls": metrics.counter(f"portrait.calls.{mode}"),
+            "calls_per_character": metrics.counter(f"portrait.calls.{mode}") / characters if characters else None,
+            "latency_mean": sum(latencies) / len(latencies) if latencies else None,
+            "latency_p90": metrics.percentile(latencies, 90),
+            "consistency_mean": sum(consistency) / len(consistency) if consistency else None
+        }
+    report["sheet"]["fallbacks"] = metrics.counter("portrait.sheet.fallback")
+
+    edit, sheet = report["edit"], report["sheet"]
+    report["calls_saved_per_character"] = (
+        edit["calls_per_character"] - sheet["calls_per_character"]
+        if edit["calls_per_character"] and sheet["calls_per_character"] else None
+    )
+    report["latency_saved_per_character"] = (
+        edit["latency_mean"] - sheet["latency_mean"]
+        if edit["latency_mean"] and sheet["latency_mean"] else None
+    )
+    return report
+
+
+@timed()
 def generate_character_images(
     appearance: dict,
-    mbti: str
+    mbti: str,
+    on_progress=None,
+    should_cancel=None,
+    profile: dict = None
 ) -> dict:
     """Generate 3 character images with different expressions using Google Gemini.
 
     First generates neutral image, then edits it to create pout and big_smile variants.
+    With the "sheet" PORTRAIT_MODE (or a profile drawing sheets), all three are
+    drawn in one call instead and split locally, falling back to the edit flow
+    if the sheet fails validation.
 
     Args:
         appearance: Dictionary with character appearance details
             - gender, face_type, hair, eyes, outfit, atmosphere
         mbti: Character's MBTI type
+        on_progress: Optional callback ``on_progress(expr_key, img_base64, ok)``
+            invoked as each expression (neutral, pout, big_smile) finishes
+        should_cancel: Optional callable; when it returns True the remaining
+            expression edits are skipped and the partial result is returned
+        profile: Image generation profile (default: ``select_profile()``,
+            the configured one stepped down when the image queue is deep)
 
     Returns:
         Dictionary with expression keys (neutral, pout, big_smile)
         and base64 encoded image data as values. 'smile' maps to 'neutral'.
+
+    Raises:
+        CallCancelled: If the session's work was cancelled before the neutral
+            portrait was drawn (later cancellations return the partial result)
     """
-    from PIL import Image
+    profile = profile or select_profile()
+    cache_key = _cache_key(IMAGE_MODEL, appearance, mbti, profile["name"])
+    cached = _get_cached_images(cache_key)
+    if cached:
+        if on_progress:
+            for expr_key in ("neutral", "pout", "big_smile"):
+                on_progress(expr_key, cached.get(expr_key), True)
+        return cached
+
+    metrics.incr(f"image.profile.{profile['name']}")
+    image_config = generation_config(profile)
+    if (profile["portrait_mode"] or get_setting("PORTRAIT_MODE", "edit")) == "sheet":
+        images = _generate_with_expression_sheet(appearance, mbti, profile)
+        if images:
+            if on_progress:
+                for expr_key in ("neutral", "pout", "big_smile"):
+                    on_progress(expr_key, images[expr_key], True)
+            _put_cached_images(cache_key, images)
+            return images
 
-    client = get_gemini_client()
     images = {}
+    started = time.perf_counter()
+    calls = 1
 
     # Step 1: Generate neutral image first
     neutral_prompt = CHARACTER_IMAGE_PROMPT.format(
@@ -101,35 +546,35 @@ def generate_character_images(
         expression="neutral calm friendly expression with gentle smile"
     )
     neutral_prompt += f"\n\nThis character has {mbti} personality - reflect subtle personality traits in the portrait."
+    neutral_prompt = _with_detail(neutral_prompt, profile)
 
     try:
-        response = client.models.generate_content(
-            model="gemini-2.5-flash-image",
-            contents=neutral_prompt,
-            config=genai.types.GenerateContentConfig(
-                response_modalities=["IMAGE"]
-            )
-        )
-
-        neutral_image_bytes = None
-        if response.candidates and response.candidates[0].content.parts:
-            for part in response.candidates[0].content.parts:
-                if hasattr(part, 'inline_data') and part.inline_data:
-                    neutral_image_bytes = part.inline_data.data
-                    images["neutral"] = base64.b64encode(neutral_image_bytes).decode('utf-8')
-                    break
+        # Edits start from the full-size neutral image; only stored images are downscaled
+        neutral_image_bytes = _generate_image(neutral_prompt, image_config)
+        if neutral_image_bytes:
+            images["neutral"] = base64.b64encode(fit_image(neutral_image_bytes, profile)).decode('utf-8')
 
         if not neutral_image_bytes:
+            if on_progress:
+                on_progress("neutral", None, False)
             images["neutral"] = None
             images["pout"] = None
             images["big_smile"] = None
             images["smile"] = None
             return images
 
-    except Exception as e:
-        st.error(f"Error generating neutral image: {str(e)}")
+    except CallCancelled:
+        raise
+    except Exception:
+        # Runs on job workers without a page: the failed stage is the report
+        metrics.incr("image.failed.neutral")
+        if on_progress:
+            on_progress("neutral", None, False)
         return {"neutral": None, "pout": None, "big_smile": None, "smile": None}
 
+    if on_progress:
+        on_progress("neutral", images["neutral"], True)
+
     # Step 2: Edit neutral image to create other expressions
     expression_edits = {
         "pout": "Change ONLY the facial expression to pouting, annoyed, sulking with puffed cheeks. Keep everything else exactly the same - same character, same clothes, same pose, same background.",
@@ -137,43 +582,48 @@ def generate_character_images(
     }
 
     for expr_key, edit_prompt in expression_edits.items():
-        try:
-            # Load neutral image for editing
-            neutral_pil = Image.open(BytesIO(neutral_image_bytes))
-
-            response = client.models.generate_content(
-                model="gemini-2.5-flash-image",
-                contents=[edit_prompt, neutral_pil],
-                config=genai.types.GenerateContentConfig(
-                    response_modalities=["IMAGE"]
-                )
-            )
+        if should_cancel and should_cancel():
+            return images
 
-            if response.candidates and response.candidates[0].content.parts:
-                for part in response.candidates[0].content.parts:
-                    if hasattr(part, 'inline_data') and part.inline_data:
-                        img_base64 = base64.b64encode(part.inline_data.data).decode('utf-8')
-                        images[expr_key] = img_base64
-                        break
-                else:
-                    images[expr_key] = images["neutral"]  # Fallback to neutral
+        try:
+            # Edit the neutral image
+            calls += 1
+            edited = _generate_image([edit_prompt, neutral_image_bytes], image_config)
+            if edited:
+                images[expr_key] = base64.b64encode(fit_image(edited, profile)).decode('utf-8')
             else:
-                images[expr_key] = images["neutral"]
+                images[expr_key] = images["neutral"]  # Fallback to neutral
 
-        except Exception as e:
-            st.error(f"Error generating {expr_key} image: {str(e)}")
+        except CallCancelled:
+            # The player left; keep what exists and skip the remaining edits
+            return images
+        except Exception:
+            metrics.incr(f"image.failed.{expr_key}")
             images[expr_key] = images["neutral"]  # Fallback to neutral
 
+        if on_progress:
+            on_progress(expr_key, images[expr_key], images[expr_key] is not images["neutral"])
+
     # Map 'smile' to 'neutral' (no separate smile image needed)
     images["smile"] = images.get("neutral")
 
+    metrics.incr("portrait.characters.edit")
+    metrics.incr("portrait.calls.edit", calls)
+    metrics.observe("portrait.latency.edit", time.perf_counter() - started)
+    metrics.observe("portrait.consistency.edit", panel_consistency({
+        expr: base64.b64decode(images[expr]) for expr in ("neutral", "pout", "big_smile")
+    })["histogram_similarity"])
+
+    _put_cached_images(cache_key, images)
     return images
 
 
+@timed()
 def generate_ending_image(
     appearance: dict,
     mbti: str,
-    success: bool
+    success: bool,
+    profile: dict = None
 ) -> str:
     """Generate ending scene image using Google Gemini.
 
@@ -181,12 +631,11 @@ def generate_ending_image(
         appearance: Dictionary with character appearance details
         mbti: Character's MBTI type
         success: True for success ending, False for failure ending
+        profile: Image generation profile (default: ``select_profile()``)
 
     Returns:
-        Base64 encoded image data
+        Base64 encoded image data, or None if generation failed
     """
-    client = get_gemini_client()
-
     ending_type = "SUCCESS" if success else "FAILURE"
 
     prompt = ENDING_IMAGE_PROMPT.format(
@@ -200,25 +649,15 @@ def generate_ending_image(
     )
 
     prompt += f"\n\nThe character has {mbti} personality."
+    profile = profile or select_profile()
+    prompt = _with_detail(prompt, profile)
 
     try:
-        response = client.models.generate_content(
-            model="gemini-2.5-flash-image",
-            contents=prompt,
-            config=genai.types.GenerateContentConfig(
-                response_modalities=["IMAGE"]
-            )
-        )
-
-        # Extract image from response
-        if response.candidates and response.candidates[0].content.parts:
-            for part in response.candidates[0].content.parts:
-                if hasattr(part, 'inline_data') and part.inline_data:
-                    img_base64 = base64.b64encode(part.inline_data.data).decode('utf-8')
-                    return img_base64
-
+        image_bytes = _generate_image(prompt, generation_config(profile, ending=True))
+        if image_bytes:
+            return base64.b64encode(fit_image(image_bytes, profile)).decode('utf-8')
         return None
 
-    except Exception as e:
-        st.error(f"Error generating ending image: {str(e)}")
+    except Exception:
+        metrics.incr("image.failed.ending")
         return None
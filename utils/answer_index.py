@@ -0,0 +1,126 @@
+"""Local grading of free-text answers.
+
+Typed answers are mapped to MBTI tags by their nearest answer options:
+every option text in the question store is indexed as a character n-gram
+TF-IDF vector, a typed answer is vectorized the same way, and the tags of
+the most similar options vote per MBTI dimension. The resulting tags go
+through ``calculate_grade`` like a clicked option, so no network call is
+needed. The index is built with each content version (``utils.content``).
+"""
+
+import math
+import re
+import time
+from collections import Counter, defaultdict
+
+from . import metrics
+
+
+NGRAM_SIZES = (2, 3)
+# Neighbors whose tags vote on the answer
+NEIGHBORS = 5
+# Similarity multiplier for options of the question being answered
+SAME_QUESTION_BOOST = 1.5
+# Tags returned per answer, like the authored options
+TAGS_PER_ANSWER = 3
+
+DIMENSIONS = (("E", "I"), ("S", "N"), ("T", "F"), ("J", "P"))
+
+_NON_WORD = re.compile(r"[^\w]+")
+
+
+def _ngrams(text: str) -> Counter:
+    text = " " + _NON_WORD.sub(" ", text.lower()).strip() + " "
+    grams = Counter()
+    for n in NGRAM_SIZES:
+        grams.update(text[i:i + n] for i in range(len(text) - n + 1))
+    return grams
+
+
+class AnswerIndex:
+    """Inverted character n-gram TF-IDF index over answer options."""
+
+    def __init__(self, options: list):
+        """
+        Args:
+            options: ``(question_id, option_index, text, tags)`` per option
+        """
+        self.options = options
+        counts = [_ngrams(text) for _, _, text, _ in options]
+        document_frequency = Counter(gram for grams in counts for gram in grams)
+        total = len(options)
+        self.idf = {
+            gram: math.log((1 + total) / (1 + df)) + 1
+            for gram, df in document_frequency.items()
+        }
+        # n-gram -> [(option position, weight)]
+        self.postings = defaultdict(list)
+        for position, grams in enumerate(counts):
+            for gram, weight in self._weights(grams).items():
+                self.postings[gram].append((position, weight))
+
+    @classmethod
+    def from_store(cls, store) -> "AnswerIndex":
+        """Index every option of every question in a QuestionStore."""
+        options = []
+        for question_id in store.ids():
+            question = store.get(question_id)
+            for n, option in enumerate(question["options"]):
+                options.append((question_id, n, option["text"], option.get("tags", [])))
+        return cls(options)
+
+    def _weights(self, grams: Counter) -> dict:
+        """L2-normalized TF-IDF weights; n-grams unknown to the index are dropped."""
+        weights = {
+            gram: (1 + math.log(count)) * self.idf[gram]
+            for gram, count in grams.items() if gram in self.idf
+        }
+        norm = math.sqrt(sum(w * w for w in weights.values()))
+        return {gram: w / norm for gram, w in weights.items()} if norm else {}
+
+    def nearest(self, text: str, k: int = NEIGHBORS, question_id: int = None) -> list:
+        """The ``k`` most similar options as ``(score, option)`` pairs, best first."""
+        scores = defaultdict(float)
+        for gram, weight in self._weights(_ngrams(text)).items():
+            for position, option_weight in self.postings[gram]:
+                scores[position] += weight * option_weight
+        if question_id is not None:
+            for position in scores:
+                if self.options[position][0] == question_id:
+                    scores[position] *= SAME_QUESTION_BOOST
+        best = sorted(scores.items(), key=lambda item: -item[1])[:k]
+        return [(score, self.options[position]) for position, score in best]
+
+    def classify(self, text: str, question_id: int = None) -> dict:
+        """Map a typed answer to MBTI tags.
+
+        Args:
+            text: The player's answer
+            question_id: Question being answered; its options weigh more
+
+        Returns:
+            ``tags`` (up to TAGS_PER_ANSWER letters, empty if nothing in the
+            index resembles the text), ``score`` of the nearest option and
+            ``nearest`` ``(question_id, option_index)``
+        """
+        started = time.perf_counter()
+        neighbors = self.nearest(text, question_id=question_id)
+        votes = Counter()
+        for score, (_, _, _, tags) in neighbors:
+            for tag in tags:
+                votes[tag] += score
+
+        # Per dimension, the winning letter and its margin over the other one
+        decided = []
+        for first, second in DIMENSIONS:
+            margin = votes[first] - votes[second]
+            if margin:
+                decided.append((abs(margin), first if margin > 0 else second))
+        tags = [letter for _, letter in sorted(decided, reverse=True)[:TAGS_PER_ANSWER]]
+
+        metrics.observe("answer_index.classify", time.perf_counter() - started)
+        return {
+            "tags": tags,
+            "score": neighbors[0][0] if neighbors else 0.0,
+            "nearest": neighbors[0][1][:2] if neighbors else None
+        }
@@ -0,0 +1,191 @@
+"""Portraits served as content-hashed static files.
+
+Instead of embedding base64 ``data:`` URIs in the page on every rerun,
+portraits are written once to ``<hash>.png`` and referenced by URL, so a
+rerun only sends a short ``<img>`` tag and browsers cache the image.
+
+Modes (PORTRAIT_ASSET_MODE setting):
+    "static" - Streamlit static serving from ``static/portraits`` (needs
+               ``server.enableStaticServing``, set in .streamlit/config.toml);
+               same origin, revalidated with ETags
+    "server" - a small side HTTP server on PORTRAIT_ASSET_PORT sending
+               immutable cache headers; PORTRAIT_ASSET_URL overrides the
+               public base URL (e.g., behind a reverse proxy)
+    "inline" - the old ``data:`` URIs
+"""
+
+import base64
+import os
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import streamlit as st
+
+from .config import PROJECT_ROOT, get_data_dir, get_setting
+from .session_store import DEFAULT_SESSION_TTL
+
+
+ASSET_MODES = ("static", "server", "inline")
+ASSET_PORT = 8502
+IMMUTABLE_CACHE = "public, max-age=31536000, immutable"
+
+STATIC_DIR = PROJECT_ROOT / "static" / "portraits"
+# Files untouched this long are removed (matches the portrait blob TTL)
+ASSET_MAX_AGE = 2 * DEFAULT_SESSION_TTL
+PRUNE_EVERY = 200
+
+_ASSET_PATH = re.compile(r"^/portraits/([0-9a-f]{64})\.png$")
+
+_published = set()
+_publish_count = 0
+_publish_lock = threading.Lock()
+
+
+def get_asset_mode() -> str:
+    mode = str(get_setting("PORTRAIT_ASSET_MODE", "static")).lower()
+    return mode if mode in ASSET_MODES else "static"
+
+
+def _asset_dir(mode: str):
+    if mode == "static":
+        return STATIC_DIR
+    return get_data_dir() / "portraits"
+
+
+def _base_url(mode: str) -> str:
+    if mode == "static":
+        return "app/static/portraits"
+    base = get_setting("PORTRAIT_ASSET_URL")
+    if base:
+        return base.rstrip("/")
+    port = int(get_setting("PORTRAIT_ASSET_PORT", ASSET_PORT))
+    # Same host the page was loaded from, on the asset port
+    host = st.context.headers.get("Host", "localhost").rsplit(":", 1)[0]
+    return f"//{host}:{port}/portraits"
+
+
+def prune_assets(directory, max_age: float = ASSET_MAX_AGE) -> int:
+    """Delete portrait files older than ``max_age`` seconds; returns the count."""
+    cutoff = time.time() - max_age
+    removed = 0
+    for path in directory.glob("*.png"):
+        try:
+            if path.stat().st_mtime < cutoff:
+                path.unlink()
+                _published.discard((str(directory), path.stem))
+                removed += 1
+        except FileNotFoundError:
+            pass
+    return removed
+
+
+def portrait_url(ref: str, img_base64: str) -> str:
+    """URL for a portrait, writing its file on first use.
+
+    Args:
+        ref: Content hash of the image (see session_store.image_hash)
+        img_base64: Base64 encoded PNG data
+
+    Returns:
+        URL to use as an ``<img src>``
+    """
+    global _publish_count
+    mode = get_asset_mode()
+    if mode == "inline":
+        return f"data:image/png;base64,{img_base64}"
+
+    directory = _asset_dir(mode)
+    key = (str(directory), ref)
+    if key not in _published:
+        path = directory / f"{ref}.png"
+        if not path.exists():
+            directory.mkdir(parents=True, exist_ok=True)
+            tmp_path = directory / f".{ref}.{os.getpid()}.{threading.get_ident()}.tmp"
+            tmp_path.write_bytes(base64.b64decode(img_base64))
+            os.replace(tmp_path, path)
+        with _publish_lock:
+            _published.add(key)
+            _publish_count += 1
+            prune = _publish_count % PRUNE_EVERY == 0
+        if prune:
+            prune_assets(directory)
+        if mode == "server":
+            get_asset_server()
+    return f"{_base_url(mode)}/{ref}.png"
+
+
+class AssetServer(ThreadingHTTPServer):
+    """Serves ``/portraits/<hash>.png`` with immutable cache headers."""
+
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, address, directory):
+        super().__init__(address, _AssetHandler)
+        self.directory = directory
+
+
+class _AssetHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_HEAD(self):
+        self._serve(send_body=False)
+
+    def do_GET(self):
+        self._serve(send_body=True)
+
+    def _serve(self, send_body: bool):
+        match = _ASSET_PATH.match(self.path.split("?", 1)[0])
+        path = self.server.directory / f"{match.group(1)}.png" if match else None
+        if path is None or not path.is_file():
+            self.send_response(404)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+
+        etag = f'"{match.group(1)}"'
+        if self.headers.get("If-None-Match") == etag:
+            self.send_response(304)
+            self.send_header("ETag", etag)
+            self.send_header("Cache-Control", IMMUTABLE_CACHE)
+            self.end_headers()
+            return
+
+        data = path.read_bytes()
+        self.send_response(200)
+        self.send_header("Content-Type", "image/png")
+        self.send_header("Content-Length", str(len(data)))
+        self.send_header("ETag", etag)
+        self.send_header("Cache-Control", IMMUTABLE_CACHE)
+        self.send_header("Access-Control-Allow-Origin", "*")
+        self.end_headers()
+        if send_body:
+            self.wfile.write(data)
+
+
+_server = None
+_server_lock = threading.Lock()
+
+
+def get_asset_server() -> AssetServer:
+    """Start the side asset server on first use.
+
+    Returns None if the port is taken, e.g., by another app process sharing
+    the same data directory, which then serves the files instead.
+    """
+    global _server
+    with _server_lock:
+        if _server is None:
+            port = int(get_setting("PORTRAIT_ASSET_PORT", ASSET_PORT))
+            try:
+                _server = AssetServer(("0.0.0.0", port), get_data_dir() / "portraits")
+            except OSError:
+                _server = False
+                return None
+            threading.Thread(target=_server.serve_forever, name="asset-server", daemon=True).start()
+        return _server or None
@@ -0,0 +1,197 @@
+"""Session-scoped cancellation of AI work.
+
+Every AI call runs under a ``CancelToken`` for its session and scope, bound
+by ``utils.scheduler.ai_context``. Scopes separate work a newer request can
+supersede on its own ("reply", "prefetch", "character"); cancelling a
+session cancels all of its scopes. A cancelled token's queued calls leave
+the scheduler queue without being sent, calls about to start are skipped
+and multi-step work (portrait edits) stops between steps. Calls already sent
+to the provider cannot be aborted by the SDKs; they finish and are counted
+as wasted.
+
+Tokens are cancelled when the player goes back to the lobby, when a newer
+request replaces the work, and when a session stops polling for
+AI_SESSION_IDLE_TIMEOUT seconds (closed tab) or its game expires. Work the
+page waits for without rerunning (portrait jobs) holds its session active,
+and the idle time of a closed tab is counted from when that work ends.
+
+Metrics per lane: ``ai.cancelled.<lane>`` calls that were never sent,
+``ai.wasted.<lane>`` calls that finished after their token was cancelled.
+With AI_CANCELLATION=off tokens are still cancelled and wasted calls
+counted, but nothing is skipped, which gives the baseline to compare with.
+"""
+
+import threading
+import time
+from contextlib import contextmanager
+
+from .config import get_setting
+
+
+DEFAULT_SCOPE = "session"
+# Seconds without a rerun or request after which a session's work is cancelled
+AI_SESSION_IDLE_TIMEOUT = 60.0
+
+
+class CallCancelled(Exception):
+    """Raised instead of making an AI call whose token was cancelled."""
+
+
+class CancelToken:
+    """Cancellation flag shared by the AI calls of one session scope."""
+
+    def __init__(self, session: str, scope: str):
+        self.session = session
+        self.scope = scope
+        self.reason = None
+        self._event = threading.Event()
+        self._callbacks = []
+        self._lock = threading.Lock()
+
+    @property
+    def cancelled(self) -> bool:
+        return self._event.is_set()
+
+    def cancel(self, reason: str = "cancelled"):
+        with self._lock:
+            if self._event.is_set():
+                return
+            self.reason = reason
+            self._event.set()
+            callbacks, self._callbacks = self._callbacks, []
+        for callback in callbacks:
+            callback()
+
+    def on_cancel(self, callback):
+        """Call ``callback()`` once the token is cancelled (right away if it is)."""
+        with self._lock:
+            if not self._event.is_set():
+                self._callbacks.append(callback)
+                return
+        callback()
+
+    def remove_callback(self, callback):
+        with self._lock:
+            if callback in self._callbacks:
+                self._callbacks.remove(callback)
+
+
+def enforced() -> bool:
+    """Whether cancelled calls are skipped (AI_CANCELLATION setting)."""
+    return str(get_setting("AI_CANCELLATION", "on")).lower() != "off"
+
+
+class CancellationRegistry:
+    """Current token per (session, scope) and each session's last activity."""
+
+    def __init__(self, idle_timeout: float = AI_SESSION_IDLE_TIMEOUT):
+        self.idle_timeout = idle_timeout
+        self._lock = threading.Lock()
+        self._tokens = {}
+        self._last_seen = {}
+        self._active = {}
+        self._reaper = None
+
+    def token(self, session: str, scope: str = None) -> CancelToken:
+        """The live token for new calls of ``session`` in ``scope``."""
+        key = (session, scope or DEFAULT_SCOPE)
+        with self._lock:
+            token = self._tokens.get(key)
+            if token is None:
+                token = self._tokens[key] = CancelToken(*key)
+            self._last_seen.setdefault(session, time.monotonic())
+            self._start_reaper()
+            return token
+
+    def cancel(self, session: str, scope: str = None, reason: str = "cancelled") -> int:
+        """Cancel a session's calls in ``scope`` (all scopes if None).
+
+        Later calls get a fresh token, so only work started before this
+        point is affected.
+
+        Returns:
+            Number of tokens cancelled
+        """
+        with self._lock:
+            keys = [key for key in self._tokens if key[0] == session and scope in (None, key[1])]
+            tokens = [self._tokens.pop(key) for key in keys]
+            if scope is None:
+                self._last_seen.pop(session, None)
+        for token in tokens:
+            token.cancel(reason)
+        return len(tokens)
+
+    def touch(self, session: str):
+        """Record activity for ``session`` (a rerun or an API request)."""
+        with self._lock:
+            self._last_seen[session] = time.monotonic()
+
+    @contextmanager
+    def active(self, session: str):
+        """Keep ``session`` from being cancelled as idle while the block runs.
+
+        For background work whose page shows a placeholder instead of
+        rerunning until the result is ready.
+        """
+        with self._lock:
+            self._active[session] = self._active.get(session, 0) + 1
+        try:
+            yield
+        finally:
+            with self._lock:
+                count = self._active.pop(session) - 1
+                if count:
+                    self._active[session] = count
+                if session in self._last_seen:
+                    self._last_seen[session] = time.monotonic()
+
+    def cancel_idle(self) -> int:
+        """Cancel sessions without activity for ``idle_timeout`` seconds.
+
+        Sessions inside ``active`` are never idle.
+
+        Returns:
+            Number of sessions cancelled
+        """
+        cutoff = time.monotonic() - self.idle_timeout
+        with self._lock:
+            idle = [
+                session for session, seen in self._last_seen.items()
+                if seen < cutoff and session not in self._active
+            ]
+        for session in idle:
+            self.cancel(session, reason="idle")
+        return len(idle)
+
+    def _start_reaper(self):
+        """Start the idle check thread; called with the lock held."""
+        if self._reaper is None and self.idle_timeout > 0:
+            self._reaper = threading.Thread(target=self._reap, name="ai-cancel-idle", daemon=True)
+            self._reaper.start()
+
+    def _reap(self):
+        while True:
+            time.sleep(min(self.idle_timeout, 10.0))
+            self.cancel_idle()
+
+
+_registry = None
+_registry_lock = threading.Lock()
+
+
+def get_cancellation() -> CancellationRegistry:
+    """Return the process-wide cancellation registry."""
+    global _registry
+    with _registry_lock:
+        if _registry is None:
+            _registry = CancellationRegistry(
+                idle_timeout=float(get_setting("AI_SESSION_IDLE_TIMEOUT", AI_SESSION_IDLE_TIMEOUT))
+            )
+        return _registry
+
+
+def cancel_session(session: str, scope: str = None, reason: str = "cancelled") -> int:
+    """Cancel outstanding AI work of ``session`` (see CancellationRegistry.cancel)."""
+    if not session:
+        return 0
+    return get_cancellation().cancel(session, scope, reason)
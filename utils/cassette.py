@@ -0,0 +1,213 @@
+"""Record and replay AI provider calls.
+
+Every OpenAI and Gemini request in ``utils.ai_client`` goes through
+``cassette_call``. In record mode the live response, keyed by a fingerprint
+of the request, is appended to a JSONL cassette together with the observed
+latency; in replay mode responses are served from the cassette without
+network access, either instantly or after the recorded latency.
+
+Settings:
+    AI_CASSETTE_MODE       "off" (default), "record" or "replay"
+    AI_CASSETTE_PATH       cassette file (default: <data dir>/cassettes/ai.jsonl)
+    AI_CASSETTE_TIMING     "instant" (default) or "recorded"
+    AI_CASSETTE_UNMATCHED  replay behavior for unknown requests: "error"
+                           (default), "fallback" (any recording of the same
+                           API, picked by fingerprint) or "live"
+"""
+
+import base64
+import hashlib
+import json
+import threading
+import time
+from pathlib import Path
+
+from . import metrics
+from .config import get_data_dir, get_setting
+
+
+CASSETTE_MODES = ("off", "record", "replay")
+CASSETTE_TIMINGS = ("instant", "recorded")
+UNMATCHED_BEHAVIORS = ("error", "fallback", "live")
+
+
+class CassetteMiss(LookupError):
+    """Raised in replay mode when a request has no recording."""
+
+
+class RecordedError(RuntimeError):
+    """A provider error that was recorded and is being replayed."""
+
+
+def _canonical(value):
+    """JSON-friendly form of a request; binary parts are reduced to their hash."""
+    if isinstance(value, bytes):
+        return {"sha256": hashlib.sha256(value).hexdigest()}
+    if isinstance(value, dict):
+        return {key: _canonical(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_canonical(item) for item in value]
+    return value
+
+
+def fingerprint(api: str, request: dict) -> str:
+    """Stable hash identifying a request to ``api``."""
+    raw = json.dumps([api, _canonical(request)], ensure_ascii=False, sort_keys=True)
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+def _input_hashes(value) -> list:
+    """sha256 of every binary part of a request (e.g., images sent for editing)."""
+    if isinstance(value, bytes):
+        return [hashlib.sha256(value).hexdigest()]
+    if isinstance(value, dict):
+        value = list(value.values())
+    if isinstance(value, (list, tuple)):
+        return [digest for item in value for digest in _input_hashes(item)]
+    return []
+
+
+def _summary(request: dict) -> dict:
+    """Short human-readable description of a request for the cassette file."""
+    summary = {}
+    for key, value in _canonical(request).items():
+        text = json.dumps(value, ensure_ascii=False)
+        summary[key] = text if len(text) <= 200 else text[:200] + "..."
+    return summary
+
+
+class Cassette:
+    """Recordings from one cassette file."""
+
+    def __init__(self, path):
+        self.path = Path(path)
+        self._lock = threading.Lock()
+        self._entries = {}
+        self._by_api = {}
+        # Next recording to serve per fingerprint (round-robin over repeats)
+        self._cursor = {}
+        if self.path.exists():
+            with open(self.path, "r", encoding="utf-8") as f:
+                for line in f:
+                    if line.strip():
+                        self._add(json.loads(line))
+
+    def _add(self, entry: dict):
+        self._entries.setdefault(entry["fingerprint"], []).append(entry)
+        self._by_api.setdefault(entry["api"], []).append(entry)
+
+    def __len__(self) -> int:
+        return sum(len(entries) for entries in self._entries.values())
+
+    def record(self, api: str, request: dict, response: dict, latency: float, error: str = None):
+        """Append one call to the cassette file."""
+        entry = {
+            "fingerprint": fingerprint(api, request),
+            "api": api,
+            "request": _summary(request),
+            "inputs": _input_hashes(request),
+            "response": response,
+            "error": error,
+            "latency": round(latency, 4)
+        }
+        line = json.dumps(entry, ensure_ascii=False)
+        with self._lock:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(line + "\n")
+            self._add(entry)
+
+    def match(self, api: str, request: dict, fallback: bool = False) -> dict:
+        """Return the next recording for a request, or None.
+
+        Repeated recordings of the same request (e.g., sampled chat replies)
+        are served in turn. With ``fallback``, an unknown request gets a
+        recording of the same API chosen deterministically by its fingerprint.
+        """
+        key = fingerprint(api, request)
+        with self._lock:
+            entries = self._entries.get(key)
+            if not entries:
+                candidates = self._by_api.get(api)
+                if not fallback or not candidates:
+                    return None
+                return candidates[int(key, 16) % len(candidates)]
+            index = self._cursor.get(key, 0)
+            self._cursor[key] = index + 1
+            return entries[index % len(entries)]
+
+
+_cassette = None
+_cassette_lock = threading.Lock()
+
+
+def get_cassette() -> Cassette:
+    """Return the process-wide cassette, loading it on first use."""
+    global _cassette
+    with _cassette_lock:
+        if _cassette is None:
+            path = get_setting("AI_CASSETTE_PATH") or get_data_dir() / "cassettes" / "ai.jsonl"
+            _cassette = Cassette(path)
+        return _cassette
+
+
+def cassette_mode() -> str:
+    mode = str(get_setting("AI_CASSETTE_MODE", "off")).lower()
+    if mode not in CASSETTE_MODES:
+        raise ValueError(f"AI_CASSETTE_MODE must be one of {CASSETTE_MODES}, got {mode!r}")
+    return mode
+
+
+def cassette_call(api: str, request: dict, live_call) -> dict:
+    """Run a provider call through the configured cassette mode.
+
+    Args:
+        api: Provider API name, e.g., "openai.chat"
+        request: JSON-serializable request (bytes allowed) used as the key
+        live_call: Zero-argument callable making the real call and returning
+            a JSON-serializable response payload
+
+    Returns:
+        The response payload (live or replayed)
+
+    Raises:
+        CassetteMiss: Replay mode, no recording and AI_CASSETTE_UNMATCHED=error
+        RecordedError: The recorded call failed
+    """
+    mode = cassette_mode()
+    if mode == "off":
+        return live_call()
+
+    cassette = get_cassette()
+    if mode == "replay":
+        unmatched = str(get_setting("AI_CASSETTE_UNMATCHED", "error")).lower()
+        entry = cassette.match(api, request, fallback=unmatched == "fallback")
+        if entry is None:
+            metrics.incr("cassette.miss")
+            if unmatched != "live":
+                raise CassetteMiss(f"No {api} recording for request {fingerprint(api, request)[:12]}")
+            return live_call()
+        metrics.incr("cassette.hit")
+        if str(get_setting("AI_CASSETTE_TIMING", "instant")).lower() == "recorded":
+            time.sleep(entry["latency"])
+        if entry.get("error"):
+            raise RecordedError(entry["error"])
+        return entry["response"]
+
+    started = time.perf_counter()
+    try:
+        response = live_call()
+    except Exception as e:
+        cassette.record(api, request, None, time.perf_counter() - started, error=str(e))
+        raise
+    cassette.record(api, request, response, time.perf_counter() - started)
+    return response
+
+
+def encode_bytes(data: bytes) -> str:
+    """Base64 text for binary response payloads (None stays None)."""
+    return base64.b64encode(data).decode("ascii") if data is not None else None
+
+
+def decode_bytes(text: str) -> bytes:
+    return base64.b64decode(text) if text is not None else None
@@ -0,0 +1,39 @@
+"""Deployment settings read from Streamlit secrets or environment variables."""
+
+import os
+from pathlib import Path
+
+import streamlit as st
+
+
+PROJECT_ROOT = Path(__file__).parent.parent
+
+
+def get_setting(name: str, default=None):
+    """Look up a deployment setting.
+
+    Streamlit secrets take precedence over environment variables so that a
+    single ``secrets.toml`` can configure a deployment, while containers can
+    still override values through the environment.
+
+    Args:
+        name: Setting name (e.g., "DATA_DIR")
+        default: Value returned when the setting is not defined anywhere
+
+    Returns:
+        The configured value, or ``default``
+    """
+    try:
+        if name in st.secrets:
+            return st.secrets[name]
+    except Exception:
+        # No secrets.toml present - fall through to the environment
+        pass
+    return os.environ.get(name, default)
+
+
+def get_data_dir() -> Path:
+    """Directory for local runtime data (session checkpoints, caches)."""
+    path = Path(get_setting("DATA_DIR", PROJECT_ROOT / ".matchplay"))
+    path.mkdir(parents=True, exist_ok=True)
+    return path
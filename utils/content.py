@@ -0,0 +1,332 @@
+"""Versioned, hot-reloadable game content.
+
+The questions (data/questions.json, or a prebuilt QUESTION_DB) and MBTI
+traits (data/mbti_traits.json) form a ``ContentVersion`` whose id combines
+a hash of each source (of a prebuilt database's size and modification
+time, so it is never read in full). A background thread watches the
+sources; when one changes it is validated and only that part is rebuilt,
+then the new version becomes ``current()`` in a single reference swap.
+New games start on the current version and record its id; games in
+progress keep reading the version they started with. Nothing is checked
+per rerun.
+
+Old versions are closed once more than CONTENT_VERSIONS_KEPT exist, except
+those a game used within CONTENT_VERSION_PIN seconds. Every version's
+question database and traits stay on disk under their hashes, so a game
+asking for a closed version (or resumed after a restart) gets it reopened
+rather than another version's questions.
+"""
+
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from pathlib import Path
+
+from . import metrics
+from .answer_index import AnswerIndex
+from .config import PROJECT_ROOT, get_data_dir, get_setting
+from .question_store import QuestionStore, build_question_store
+
+
+QUESTIONS_JSON = PROJECT_ROOT / "data" / "questions.json"
+TRAITS_JSON = PROJECT_ROOT / "data" / "mbti_traits.json"
+
+# Seconds between source checks (CONTENT_POLL_INTERVAL setting; 0 disables)
+CONTENT_POLL_INTERVAL = 2.0
+# Versions kept open for games in progress
+CONTENT_VERSIONS_KEPT = 5
+# Versions a game used this recently are kept open beyond CONTENT_VERSIONS_KEPT
+CONTENT_VERSION_PIN = 3600.0
+
+MBTI_LETTERS = set("EISNTFJP")
+TRAIT_FIELDS = ("name", "speech_style", "values", "likes", "dislikes", "flirting_style", "sensitive_points")
+MIN_QUESTIONS = 12
+
+
+class ContentError(ValueError):
+    """Raised when a content file fails validation."""
+
+
+def validate_questions(data: dict) -> list:
+    """Problems found in questions.json data (empty if valid)."""
+    questions = data.get("questions") if isinstance(data, dict) else None
+    if not isinstance(questions, list):
+        return ["questions.json needs a top-level \"questions\" list"]
+    errors = []
+    seen = set()
+    for n, question in enumerate(questions):
+        label = f"question {question.get('id', f'#{n + 1}')}" if isinstance(question, dict) else f"question #{n + 1}"
+        if not isinstance(question, dict) or not question.get("q"):
+            errors.append(f"{label}: missing text \"q\"")
+            continue
+        if question.get("id") in seen:
+            errors.append(f"{label}: duplicate id")
+        seen.add(question.get("id"))
+        options = question.get("options")
+        if not isinstance(options, list) or len(options) < 2:
+            errors.append(f"{label}: needs at least two options")
+            continue
+        for option in options:
+            if not isinstance(option, dict) or not option.get("text"):
+                errors.append(f"{label}: option without text")
+            elif not set(option.get("tags", [])) <= MBTI_LETTERS:
+                errors.append(f"{label}: unknown tags {sorted(set(option['tags']) - MBTI_LETTERS)}")
+    if len(questions) < MIN_QUESTIONS:
+        errors.append(f"only {len(questions)} questions, a game needs {MIN_QUESTIONS}")
+    return errors
+
+
+def validate_traits(data: dict) -> list:
+    """Problems found in mbti_traits.json data (empty if valid)."""
+    from .engine import MBTI_TYPES
+
+    if not isinstance(data, dict):
+        return ["mbti_traits.json must be an object keyed by MBTI type"]
+    errors = []
+    for mbti in MBTI_TYPES:
+        traits = data.get(mbti)
+        if not isinstance(traits, dict):
+            errors.append(f"{mbti}: missing")
+            continue
+        missing = [field for field in TRAIT_FIELDS if not traits.get(field)]
+        if missing:
+            errors.append(f"{mbti}: missing {', '.join(missing)}")
+    return errors
+
+
+def _digest(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()[:12]
+
+
+class ContentVersion:
+    """One immutable snapshot of the game content."""
+
+    def __init__(self, questions: QuestionStore, questions_hash: str, mbti_traits: dict, traits_hash: str,
+                 answer_index: AnswerIndex = None):
+        self.questions = questions
+        self.questions_hash = questions_hash
+        # Free-text answer grading over this version's options
+        self.answer_index = answer_index or AnswerIndex.from_store(questions)
+        self.mbti_traits = mbti_traits
+        self.traits_hash = traits_hash
+        self.id = f"{questions_hash}-{traits_hash}"
+        self.loaded_at = time.time()
+        # Last time a game asked for this version (pins it open)
+        self.last_used = time.monotonic()
+
+
+class ContentManager:
+    """Loads, validates and hot-swaps content versions."""
+
+    def __init__(self, questions_path=QUESTIONS_JSON, traits_path=TRAITS_JSON, question_db=None,
+                 poll_interval: float = CONTENT_POLL_INTERVAL, keep: int = CONTENT_VERSIONS_KEPT):
+        """
+        Args:
+            questions_path: questions.json to build the question store from
+            traits_path: mbti_traits.json
+            question_db: Prebuilt question database used instead of questions_path
+            poll_interval: Seconds between source checks (0 disables watching)
+            keep: Number of versions kept available for games in progress
+        """
+        self.questions_path = Path(question_db or questions_path)
+        self.prebuilt = question_db is not None
+        self.traits_path = Path(traits_path)
+        self.poll_interval = poll_interval
+        self.keep = keep
+        self.last_error = None
+        self._lock = threading.Lock()
+        self._versions = {}
+        self._mtimes = {}
+        self._current = None
+
+        # The first version must load; later invalid edits are only reported
+        self._changed()
+        self.reload(raise_errors=True)
+        if poll_interval > 0:
+            threading.Thread(target=self._watch, name="content-watch", daemon=True).start()
+
+    def current(self) -> ContentVersion:
+        """The version new games should use."""
+        return self._current
+
+    def get(self, version_id: str) -> ContentVersion:
+        """The version a game started with.
+
+        A version no longer open is reopened from its files; only if those
+        are gone too (e.g., a replaced QUESTION_DB) is the current version
+        returned instead.
+        """
+        if not version_id:
+            return self._current
+        version = self._versions.get(version_id)
+        if version is None:
+            with self._lock:
+                version = self._versions.get(version_id) or self._reopen(version_id)
+        if version is None:
+            metrics.incr("content.version_missing")
+            return self._current
+        version.last_used = time.monotonic()
+        return version
+
+    def _content_dir(self) -> Path:
+        directory = get_data_dir() / "content"
+        directory.mkdir(exist_ok=True)
+        return directory
+
+    def _reopen(self, version_id: str) -> ContentVersion:
+        """Open a closed version from its files; called with the lock held.
+
+        Returns:
+            The version (now open again), or None if its files are gone
+        """
+        questions_hash, _, traits_hash = version_id.partition("-")
+        directory = self._content_dir()
+        traits_path = directory / f"mbti_traits-{traits_hash}.json"
+        if self.prebuilt:
+            # Only the database currently in place can be opened
+            current = self._current
+            path = self.questions_path if current and current.questions_hash == questions_hash else None
+        else:
+            path = directory / f"questions-{questions_hash}.db"
+        if path is None or not path.exists() or not traits_path.exists():
+            return None
+        shared = next((v for v in self._versions.values() if v.questions_hash == questions_hash), None)
+        try:
+            questions = shared.questions if shared else QuestionStore(path)
+            traits = json.loads(traits_path.read_bytes())
+        except (OSError, ValueError, sqlite3.Error):
+            return None
+        version = ContentVersion(
+            questions, questions_hash, traits, traits_hash, shared.answer_index if shared else None
+        )
+        self._versions[version.id] = version
+        self._evict()
+        metrics.incr("content.reopened")
+        return version
+
+    def _evict(self):
+        """Close the oldest versions beyond ``keep``; called with the lock held."""
+        cutoff = time.monotonic() - CONTENT_VERSION_PIN
+        for old_id in list(self._versions)[:-self.keep]:
+            old = self._versions[old_id]
+            if old is self._current or old.last_used > cutoff:
+                continue
+            del self._versions[old_id]
+            # Traits-only changes share the question store with newer versions
+            if all(version.questions is not old.questions for version in self._versions.values()):
+                old.questions.close()
+            metrics.incr("content.evicted")
+
+    def _changed(self) -> bool:
+        mtimes = {path: path.stat().st_mtime_ns for path in (self.questions_path, self.traits_path)}
+        if mtimes == self._mtimes:
+            return False
+        self._mtimes = mtimes
+        return True
+
+    def _watch(self):
+        while True:
+            time.sleep(self.poll_interval)
+            try:
+                if self._changed():
+                    self.reload()
+            except (OSError, sqlite3.Error) as e:
+                # A file being replaced, briefly missing or half written; try again next poll
+                self.last_error = str(e)
+
+    def _load_questions(self, current: ContentVersion):
+        if self.prebuilt:
+            # Never read the whole database: it can be far larger than memory
+            stat = self.questions_path.stat()
+            questions_hash = _digest(f"{stat.st_size}:{stat.st_mtime_ns}".encode("ascii"))
+        else:
+            raw = self.questions_path.read_bytes()
+            questions_hash = _digest(raw)
+        if current and current.questions_hash == questions_hash:
+            return current.questions, questions_hash
+
+        if self.prebuilt:
+            store = QuestionStore(self.questions_path)
+            if store.count() < MIN_QUESTIONS:
+                raise ContentError(f"{self.questions_path}: fewer than {MIN_QUESTIONS} questions")
+            return store, questions_hash
+
+        errors = validate_questions(json.loads(raw))
+        if errors:
+            raise ContentError(f"{self.questions_path.name}: " + "; ".join(errors[:5]))
+        directory = self._content_dir()
+        path = directory / f"questions-{questions_hash}.db"
+        if not path.exists():
+            # Build from the bytes just validated, not the (possibly newer) file
+            snapshot = directory / f"questions-{questions_hash}.json"
+            snapshot.write_bytes(raw)
+            build_question_store([snapshot], path)
+            snapshot.unlink()
+        return QuestionStore(path), questions_hash
+
+    def _load_traits(self, current: ContentVersion):
+        raw = self.traits_path.read_bytes()
+        traits_hash = _digest(raw)
+        if current and current.traits_hash == traits_hash:
+            return current.mbti_traits, traits_hash
+        traits = json.loads(raw)
+        errors = validate_traits(traits)
+        if errors:
+            raise ContentError(f"{self.traits_path.name}: " + "; ".join(errors[:5]))
+        # Kept by hash so the version can be reopened after it is closed or a restart
+        path = self._content_dir() / f"mbti_traits-{traits_hash}.json"
+        if not path.exists():
+            path.write_bytes(raw)
+        return traits, traits_hash
+
+    def reload(self, raise_errors: bool = False) -> bool:
+        """Load changed sources and make them current if they validate.
+
+        Returns:
+            True if a new version became current
+        """
+        current = self._current
+        try:
+            questions, questions_hash = self._load_questions(current)
+            traits, traits_hash = self._load_traits(current)
+        except (ContentError, ValueError) as e:
+            self.last_error = str(e)
+            metrics.incr("content.invalid")
+            if raise_errors:
+                raise
+            return False
+
+        self.last_error = None
+        if current and current.questions_hash == questions_hash:
+            if current.traits_hash == traits_hash:
+                return False
+            answer_index = current.answer_index
+        else:
+            started = time.perf_counter()
+            answer_index = AnswerIndex.from_store(questions)
+            metrics.observe("content.answer_index_build", time.perf_counter() - started)
+        version = ContentVersion(questions, questions_hash, traits, traits_hash, answer_index)
+        with self._lock:
+            self._versions[version.id] = version
+            self._current = version
+            self._evict()
+        metrics.incr("content.reloads")
+        return True
+
+
+_manager = None
+_manager_lock = threading.Lock()
+
+
+def get_content() -> ContentManager:
+    """Return the process-wide content manager, loading content on first use."""
+    global _manager
+    with _manager_lock:
+        if _manager is None:
+            _manager = ContentManager(
+                question_db=get_setting("QUESTION_DB"),
+                poll_interval=float(get_setting("CONTENT_POLL_INTERVAL", CONTENT_POLL_INTERVAL))
+            )
+        return _manager
@@ -0,0 +1,244 @@
+"""Game rules independent of any UI.
+
+``GameEngine`` owns question sampling, grading, the affection clamp and the
+ending conditions. A game is a plain ``GameState`` that the Streamlit app
+keeps in ``st.session_state`` and the JSON API (``api.py``) keeps in memory,
+so the rules are exercised without script reruns. Questions and traits come
+from ``utils.content``; each game stays on the content version it began with.
+"""
+
+import random
+
+
+MBTI_TYPES = [
+    "INTJ", "INTP", "ENTJ", "ENTP",
+    "INFJ", "INFP", "ENFJ", "ENFP",
+    "ISTJ", "ISFJ", "ESTJ", "ESFJ",
+    "ISTP", "ISFP", "ESTP", "ESFP"
+]
+
+QUESTIONS_PER_GAME = 12
+START_AFFECTION = 30
+MAX_AFFECTION = 100
+# Affection needed at the last question for the success ending
+SUCCESS_AFFECTION = 80
+
+
+class GameError(Exception):
+    """Raised for actions that are not allowed in the current game state."""
+
+
+def calculate_grade(mbti: str, tags: list) -> tuple:
+    """Calculate grade based on MBTI match with answer tags.
+
+    Args:
+        mbti: Character's MBTI (e.g., "INFP")
+        tags: List of MBTI dimension tags for the answer (e.g., ["I", "N", "F"])
+
+    Returns:
+        Tuple of (grade, delta) where grade is "good"/"ok"/"bad"
+    """
+    mbti_letters = list(mbti)  # ["I", "N", "F", "P"]
+    match_count = sum(1 for tag in tags if tag in mbti_letters)
+
+    if match_count >= 3:
+        return ("good", 30)
+    elif match_count == 2:
+        return ("ok", 10)
+    else:
+        return ("bad", -10)
+
+
+class GameState:
+    """Everything needed to continue one game (JSON-serializable via to_dict)."""
+
+    FIELDS = (
+        "mbti", "question_order", "affection", "current_q_idx", "total_questions",
+        "log", "answered", "ending_type", "session", "content_version"
+    )
+
+    def __init__(self, mbti: str, question_order: list, affection: int = START_AFFECTION,
+                 current_q_idx: int = 0, total_questions: int = None, log: list = None,
+                 answered: bool = False, ending_type: str = None, session: str = None,
+                 content_version: str = None):
+        self.mbti = mbti
+        self.question_order = question_order
+        self.affection = affection
+        self.current_q_idx = current_q_idx
+        self.total_questions = total_questions or len(question_order)
+        self.log = log if log is not None else []
+        # True between answer() and advance()
+        self.answered = answered
+        self.ending_type = ending_type
+        # Identifies the player in emitted events
+        self.session = session
+        # Content the game started with (question ids refer to it)
+        self.content_version = content_version
+
+    def to_dict(self) -> dict:
+        return {field: getattr(self, field) for field in self.FIELDS}
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "GameState":
+        return cls(**{field: data[field] for field in cls.FIELDS if field in data})
+
+
+class GameEngine:
+    """Stateless rules applied to ``GameState`` objects."""
+
+    def __init__(self, content=None, event_log=None, reply_fn=None):
+        """
+        Args:
+            content: ContentManager providing questions and traits (default: the shared one)
+            event_log: EventLog receiving choice/ending events, or None
+            reply_fn: ``fn(mbti, mbti_traits, question, answer, grade)`` used by
+                ``reply`` (default: the local reply engine)
+        """
+        if content is None:
+            from .content import get_content
+            content = get_content()
+        if reply_fn is None:
+            from .local_replies import generate_local_response
+            reply_fn = generate_local_response
+        self.content = content
+        self.event_log = event_log
+        self.reply_fn = reply_fn
+
+    def new_game(self, mbti: str = None, num_questions: int = QUESTIONS_PER_GAME,
+                 session: str = None, rng: random.Random = None) -> GameState:
+        """Start a game against ``mbti`` (random type if None)."""
+        rng = rng or random
+        mbti = mbti or rng.choice(MBTI_TYPES)
+        if mbti not in MBTI_TYPES:
+            raise GameError(f"Unknown MBTI type {mbti!r}")
+        version = self.content.current()
+        order = version.questions.sample_ids(num_questions, rng=rng)
+        return GameState(mbti, order, session=session, content_version=version.id)
+
+    def content_for(self, state: GameState):
+        """The ContentVersion a game was started with."""
+        return self.content.get(state.content_version)
+
+    def is_over(self, state: GameState) -> bool:
+        return state.ending_type is not None
+
+    def current_question(self, state: GameState) -> dict:
+        """The question being asked, or None once the game is over."""
+        if self.is_over(state):
+            return None
+        return self.content_for(state).questions.get(state.question_order[state.current_q_idx])
+
+    def _check_answerable(self, state: GameState):
+        if self.is_over(state):
+            raise GameError("The game is over")
+        if state.answered:
+            raise GameError("The current question was already answered")
+
+    def _record(self, state: GameState, question: dict, option, answer: str, tags: list) -> dict:
+        grade, delta = calculate_grade(state.mbti, tags)
+        state.affection = max(0, min(MAX_AFFECTION, state.affection + delta))
+        state.answered = True
+        entry = {
+            "question_id": question["id"],
+            "option": option,
+            "question": question["q"],
+            "answer": answer,
+            "grade": grade,
+            "delta": delta
+        }
+        state.log.append(entry)
+        return entry
+
+    def answer(self, state: GameState, option: int) -> dict:
+        """Answer the current question with option index ``option``.
+
+        Returns:
+            The new log entry: question_id, option, question, answer, grade, delta
+
+        Raises:
+            GameError: If the game is over, the question was already answered
+                or ``option`` does not exist
+        """
+        self._check_answerable(state)
+        question = self.current_question(state)
+        if not 0 <= option < len(question["options"]):
+            raise GameError(f"Question {question['id']} has no option {option}")
+
+        choice = question["options"][option]
+        entry = self._record(state, question, option, choice["text"], choice.get("tags", []))
+        if self.event_log:
+            self.event_log.emit(
+                "choice", session=state.session, question_id=question["id"], option=option,
+                mbti=state.mbti, grade=entry["grade"], delta=entry["delta"]
+            )
+        return entry
+
+    def answer_text(self, state: GameState, text: str) -> dict:
+        """Answer the current question in the player's own words.
+
+        The text is graded locally through the content version's answer
+        index, which maps it to the tags of the most similar options.
+
+        Returns:
+            The new log entry (see ``answer``) with option None and the
+            inferred ``tags``
+
+        Raises:
+            GameError: If the game is over, the question was already answered
+                or ``text`` is blank
+        """
+        self._check_answerable(state)
+        text = text.strip()
+        if not text:
+            raise GameError("The answer is empty")
+        question = self.current_question(state)
+        match = self.content_for(state).answer_index.classify(text, question_id=question["id"])
+        entry = self._record(state, question, None, text, match["tags"])
+        entry["tags"] = match["tags"]
+        if self.event_log:
+            self.event_log.emit(
+                "free_answer", session=state.session, question_id=question["id"],
+                mbti=state.mbti, tags=match["tags"], score=round(match["score"], 3),
+                grade=entry["grade"], delta=entry["delta"]
+            )
+        return entry
+
+    def reply(self, state: GameState, entry: dict) -> str:
+        """Character reply to an answer log entry, from ``reply_fn``."""
+        traits = self.content_for(state).mbti_traits
+        return self.reply_fn(state.mbti, traits, entry["question"], entry["answer"], entry["grade"])
+
+    def advance(self, state: GameState) -> bool:
+        """Move past the answered question and check the ending conditions.
+
+        Returns:
+            True if the game ended
+
+        Raises:
+            GameError: If the current question has not been answered
+        """
+        if self.is_over(state):
+            return True
+        if not state.answered:
+            raise GameError("Answer the current question first")
+        state.answered = False
+        state.current_q_idx += 1
+
+        if state.affection <= 0:
+            state.ending_type = "failure"
+        elif state.affection >= MAX_AFFECTION:
+            state.ending_type = "success"
+        elif state.current_q_idx >= state.total_questions:
+            # Game finished - check final affection
+            state.ending_type = "success" if state.affection >= SUCCESS_AFFECTION else "failure"
+
+        if state.ending_type and self.event_log:
+            self.event_log.emit(
+                "ending", session=state.session, mbti=state.mbti, result=state.ending_type,
+                affection=state.affection,
+                choices=[
+                    [entry["question_id"], entry["option"]]
+                    for entry in state.log if entry["option"] is not None
+                ]
+            )
+        return self.is_over(state)
@@ -0,0 +1,256 @@
+"""Gameplay event pipeline with incrementally maintained choice statistics.
+
+``emit`` only appends to an in-process buffer; a background thread flushes
+the buffer in batches to an append-only SQLite log and folds each batch's
+counter deltas into a counters table in the same transaction. Statistics
+such as how many players picked an option are therefore a single counter
+lookup instead of a scan over past events. The same thread loads the
+counters table into memory at startup and reloads it every
+EVENT_COUNTS_REFRESH seconds (picking up other replicas' events), so
+reading a counter never waits on disk.
+
+Counter keys:
+    q:{id}:picks                 answers to question ``id``
+    q:{id}:o:{n}:picks           answers choosing option ``n``
+    q:{id}:o:{n}:{mbti}:picks    ...against a character of type ``mbti``
+    q:{id}:o:{n}:games / :wins   finished games containing that choice
+    q:{id}:free:picks            typed (free-text) answers to question ``id``
+    mbti:{mbti}:games / :wins    finished games per character type
+    starts:{ai_cost}             game starts; "none" replays the same character
+"""
+
+import atexit
+import json
+import sqlite3
+import threading
+import time
+from collections import Counter, deque
+
+from . import metrics
+from .config import get_data_dir, get_setting
+
+
+# Pipeline defaults (override with settings of the same name)
+EVENT_FLUSH_INTERVAL = 1.0
+EVENT_BATCH_SIZE = 500
+# Events beyond this many unflushed ones are dropped (oldest first)
+EVENT_BUFFER_MAX = 10000
+# Seconds between reloads of the counters table
+EVENT_COUNTS_REFRESH = 30.0
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS events (
+    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+    ts REAL NOT NULL,
+    type TEXT NOT NULL,
+    payload TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS counters (
+    key TEXT PRIMARY KEY,
+    value INTEGER NOT NULL
+) WITHOUT ROWID;
+"""
+
+
+def counter_deltas(event: dict) -> Counter:
+    """Counter increments implied by one event."""
+    deltas = Counter()
+    if event["type"] == "choice":
+        prefix = f"q:{event['question_id']}"
+        option = f"{prefix}:o:{event['option']}"
+        deltas[f"{prefix}:picks"] += 1
+        deltas[f"{option}:picks"] += 1
+        deltas[f"{option}:{event['mbti']}:picks"] += 1
+    elif event["type"] == "free_answer":
+        deltas[f"q:{event['question_id']}:free:picks"] += 1
+    elif event["type"] == "ending":
+        won = 1 if event["result"] == "success" else 0
+        deltas[f"mbti:{event['mbti']}:games"] += 1
+        deltas[f"mbti:{event['mbti']}:wins"] += won
+        for question_id, option in event.get("choices", []):
+            deltas[f"q:{question_id}:o:{option}:games"] += 1
+            deltas[f"q:{question_id}:o:{option}:wins"] += won
+    elif event["type"] == "start":
+        # ai_cost: "none" (replay with the same character) or "generated"
+        deltas[f"starts:{event['ai_cost']}"] += 1
+    return deltas
+
+
+class EventLog:
+    """Buffered, batch-flushed event log with cached counters."""
+
+    def __init__(self, path, flush_interval: float = EVENT_FLUSH_INTERVAL,
+                 batch_size: int = EVENT_BATCH_SIZE, buffer_max: int = EVENT_BUFFER_MAX,
+                 counts_refresh: float = EVENT_COUNTS_REFRESH):
+        self.path = str(path)
+        self.flush_interval = flush_interval
+        self.batch_size = batch_size
+        self.counts_refresh = counts_refresh
+        self._buffer = deque(maxlen=buffer_max)
+        self._lock = threading.Lock()
+        self._wakeup = threading.Condition(self._lock)
+        # Held while committing a batch or reloading counters, so a reload
+        # never sees a batch both on disk and as in flight
+        self._db_lock = threading.Lock()
+        # Counters table as last loaded, plus the batches committed since
+        self._counts = {}
+        self._counts_loaded = None
+        # Deltas of buffered events and of the batch currently being written
+        self._pending = Counter()
+        self._inflight = Counter()
+
+        self._conn = sqlite3.connect(self.path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(SCHEMA)
+
+        self._closed = False
+        self._thread = threading.Thread(target=self._run, name="event-flush", daemon=True)
+        self._thread.start()
+
+    def emit(self, event_type: str, **fields):
+        """Record an event without touching disk."""
+        event = {"type": event_type, "ts": time.time(), **fields}
+        deltas = counter_deltas(event)
+        with self._lock:
+            if len(self._buffer) == self._buffer.maxlen:
+                self._pending.subtract(counter_deltas(self._buffer.popleft()))
+                metrics.incr("events.dropped")
+            self._buffer.append(event)
+            self._pending.update(deltas)
+            if len(self._buffer) >= self.batch_size:
+                self._wakeup.notify()
+        metrics.incr("events.emitted")
+
+    def count(self, key: str) -> int:
+        """Current value of a counter, including events not yet flushed.
+
+        Memory only: until the flush thread first loads the counters table,
+        only this process's unflushed events are counted.
+        """
+        with self._lock:
+            return self._counts.get(key, 0) + self._pending[key] + self._inflight[key]
+
+    def choice_share(self, question_id: int, option: int, exclude_self: bool = True) -> float:
+        """Fraction of answers to a question that chose ``option``.
+
+        Args:
+            question_id: Question id
+            option: Option index
+            exclude_self: Leave out one pick of ``option``, i.e., the player's own
+
+        Returns:
+            Share between 0.0 and 1.0, or None if nobody else answered
+        """
+        own = 1 if exclude_self else 0
+        total = self.count(f"q:{question_id}:picks") - own
+        if total <= 0:
+            return None
+        return max(0, self.count(f"q:{question_id}:o:{option}:picks") - own) / total
+
+    def success_rate(self, key_prefix: str) -> float:
+        """Win rate for ``q:{id}:o:{n}`` or ``mbti:{type}``, or None without games."""
+        games = self.count(f"{key_prefix}:games")
+        if not games:
+            return None
+        return self.count(f"{key_prefix}:wins") / games
+
+    def flush(self):
+        """Write all buffered events now (blocks; meant for shutdown and tools)."""
+        while self._write_batch():
+            pass
+
+    def close(self):
+        self._closed = True
+        with self._lock:
+            self._wakeup.notify()
+        self._thread.join(timeout=5)
+        self.flush()
+        self._conn.close()
+
+    def _run(self):
+        while not self._closed:
+            try:
+                if self._counts_loaded is None or time.monotonic() - self._counts_loaded >= self.counts_refresh:
+                    self._load_counts()
+                while self._write_batch():
+                    pass
+            except sqlite3.Error:
+                metrics.incr("events.flush_failed")
+            with self._lock:
+                if len(self._buffer) < self.batch_size and not self._closed:
+                    self._wakeup.wait(self.flush_interval)
+
+    def _load_counts(self):
+        """Replace the in-memory counters with the counters table."""
+        started = time.perf_counter()
+        with self._db_lock:
+            counts = dict(self._conn.execute("SELECT key, value FROM counters"))
+            with self._lock:
+                self._counts = counts
+        self._counts_loaded = time.monotonic()
+        metrics.observe("events.counts_load_latency", time.perf_counter() - started)
+
+    def _write_batch(self) -> bool:
+        """Write up to batch_size buffered events; False when nothing was buffered."""
+        with self._db_lock:
+            with self._lock:
+                if not self._buffer:
+                    return False
+                batch = [self._buffer.popleft() for _ in range(min(self.batch_size, len(self._buffer)))]
+                deltas = Counter()
+                for event in batch:
+                    deltas.update(counter_deltas(event))
+                self._pending.subtract(deltas)
+                self._inflight = deltas
+
+            started = time.perf_counter()
+            try:
+                with self._conn:
+                    self._conn.executemany(
+                        "INSERT INTO events (ts, type, payload) VALUES (?, ?, ?)",
+                        [(event["ts"], event["type"], json.dumps(event, ensure_ascii=False)) for event in batch]
+                    )
+                    self._conn.executemany(
+                        "INSERT INTO counters (key, value) VALUES (?, ?) "
+                        "ON CONFLICT(key) DO UPDATE SET value = value + excluded.value",
+                        [(key, delta) for key, delta in deltas.items() if delta]
+                    )
+            except sqlite3.Error:
+                # Keep the batch so the next flush retries it; it is older than
+                # everything buffered, so when there is no room it is dropped first
+                with self._lock:
+                    room = self._buffer.maxlen - len(self._buffer)
+                    kept = batch[len(batch) - room:] if room < len(batch) else batch
+                    for event in kept:
+                        self._pending.update(counter_deltas(event))
+                    self._buffer.extendleft(reversed(kept))
+                    self._inflight = Counter()
+                if len(kept) < len(batch):
+                    metrics.incr("events.dropped", len(batch) - len(kept))
+                raise
+            with self._lock:
+                for key, delta in deltas.items():
+                    self._counts[key] = self._counts.get(key, 0) + delta
+                self._inflight = Counter()
+            metrics.observe("events.flush_latency", time.perf_counter() - started)
+            metrics.incr("events.flushed", len(batch))
+            return True
+
+
+_log = None
+_log_lock = threading.Lock()
+
+
+def get_event_log() -> EventLog:
+    """Return the process-wide event log, creating it on first use."""
+    global _log
+    with _log_lock:
+        if _log is None:
+            _log = EventLog(
+                get_setting("EVENT_DB", get_data_dir() / "events.db"),
+                flush_interval=float(get_setting("EVENT_FLUSH_INTERVAL", EVENT_FLUSH_INTERVAL)),
+                batch_size=int(get_setting("EVENT_BATCH_SIZE", EVENT_BATCH_SIZE)),
+                counts_refresh=float(get_setting("EVENT_COUNTS_REFRESH", EVENT_COUNTS_REFRESH))
+            )
+            atexit.register(_log.flush)
+        return _log
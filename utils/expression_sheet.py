@@ -0,0 +1,115 @@
+"""Split a single generated expression sheet into per-expression portraits."""
+
+from io import BytesIO
+
+from PIL import Image, ImageChops, ImageStat
+
+
+# Left-to-right panel order requested by EXPRESSION_SHEET_PROMPT
+SHEET_EXPRESSIONS = ["neutral", "pout", "big_smile"]
+
+# A sheet must be clearly wider than tall to hold three side-by-side panels
+MIN_SHEET_ASPECT = 1.5
+# Aspect ratio requested for sheets: three panels of about 3:4 side by side
+SHEET_ASPECT_RATIO = "21:9"
+# Panels with less grayscale spread than this are blank or solid fills
+MIN_PANEL_STDDEV = 8.0
+# Color histogram overlap between panels; below this they show different scenes
+MIN_PANEL_SIMILARITY = 0.5
+# Mean absolute difference (0-1) below which panels are duplicates, not expressions
+MIN_PANEL_DIFFERENCE = 0.001
+
+
+class SheetValidationError(ValueError):
+    """Raised when a generated image is not a usable three-panel sheet."""
+
+
+def split_expression_sheet(image_bytes: bytes, max_side: int = None) -> dict:
+    """Crop a three-panel expression sheet into separate PNG images.
+
+    Args:
+        image_bytes: Encoded sheet image (neutral, pout, big_smile left to right)
+        max_side: Downscale panels to fit this many pixels before encoding
+
+    Returns:
+        Dictionary with expression keys and PNG bytes as values
+
+    Raises:
+        SheetValidationError: If the image does not look like a valid sheet
+    """
+    try:
+        sheet = Image.open(BytesIO(image_bytes)).convert("RGB")
+    except Exception as e:
+        raise SheetValidationError(f"Unreadable sheet image: {e}")
+
+    width, height = sheet.size
+    if width < MIN_SHEET_ASPECT * height:
+        raise SheetValidationError(f"Sheet is {width}x{height}, expected three side-by-side panels")
+
+    panel_width = width // len(SHEET_EXPRESSIONS)
+    panels = {
+        expr: sheet.crop((i * panel_width, 0, (i + 1) * panel_width, height))
+        for i, expr in enumerate(SHEET_EXPRESSIONS)
+    }
+
+    for expr, panel in panels.items():
+        if ImageStat.Stat(panel.convert("L")).stddev[0] < MIN_PANEL_STDDEV:
+            raise SheetValidationError(f"Panel '{expr}' is blank")
+
+    metrics = panel_consistency(panels)
+    if metrics["histogram_similarity"] < MIN_PANEL_SIMILARITY:
+        raise SheetValidationError("Panels do not show the same character and background")
+    if metrics["min_difference"] < MIN_PANEL_DIFFERENCE:
+        raise SheetValidationError("Panels are identical - expressions were not drawn")
+
+    result = {}
+    for expr, panel in panels.items():
+        if max_side:
+            panel.thumbnail((max_side, max_side), Image.LANCZOS)
+        buffer = BytesIO()
+        # Same encoding as utils.portrait_delta, so variants can be stored as deltas
+        panel.save(buffer, format="PNG", compress_level=1)
+        result[expr] = buffer.getvalue()
+    return result
+
+
+def panel_consistency(panels: dict) -> dict:
+    """Measure how consistent expression variants are with the neutral portrait.
+
+    Args:
+        panels: Expression keys mapped to PIL images or encoded image bytes;
+            must include "neutral"
+
+    Returns:
+        Dictionary with
+            - histogram_similarity: lowest color histogram overlap (0-1)
+              between neutral and a variant (1 = identical palette)
+            - mean_difference: average per-pixel difference (0-1) to neutral
+            - min_difference: smallest per-pixel difference (0-1) to neutral
+    """
+    images = {
+        expr: Image.open(BytesIO(img)) if isinstance(img, bytes) else img
+        for expr, img in panels.items()
+    }
+    neutral = images["neutral"].convert("RGB").resize((64, 64))
+    neutral_hist = neutral.histogram()
+
+    similarities = []
+    differences = []
+    for expr, img in images.items():
+        if expr == "neutral":
+            continue
+        variant = img.convert("RGB").resize((64, 64))
+        hist = variant.histogram()
+        overlap = sum(min(a, b) for a, b in zip(neutral_hist, hist))
+        similarities.append(overlap / max(1, sum(neutral_hist)))
+        diff = ImageStat.Stat(ImageChops.difference(neutral, variant).convert("L")).mean[0]
+        differences.append(diff / 255)
+
+    if not similarities:
+        return {"histogram_similarity": 1.0, "mean_difference": 0.0, "min_difference": 0.0}
+    return {
+        "histogram_similarity": min(similarities),
+        "mean_difference": sum(differences) / len(differences),
+        "min_difference": min(differences)
+    }
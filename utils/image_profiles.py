@@ -0,0 +1,127 @@
+"""Named image generation profiles for portraits and ending scenes.
+
+A profile sets what is asked of the image model (aspect ratio, output size
+where the model supports it, prompt detail level), how portraits are drawn
+(expression edits or a single expression sheet) and the largest side the
+result is stored at. Portraits are displayed at up to 300 px, so the
+model's ~1024 px output is downscaled before it is cached, stored in
+session state and sent to browsers.
+
+    fast-small - one expression sheet call per character, 320 px, plain
+                 rendering; what the app falls back to under load
+    standard   - the default: edits from the neutral portrait, 640 px
+                 (sharp on high-density screens)
+    hq         - edits, full model resolution, extra rendering detail
+
+IMAGE_PROFILE picks the deployment's profile. When the image lane backs up,
+every IMAGE_PROFILE_DOWNGRADE_DEPTH waiting calls step new characters one
+profile down (not below IMAGE_PROFILE_FLOOR), so a burst of players gets
+portraits sooner instead of queueing behind full-detail ones.
+"""
+
+from io import BytesIO
+
+from . import metrics
+from .config import get_setting
+
+
+IMAGE_PROFILES = {
+    "fast-small": {
+        "aspect_ratio": "1:1",
+        "ending_aspect_ratio": "1:1",
+        "image_size": None,
+        "max_side": 320,
+        "detail": "low",
+        "portrait_mode": "sheet"
+    },
+    "standard": {
+        "aspect_ratio": "1:1",
+        "ending_aspect_ratio": "4:3",
+        "image_size": None,
+        "max_side": 640,
+        "detail": "standard",
+        "portrait_mode": None
+    },
+    "hq": {
+        "aspect_ratio": "1:1",
+        "ending_aspect_ratio": "16:9",
+        "image_size": None,
+        "max_side": None,
+        "detail": "high",
+        "portrait_mode": "edit"
+    }
+}
+# Cheapest first; auto-downgrade walks down this order
+PROFILE_ORDER = ("fast-small", "standard", "hq")
+DEFAULT_PROFILE = "standard"
+# Waiting image calls per downgrade step (AI_IMAGE_SLOTS by default)
+IMAGE_PROFILE_DOWNGRADE_DEPTH = 6
+
+
+def get_profile(name: str = None) -> dict:
+    """The named profile (default: the IMAGE_PROFILE setting) with its ``name``."""
+    name = str(name or get_setting("IMAGE_PROFILE", DEFAULT_PROFILE)).lower()
+    if name not in IMAGE_PROFILES:
+        name = DEFAULT_PROFILE
+    return {"name": name, **IMAGE_PROFILES[name]}
+
+
+def select_profile(waiting: int = None) -> dict:
+    """Profile for new image work at the current load.
+
+    Args:
+        waiting: Image calls waiting for a slot (default: the gemini.image
+            scheduler's queue)
+
+    Returns:
+        The configured profile, stepped down one level per
+        IMAGE_PROFILE_DOWNGRADE_DEPTH waiting calls
+    """
+    profile = get_profile()
+    depth = int(get_setting("IMAGE_PROFILE_DOWNGRADE_DEPTH", IMAGE_PROFILE_DOWNGRADE_DEPTH))
+    if depth <= 0:
+        return profile
+    if waiting is None:
+        from .scheduler import get_scheduler
+        waiting = sum(get_scheduler("gemini.image").stats()["waiting"].values())
+
+    floor = get_profile(get_setting("IMAGE_PROFILE_FLOOR", PROFILE_ORDER[0]))["name"]
+    level = PROFILE_ORDER.index(profile["name"])
+    lowest = min(level, PROFILE_ORDER.index(floor))
+    downgraded = max(lowest, level - waiting // depth)
+    if downgraded == level:
+        return profile
+    metrics.incr("image.profile.downgraded")
+    return get_profile(PROFILE_ORDER[downgraded])
+
+
+def generation_config(profile: dict, ending: bool = False) -> dict:
+    """Image options sent to the model for this profile (unset ones omitted)."""
+    config = {"aspect_ratio": profile["ending_aspect_ratio"] if ending else profile["aspect_ratio"]}
+    if profile["image_size"]:
+        config["image_size"] = profile["image_size"]
+    return config
+
+
+def fit_image(data: bytes, profile: dict) -> bytes:
+    """Downscale an image to the profile's ``max_side`` as PNG.
+
+    Images already small enough (or unreadable) are returned unchanged.
+    """
+    from PIL import Image
+
+    max_side = profile["max_side"]
+    if not data or not max_side:
+        return data
+    try:
+        image = Image.open(BytesIO(data))
+        if max(image.size) <= max_side:
+            return data
+        image.thumbnail((max_side, max_side), Image.LANCZOS)
+        buffer = BytesIO()
+        # Fast compression: this runs on the portrait path, zlib's default is ~4x slower
+        image.save(buffer, format="PNG", compress_level=1)
+    except Exception:
+        return data
+    metrics.observe(f"image.bytes_saved.{profile['name']}", len(data) - buffer.tell())
+    return buffer.getvalue()
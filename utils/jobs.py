@@ -0,0 +1,183 @@
+"""Process-level background job queue with per-stage progress.
+
+Long-running work (character creation) is submitted as a job instead of
+running inside a Streamlit script run. Jobs are deduplicated by a caller
+supplied key (the session token), so repeated clicks or reconnects never
+start the same work twice, and the UI polls the job for progress.
+"""
+
+import contextvars
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+from .config import get_setting
+
+
+# Queue defaults (override with settings of the same name)
+JOB_WORKERS = 4
+JOB_QUEUE_DEPTH = 32
+# Finished jobs are kept this long so late polls can still collect results
+JOB_RETENTION = 600
+
+ACTIVE_STATUSES = ("queued", "running")
+
+
+class QueueFullError(Exception):
+    """Raised when the queue already holds the maximum number of active jobs."""
+
+
+class Job:
+    """A unit of background work and its observable progress."""
+
+    def __init__(self, key: str, stages: list):
+        self.id = uuid.uuid4().hex
+        self.key = key
+        self.status = "queued"
+        self.stages = {stage: "pending" for stage in stages}
+        # Intermediate results published by finished stages
+        self.partial = {}
+        self.result = None
+        self.error = None
+        self.created_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+        self._cancelled = threading.Event()
+        # Guards stages and partial, written by the worker and read by reruns
+        self._lock = threading.Lock()
+
+    @property
+    def active(self) -> bool:
+        return self.status in ACTIVE_STATUSES
+
+    @property
+    def progress(self) -> float:
+        """Fraction of stages completed (0.0 - 1.0)."""
+        if not self.stages:
+            return 1.0 if self.status == "done" else 0.0
+        done = sum(1 for state in self.stages.values() if state != "pending")
+        return done / len(self.stages)
+
+    def report_stage(self, stage: str, value=None, ok: bool = True):
+        """Mark ``stage`` as finished and publish its result; called from the worker."""
+        with self._lock:
+            self.partial[stage] = value
+            self.stages[stage] = "done" if ok else "failed"
+
+    def snapshot(self) -> tuple:
+        """Consistent copies of ``(stages, partial)`` to iterate outside the worker."""
+        with self._lock:
+            return dict(self.stages), dict(self.partial)
+
+    def cancel(self):
+        """Ask the job to stop; workers check ``cancelled`` between stages."""
+        self._cancelled.set()
+        if self.status == "queued":
+            self.status = "cancelled"
+
+    @property
+    def cancelled(self) -> bool:
+        return self._cancelled.is_set()
+
+
+class JobQueue:
+    """Bounded worker pool running deduplicated jobs."""
+
+    def __init__(self, max_workers: int = JOB_WORKERS, max_depth: int = JOB_QUEUE_DEPTH,
+                 retention: float = JOB_RETENTION):
+        self.max_depth = max_depth
+        self.retention = retention
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="job")
+        self._lock = threading.Lock()
+        self._jobs = {}
+        self._by_key = {}
+
+    def submit(self, key: str, fn, stages: list = None) -> Job:
+        """Submit ``fn(job)`` unless a job for ``key`` already exists.
+
+        Args:
+            key: Deduplication key, e.g., the session token
+            fn: Callable receiving the Job and returning its result
+            stages: Names of progress stages ``fn`` will report
+
+        Returns:
+            The new job, or the existing active/finished job for ``key``
+
+        Raises:
+            QueueFullError: If max_depth jobs are already queued or running
+        """
+        with self._lock:
+            self._purge()
+            existing = self._jobs.get(self._by_key.get(key))
+            if existing and existing.status not in ("failed", "cancelled"):
+                return existing
+
+            depth = sum(1 for job in self._jobs.values() if job.active)
+            if depth >= self.max_depth:
+                raise QueueFullError(f"{depth} jobs already queued")
+
+            job = Job(key, stages or [])
+            self._jobs[job.id] = job
+            self._by_key[key] = job.id
+
+        # Run in the submitter's context (AI scheduling class and session)
+        self._executor.submit(contextvars.copy_context().run, self._run, job, fn)
+        return job
+
+    def get(self, job_id: str) -> Job:
+        """Return the job with ``job_id``, or None if unknown or purged."""
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def cancel(self, job_id: str):
+        """Cancel a job if it is still queued or running."""
+        job = self.get(job_id)
+        if job and job.active:
+            job.cancel()
+
+    @property
+    def depth(self) -> int:
+        """Number of queued or running jobs."""
+        with self._lock:
+            return sum(1 for job in self._jobs.values() if job.active)
+
+    def _run(self, job: Job, fn):
+        if job.cancelled:
+            job.status = "cancelled"
+            job.finished_at = time.time()
+            return
+        job.status = "running"
+        job.started_at = time.time()
+        try:
+            job.result = fn(job)
+            job.status = "cancelled" if job.cancelled else "done"
+        except Exception as e:
+            job.error = str(e)
+            job.status = "failed"
+        finally:
+            job.finished_at = time.time()
+
+    def _purge(self):
+        cutoff = time.time() - self.retention
+        for job_id, job in list(self._jobs.items()):
+            if not job.active and job.finished_at and job.finished_at < cutoff:
+                del self._jobs[job_id]
+                if self._by_key.get(job.key) == job_id:
+                    del self._by_key[job.key]
+
+
+_queue = None
+_queue_lock = threading.Lock()
+
+
+def get_job_queue() -> JobQueue:
+    """Return the process-wide job queue, creating it on first use."""
+    global _queue
+    with _queue_lock:
+        if _queue is None:
+            _queue = JobQueue(
+                max_workers=int(get_setting("JOB_WORKERS", JOB_WORKERS)),
+                max_depth=int(get_setting("JOB_QUEUE_DEPTH", JOB_QUEUE_DEPTH))
+            )
+        return _queue
@@ -0,0 +1,185 @@
+"""Local reply engine composed from MBTI traits.
+
+Builds short 반말 replies from grade-specific templates, phrase banks taken
+from ``data/mbti_traits.json`` (likes, dislikes, values) and the topic of the
+question. No network access; a reply takes a few microseconds, so it serves
+as the offline mode, the fallback when the AI reply is late or fails, and the
+default reply engine in load tests.
+"""
+
+import random
+
+from .config import get_setting
+from .profiling import timed
+
+
+REPLY_ENGINES = ("llm", "local")
+
+OPENERS = {
+    "good": ["와, ", "오, ", "헐, ", "진짜? ", ""],
+    "ok": ["음, ", "아하, ", "그렇구나. ", ""],
+    "bad": ["음... ", "아... ", "흠, ", ""],
+}
+
+REACTIONS = {
+    "good": [
+        "그 대답 완전 내 스타일이야.",
+        "나도 딱 그렇게 생각했거든.",
+        "우리 생각보다 잘 맞는 것 같아.",
+        "그렇게 말해줘서 고마워.",
+    ],
+    "ok": [
+        "나쁘지 않은 대답이네.",
+        "그런 생각도 괜찮다고 봐.",
+        "조금 의외지만 이해는 돼.",
+        "너다운 대답인 것 같아.",
+    ],
+    "bad": [
+        "그건 좀 나랑 다른 것 같아.",
+        "솔직히 조금 아쉽긴 해.",
+        "그건 생각 못 했네.",
+        "우리 생각이 좀 다르구나.",
+    ],
+}
+
+# {like}, {dislike} and {value} are filled from the character's traits
+TRAIT_LINES = {
+    "good": [
+        "나 {like} 진짜 좋아하거든.",
+        "{like} 얘기할 때처럼 설렌다.",
+        "난 {value}, 그게 제일 중요하거든.",
+    ],
+    "ok": [
+        "그래도 난 {like} 쪽이 더 끌리긴 해.",
+        "난 {value}, 그걸 좀 더 챙기고 싶어.",
+    ],
+    "bad": [
+        "난 {dislike} 같은 건 좀 별로거든.",
+        "나한테는 {value}, 그게 중요해서 그래.",
+    ],
+}
+
+# {topic} comes from TOPIC_KEYWORDS; {topic_eun} adds the 은/는 particle
+TOPIC_LINES = {
+    "good": ["{topic} 얘기에서 이렇게 통하니까 좋다.", "{topic}도 너랑이면 재밌을 것 같아."],
+    "ok": ["{topic}에 대해선 좀 더 얘기해보고 싶어.", "{topic_eun} 천천히 맞춰가면 되겠지."],
+    "bad": ["{topic_eun} 우리 좀 맞춰봐야겠다.", "{topic} 얘기는 다음에 다시 하자."],
+}
+
+# One closer per letter of the type; the character picks a letter at random
+LETTER_CLOSERS = {
+    "E": {"good": "다음엔 같이 해보자!", "ok": "얘기 더 해줘!", "bad": "그래도 말해줘서 좋아!"},
+    "I": {"good": "...속으로 엄청 좋아하는 중이야.", "ok": "조금 더 생각해볼게.", "bad": "...잠깐 생각 좀 할게."},
+    "T": {"good": "논리적으로도 완벽한 답이야.", "ok": "합리적이긴 하네.", "bad": "이유가 좀 더 궁금해."},
+    "F": {"good": "마음이 따뜻해졌어.", "ok": "네 마음은 알 것 같아.", "bad": "조금 서운하긴 하다."},
+    "S": {"good": "현실적이라 더 믿음이 가.", "ok": "직접 해보면 알겠지.", "bad": "현실적으로는 좀 어려울 것 같아."},
+    "N": {"good": "상상만 해도 벌써 좋다.", "ok": "다른 가능성도 있을 것 같아.", "bad": "좀 더 새로운 생각을 듣고 싶었어."},
+    "J": {"good": "벌써 다음 계획 세우고 싶어져.", "ok": "미리 정해두면 더 좋을 것 같아.", "bad": "난 미리 정해두는 게 편하거든."},
+    "P": {"good": "이런 즉흥적인 느낌 좋아.", "ok": "뭐, 그때그때 보면 되지.", "bad": "너무 딱딱한 건 좀 답답해."},
+}
+
+GOOD_EMOJIS = [" 💕", " ✨", " 😊", ""]
+
+# Substring of the question -> topic noun used in TOPIC_LINES
+TOPIC_KEYWORDS = [
+    ("데이트", "데이트"), ("연락", "연락"), ("기념일", "기념일"), ("주말", "주말"),
+    ("싸우", "싸우는 거"), ("친구", "친구"), ("선물", "선물"), ("결혼", "결혼"),
+    ("여행", "여행"), ("연애", "연애"), ("돈", "돈 관리"), ("SNS", "SNS"),
+    ("가족", "가족"), ("취미", "취미"), ("늦잠", "늦잠"), ("이벤트", "이벤트"),
+    ("옷", "옷 스타일"), ("꿈", "꿈"), ("반려동물", "반려동물"), ("집안일", "집안일"),
+    ("요리", "요리"), ("운동", "운동"), ("미래", "미래"), ("게임", "게임"),
+    ("음식", "음식"), ("영화", "영화"), ("술", "술"), ("스트레스", "스트레스"),
+    ("혼자", "혼자만의 시간"), ("전화", "연락"), ("비밀", "비밀"), ("추억", "추억"),
+]
+
+_banks = {}
+
+
+def get_reply_engine() -> str:
+    """Configured reply engine: "llm" (default) or "local" for offline mode."""
+    engine = str(get_setting("REPLY_ENGINE", "llm")).lower()
+    return engine if engine in REPLY_ENGINES else "llm"
+
+
+def _split(value: str) -> list:
+    return [item.strip() for item in (value or "").split(",") if item.strip()]
+
+
+def _bank(mbti: str, traits: dict) -> dict:
+    """Phrase bank for one type, built once per distinct traits entry."""
+    key = (mbti, traits.get("likes"), traits.get("dislikes"), traits.get("values"))
+    bank = _banks.get(key)
+    if bank is None:
+        bank = {
+            "like": _split(traits.get("likes")) or ["너랑 얘기하는 거"],
+            "dislike": _split(traits.get("dislikes")) or ["애매한 거"],
+            "value": _split(traits.get("values")) or ["진심"],
+            "letters": [letter for letter in mbti.upper() if letter in LETTER_CLOSERS],
+        }
+        _banks[key] = bank
+    return bank
+
+
+def _with_topic_particle(word: str) -> str:
+    """Append 은 or 는 depending on whether the last syllable has a final consonant."""
+    last = word[-1]
+    if "가" <= last <= "힣" and (ord(last) - ord("가")) % 28:
+        return word + "은"
+    return word + "는"
+
+
+def question_topic(question: str) -> str:
+    """Topic noun for a question, or None if no keyword matches."""
+    for keyword, topic in TOPIC_KEYWORDS:
+        if keyword in question:
+            return topic
+    return None
+
+
+@timed("reply.local")
+def generate_local_response(
+    mbti: str,
+    mbti_traits: dict,
+    question: str,
+    answer: str,
+    emotion: str,
+    rng: random.Random = None
+) -> str:
+    """Compose a character reply locally; same arguments as generate_response.
+
+    Args:
+        mbti: Character's MBTI type (e.g., "INFP")
+        mbti_traits: Dictionary containing MBTI personality traits
+        question: The question that was asked
+        answer: Player's answer (unused; replies react to the grade)
+        emotion: Emotional state - "bad", "ok", or "good"
+        rng: Random source, e.g., seeded for reproducible replies
+
+    Returns:
+        Reply text in Korean 반말 (two or three sentences)
+    """
+    rng = rng or random
+    grade = emotion if emotion in REACTIONS else "ok"
+    bank = _bank(mbti, mbti_traits.get(mbti, {}))
+
+    sentences = [rng.choice(OPENERS[grade]) + rng.choice(REACTIONS[grade])]
+
+    topic = question_topic(question)
+    if topic and rng.random() < 0.4:
+        sentences.append(rng.choice(TOPIC_LINES[grade]).format(topic=topic, topic_eun=_with_topic_particle(topic)))
+    else:
+        sentences.append(rng.choice(TRAIT_LINES[grade]).format(
+            like=rng.choice(bank["like"]),
+            dislike=rng.choice(bank["dislike"]),
+            value=rng.choice(bank["value"])
+        ))
+
+    # Extraverts tend to add a third sentence, introverts keep it short
+    talkative = "E" in bank["letters"]
+    if bank["letters"] and rng.random() < (0.8 if talkative else 0.5):
+        sentences.append(LETTER_CLOSERS[rng.choice(bank["letters"])][grade])
+
+    reply = " ".join(sentences)
+    if grade == "good":
+        reply += rng.choice(GOOD_EMOJIS)
+    return reply
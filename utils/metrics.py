@@ -0,0 +1,77 @@
+"""In-process counters and latency samples for runtime metrics."""
+
+import threading
+from collections import defaultdict, deque
+
+
+# Number of most recent samples kept per series
+SAMPLE_WINDOW = 1000
+
+_lock = threading.Lock()
+_counters = defaultdict(int)
+_samples = defaultdict(lambda: deque(maxlen=SAMPLE_WINDOW))
+
+
+def incr(name: str, value: int = 1):
+    """Increment counter ``name`` by ``value``."""
+    with _lock:
+        _counters[name] += value
+
+
+def observe(name: str, value: float):
+    """Record one sample (e.g., a latency in seconds) for series ``name``."""
+    with _lock:
+        _samples[name].append(value)
+
+
+def counter(name: str) -> int:
+    """Current value of counter ``name``."""
+    with _lock:
+        return _counters.get(name, 0)
+
+
+def samples(name: str) -> list:
+    """Recent samples recorded for series ``name``."""
+    with _lock:
+        return list(_samples.get(name, ()))
+
+
+def percentile(values: list, pct: float) -> float:
+    """Nearest-rank percentile of ``values`` (0-100), or None if empty."""
+    if not values:
+        return None
+    ordered = sorted(values)
+    rank = max(0, min(len(ordered) - 1, round(pct / 100 * len(ordered)) - 1))
+    return ordered[rank]
+
+
+def ratio(hits: str, misses: str) -> float:
+    """Share of ``hits`` among ``hits + misses`` counters, or None if both are zero."""
+    h, m = counter(hits), counter(misses)
+    return h / (h + m) if h + m else None
+
+
+def snapshot() -> dict:
+    """Counters and per-series summaries (count, mean, p50, p90, p99)."""
+    with _lock:
+        counters = dict(_counters)
+        series = {name: list(values) for name, values in _samples.items()}
+    summaries = {}
+    for name, values in series.items():
+        if not values:
+            continue
+        summaries[name] = {
+            "count": len(values),
+            "mean": sum(values) / len(values),
+            "p50": percentile(values, 50),
+            "p90": percentile(values, 90),
+            "p99": percentile(values, 99)
+        }
+    return {"counters": counters, "series": summaries}
+
+
+def reset():
+    """Clear all counters and samples."""
+    with _lock:
+        _counters.clear()
+        _samples.clear()
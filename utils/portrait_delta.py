@@ -0,0 +1,115 @@
+"""Delta encoding for expression variants of one portrait.
+
+The pout and big_smile portraits are edits of the neutral one that should
+only change the face, so they are stored as the neutral image's hash plus a
+PNG patch of the changed bounding box. Pixels outside the box, where the
+image differs by no more than re-encoding noise from the image model, are
+taken from the neutral image on reconstruction. When the changed area is
+too large, or the patch would not be much smaller than the image, the full
+image is stored instead.
+
+The encoding is lossy, so the reconstruction, not the model's output, is
+the portrait: ``utils.session_store`` keys a delta by the hash of what
+``decode_delta`` returns and serves that image from then on.
+
+Blob layout: ``DELTA_MAGIC`` + 64-char hex hash of the base image + left and
+top offset (two big-endian uint16) + PNG patch.
+"""
+
+import struct
+from io import BytesIO
+
+from PIL import Image, ImageChops
+
+
+DELTA_MAGIC = b"MPDELTA1"
+_OFFSET = struct.Struct(">HH")
+_HEADER_SIZE = len(DELTA_MAGIC) + 64 + _OFFSET.size
+
+# Mean per-channel difference (0-255) a block may have and still count as unchanged
+DELTA_TOLERANCE = 24
+# Largest changed share of the image stored as a delta
+DELTA_MAX_AREA = 0.5
+# Largest delta size, relative to the full image, worth storing
+DELTA_MAX_RATIO = 0.7
+# Side of the square blocks differences are averaged over
+DELTA_BLOCK = 8
+# Pixels added around the changed box so the patch edges blend in
+DELTA_MARGIN = 8
+
+
+def is_delta(blob: bytes) -> bool:
+    return blob[:len(DELTA_MAGIC)] == DELTA_MAGIC
+
+
+def delta_base(blob: bytes) -> str:
+    """Hash of the image a delta blob applies to."""
+    return blob[len(DELTA_MAGIC):len(DELTA_MAGIC) + 64].decode("ascii")
+
+
+def changed_box(base: Image.Image, image: Image.Image, tolerance: int = DELTA_TOLERANCE,
+                margin: int = DELTA_MARGIN) -> tuple:
+    """Bounding box of the blocks whose mean difference exceeds ``tolerance``.
+
+    Differences are averaged over DELTA_BLOCK-pixel blocks, so scattered
+    re-encoding noise around sharp edges does not stretch the box over the
+    whole image while a redrawn mouth or eyes still stands out.
+
+    Returns:
+        ``(left, top, right, bottom)``, or None if nothing changed
+    """
+    diff = ImageChops.difference(base, image).split()
+    # Largest per-channel difference of each pixel, averaged per block
+    mask = diff[0]
+    for channel in diff[1:]:
+        mask = ImageChops.lighter(mask, channel)
+    blocks = mask.reduce(DELTA_BLOCK).point(lambda v: 255 if v > tolerance else 0)
+    box = blocks.getbbox()
+    if not box:
+        return None
+    left, top, right, bottom = (edge * DELTA_BLOCK for edge in box)
+    return (
+        max(0, left - margin), max(0, top - margin),
+        min(image.width, right + margin), min(image.height, bottom + margin)
+    )
+
+
+def encode_delta(base_png: bytes, base_hash: str, image_png: bytes,
+                 tolerance: int = DELTA_TOLERANCE, max_area: float = DELTA_MAX_AREA,
+                 max_ratio: float = DELTA_MAX_RATIO) -> bytes:
+    """Encode ``image_png`` as a patch over ``base_png``.
+
+    Returns:
+        The delta blob, or None if the image should be stored in full
+    """
+    base = Image.open(BytesIO(base_png)).convert("RGB")
+    image = Image.open(BytesIO(image_png)).convert("RGB")
+    if base.size != image.size:
+        return None
+
+    box = changed_box(base, image, tolerance)
+    if box is None:
+        # Same picture: a one-pixel patch keeps the format uniform
+        box = (0, 0, 1, 1)
+    area = (box[2] - box[0]) * (box[3] - box[1])
+    if area > max_area * image.width * image.height:
+        return None
+
+    buffer = BytesIO()
+    image.crop(box).save(buffer, format="PNG", optimize=True)
+    blob = DELTA_MAGIC + base_hash.encode("ascii") + _OFFSET.pack(box[0], box[1]) + buffer.getvalue()
+    if len(blob) > max_ratio * len(image_png):
+        return None
+    return blob
+
+
+def decode_delta(base_png: bytes, blob: bytes) -> bytes:
+    """Rebuild the full PNG image from a delta blob and its base image."""
+    left, top = _OFFSET.unpack_from(blob, len(DELTA_MAGIC) + 64)
+    patch = Image.open(BytesIO(blob[_HEADER_SIZE:]))
+    image = Image.open(BytesIO(base_png)).convert("RGB")
+    image.paste(patch, (left, top))
+    buffer = BytesIO()
+    # Deterministic for a given blob and base, so the result can be stored by hash
+    image.save(buffer, format="PNG", compress_level=1)
+    return buffer.getvalue()
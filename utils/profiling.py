@@ -0,0 +1,155 @@
+"""Per-rerun timing and on-demand profiling for the debug sidebar.
+
+Functions decorated with ``timed`` record how long they took during a
+script run, but only inside ``rerun(enabled=True)``; otherwise the wrapper
+costs one thread-local lookup. The debug sidebar (``?debug=1``) shows the
+recorded spans and can capture a cProfile or tracemalloc snapshot over the
+next N reruns to a file in the data directory.
+"""
+
+import cProfile
+import functools
+import io
+import pstats
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager
+
+from .config import get_data_dir
+
+
+PROFILE_MODES = ("cprofile", "tracemalloc")
+# Reruns kept in the sidebar history
+RERUN_HISTORY = 20
+REPORT_LINES = 15
+
+_local = threading.local()
+
+
+def _open_span(name: str) -> list:
+    """Append a span in call order; its duration is filled in when it closes."""
+    entry = [name, None, _local.depth]
+    _local.record["spans"].append(entry)
+    _local.depth += 1
+    return entry
+
+
+def _close_span(entry: list, started: float):
+    entry[1] = time.perf_counter() - started
+    _local.depth = entry[2]
+
+
+def timed(name: str = None):
+    """Decorator recording the call duration while a profiled rerun is active."""
+    def decorator(fn):
+        label = name or fn.__name__
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            if getattr(_local, "record", None) is None:
+                return fn(*args, **kwargs)
+            entry = _open_span(label)
+            started = time.perf_counter()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                _close_span(entry, started)
+        return wrapper
+    return decorator
+
+
+@contextmanager
+def span(name: str):
+    """Time a block like ``timed`` times a function."""
+    if getattr(_local, "record", None) is None:
+        yield
+        return
+    entry = _open_span(name)
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        _close_span(entry, started)
+
+
+class Capture:
+    """A cProfile or tracemalloc capture spanning several reruns."""
+
+    def __init__(self, mode: str, reruns: int):
+        if mode not in PROFILE_MODES:
+            raise ValueError(f"Unknown profile mode {mode!r}")
+        self.mode = mode
+        self.remaining = reruns
+        self.reruns = reruns
+        self.profiler = cProfile.Profile() if mode == "cprofile" else None
+        self.path = None
+        self.report = None
+
+    @property
+    def done(self) -> bool:
+        return self.remaining <= 0
+
+    def start(self):
+        if self.profiler:
+            self.profiler.enable()
+        elif not tracemalloc.is_tracing():
+            tracemalloc.start()
+
+    def stop(self):
+        if self.profiler:
+            self.profiler.disable()
+        self.remaining -= 1
+        if self.done:
+            self._save()
+
+    def _save(self):
+        directory = get_data_dir() / "profiles"
+        directory.mkdir(exist_ok=True)
+        stamp = time.strftime("%Y%m%d-%H%M%S")
+        if self.profiler:
+            self.path = directory / f"rerun-{stamp}.prof"
+            self.profiler.dump_stats(self.path)
+            out = io.StringIO()
+            pstats.Stats(self.profiler, stream=out).sort_stats("cumulative").print_stats(REPORT_LINES)
+            self.report = out.getvalue()
+            self.profiler = None
+        else:
+            snapshot = tracemalloc.take_snapshot()
+            tracemalloc.stop()
+            self.path = directory / f"rerun-{stamp}.tracemalloc"
+            snapshot.dump(str(self.path))
+            top = snapshot.statistics("lineno")[:REPORT_LINES]
+            self.report = "\n".join(str(stat) for stat in top)
+
+
+@contextmanager
+def rerun(enabled: bool, history: list = None, capture: Capture = None):
+    """Record spans for one script run.
+
+    Args:
+        enabled: Whether to record; when False this is a no-op
+        history: List receiving ``{"started_at", "total", "spans"}`` when the
+            run ends, trimmed to RERUN_HISTORY entries
+        capture: Active capture to run during this rerun, if any
+    """
+    if not enabled:
+        yield
+        return
+    _local.record = {"started_at": time.time(), "spans": []}
+    _local.depth = 0
+    if capture and not capture.done:
+        capture.start()
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        # st.rerun() raises out of the script, so record in ``finally``
+        if capture and not capture.done:
+            capture.stop()
+        record = _local.record
+        record["total"] = time.perf_counter() - started
+        _local.record = None
+        if history is not None:
+            history.append(record)
+            del history[:-RERUN_HISTORY]
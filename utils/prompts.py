@@ -22,7 +22,34 @@ Style requirements:
 - DO NOT show multiple expressions or multiple versions
 """
 
-RESPONSE_PROMPT = """You are playing a character in a dating simulation game.
+EXPRESSION_SHEET_PROMPT = """Create an anime-style character expression sheet.
+
+Character appearance:
+- Gender: {gender}
+- Face type: {face_type}
+- Hair: {hair}
+- Eyes: {eyes}
+- Outfit: {outfit}
+- Atmosphere/Vibe: {atmosphere}
+
+Layout requirements:
+- Exactly THREE portraits of the SAME character side by side in one wide image
+- Three equal-width panels on a fixed horizontal grid, no gaps, borders, labels or text
+- Left panel: neutral calm friendly expression with gentle smile
+- Middle panel: pouting, annoyed, sulking with puffed cheeks
+- Right panel: very happy, bright beaming smile with eyes slightly closed from joy
+- Only the facial expression changes between panels - same character, same clothes,
+  same pose, same framing and the same solid pastel background in every panel
+
+Style requirements:
+- Clean anime art style
+- Soft lighting
+- Upper body portrait (chest up) in each panel
+- High detail on face and expression
+"""
+
+# Character sheet and MBTI guide shared by the single and batched reply prompts
+_CHARACTER_PROMPT = """You are playing a character in a dating simulation game.
 
 Character MBTI: {mbti}
 Character personality traits:
@@ -33,7 +60,9 @@ Character personality traits:
 - Flirting style: {flirting_style}
 - Sensitive points: {sensitive_points}
 
-MBTI 특성 가이드 (캐릭터 MBTI의 각 글자에 해당하는 특성을 반영해서 말해야 함):
+"""
+
+_MBTI_GUIDE = """MBTI 특성 가이드 (캐릭터 MBTI의 각 글자에 해당하는 특성을 반영해서 말해야 함):
 
 에너지 방향:
 - E (외향): 사회적이고 활발함. 다른 사람과의 상호작용에서 에너지를 얻음. 말을 많이 하고 적극적으로 표현함.
@@ -51,7 +80,9 @@ MBTI 특성 가이드 (캐릭터 MBTI의 각 글자에 해당하는 특성을 
 - J (판단): 계획적이고 체계적. 명확한 계획과 구조를 선호. 일을 미리 끝내는 것을 좋아함.
 - P (인식): 유연하고 개방적. 자유로운 흐름을 선호. 즉흥적이고 새로운 가능성을 열어둠.
 
-Current emotion based on player's answer: {emotion}
+"""
+
+RESPONSE_PROMPT = _CHARACTER_PROMPT + _MBTI_GUIDE + """Current emotion based on player's answer: {emotion}
 - "bad": feeling disappointed or annoyed (호감도 -10)
 - "ok": feeling decent, mildly pleased (호감도 +5)
 - "good": feeling happy and impressed (호감도 +10)
@@ -71,6 +102,26 @@ Generate a short response (2-3 sentences in Korean) that:
 Keep the response natural and conversational. Don't be robotic or overly dramatic.
 """
 
+BATCH_RESPONSE_PROMPT = _CHARACTER_PROMPT + _MBTI_GUIDE + """The player was asked: "{question}"
+The player will pick one of these answers. Each comes with the emotion you
+would feel if they picked it:
+{options}
+
+For EVERY answer above, write the short response (2-3 sentences in Korean) you
+would give if the player picked it:
+1. MBTI 각 글자(E/I, S/N, T/F, J/P)의 특성을 반영한 말투와 반응
+2. Matches the emotion listed for that answer
+3. If "bad": show slight disappointment but don't be too harsh
+4. If "ok": be pleasant but not overly enthusiastic
+5. If "good": show genuine happiness and interest
+6. 반드시 반말로 말할 것 (예: "~해", "~야", "~지", "~네", "~거든" 등). 절대 존댓말 금지.
+
+Keep each response natural and conversational. Don't be robotic or overly dramatic.
+
+Return ONLY a JSON object mapping each answer number to its response, e.g.
+{{"1": "...", "2": "...", "3": "..."}}
+"""
+
 ENDING_IMAGE_PROMPT = """Create a high-quality anime-style scene for a dating simulation game ending.
 
 Character appearance:
@@ -105,6 +156,13 @@ Style requirements:
 - High quality detailed artwork
 """
 
+# Rendering detail appended to image prompts per generation profile
+IMAGE_DETAIL_PROMPTS = {
+    "low": "Rendering: simple clean shading and a plain background; keep details minimal.",
+    "standard": "",
+    "high": "Rendering: highly detailed, crisp line art, rich lighting and fine texture on hair and clothes."
+}
+
 ENDING_TEXT_SUCCESS = """당신과 함께한 시간이 정말 행복했어요.
 앞으로도 계속... 함께해줄 거죠?
 
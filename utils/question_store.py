@@ -0,0 +1,198 @@
+"""Indexed question store backed by SQLite.
+
+Questions live in a SQLite file with theme, season and tag metadata. Each
+theme keeps a dense position index, so sampling a game's questions picks
+random positions and reads only those rows; nothing is loaded up front and
+memory stays flat as content grows. ``data/questions.json`` remains the
+authoring format; ``utils.content`` builds the store from it on change, and
+larger content sets can be prebuilt (QUESTION_DB setting) with:
+
+    python -m utils.question_store data/questions.json questions.db --theme spring
+"""
+
+import argparse
+import json
+import os
+import random
+import sqlite3
+import threading
+from functools import lru_cache
+from pathlib import Path
+
+
+DEFAULT_THEME = "default"
+# Pseudo-theme indexing every question regardless of theme
+ALL_THEMES = "*"
+QUESTION_CACHE_SIZE = 512
+
+SCHEMA = """
+CREATE TABLE questions (
+    id INTEGER PRIMARY KEY,
+    theme TEXT NOT NULL,
+    season TEXT,
+    q TEXT NOT NULL,
+    options TEXT NOT NULL
+);
+CREATE TABLE question_tags (
+    tag TEXT NOT NULL,
+    question_id INTEGER NOT NULL,
+    PRIMARY KEY (tag, question_id)
+) WITHOUT ROWID;
+CREATE TABLE theme_index (
+    theme TEXT NOT NULL,
+    pos INTEGER NOT NULL,
+    question_id INTEGER NOT NULL,
+    PRIMARY KEY (theme, pos)
+) WITHOUT ROWID;
+CREATE TABLE themes (
+    theme TEXT PRIMARY KEY,
+    count INTEGER NOT NULL
+);
+"""
+
+
+class QuestionStore:
+    """Read-only access to a question database built by build_question_store."""
+
+    def __init__(self, path):
+        self.path = str(path)
+        self._conn = sqlite3.connect(f"file:{self.path}?mode=ro", uri=True, check_same_thread=False)
+        self._lock = threading.Lock()
+        self.get = lru_cache(maxsize=QUESTION_CACHE_SIZE)(self._get)
+
+    def _query(self, sql: str, params=()) -> list:
+        with self._lock:
+            return self._conn.execute(sql, params).fetchall()
+
+    def themes(self) -> dict:
+        """Question count per theme (excluding the "*" pseudo-theme)."""
+        rows = self._query("SELECT theme, count FROM themes WHERE theme != ?", (ALL_THEMES,))
+        return dict(rows)
+
+    def count(self, theme: str = None) -> int:
+        """Number of questions in ``theme`` (all themes if None)."""
+        rows = self._query("SELECT count FROM themes WHERE theme = ?", (theme or ALL_THEMES,))
+        return rows[0][0] if rows else 0
+
+    def sample_ids(self, k: int, theme: str = None, rng: random.Random = None) -> list:
+        """Pick ``k`` distinct question ids at random.
+
+        Args:
+            k: Number of questions
+            theme: Restrict to one theme (all themes if None)
+            rng: Random source, e.g., seeded for reproducible games
+
+        Raises:
+            ValueError: If the theme has fewer than ``k`` questions
+        """
+        rng = rng or random
+        theme = theme or ALL_THEMES
+        positions = rng.sample(range(self.count(theme)), k)
+        placeholders = ",".join("?" * len(positions))
+        rows = dict(self._query(
+            f"SELECT pos, question_id FROM theme_index WHERE theme = ? AND pos IN ({placeholders})",
+            (theme, *positions)
+        ))
+        return [rows[pos] for pos in positions]
+
+    def _get(self, question_id: int) -> dict:
+        rows = self._query(
+            "SELECT id, theme, season, q, options FROM questions WHERE id = ?", (question_id,)
+        )
+        if not rows:
+            raise KeyError(question_id)
+        qid, theme, season, text, options = rows[0]
+        tags = [row[0] for row in self._query(
+            "SELECT tag FROM question_tags WHERE question_id = ?", (qid,)
+        )]
+        return {
+            "id": qid, "theme": theme, "season": season, "tags": tags,
+            "q": text, "options": json.loads(options)
+        }
+
+    def ids(self) -> list:
+        """Ids of every question, in position order."""
+        rows = self._query(
+            "SELECT question_id FROM theme_index WHERE theme = ? ORDER BY pos", (ALL_THEMES,)
+        )
+        return [row[0] for row in rows]
+
+    def ids_with_tag(self, tag: str, limit: int = 100) -> list:
+        """Ids of up to ``limit`` questions carrying ``tag``."""
+        rows = self._query(
+            "SELECT question_id FROM question_tags WHERE tag = ? LIMIT ?", (tag, limit)
+        )
+        return [row[0] for row in rows]
+
+    def close(self):
+        self._conn.close()
+
+
+def build_question_store(sources: list, db_path, theme: str = DEFAULT_THEME) -> int:
+    """Convert questions.json files into a question database.
+
+    Each source uses the questions.json format; questions may also carry
+    optional "theme", "season" and "tags" fields, otherwise ``theme`` is
+    used. The database is written to a temporary file and moved into place,
+    so readers never see a half-built store.
+
+    Returns:
+        Number of questions written
+
+    Raises:
+        ValueError: If two questions share an id
+    """
+    db_path = Path(db_path)
+    tmp_path = db_path.with_name(f".{db_path.name}.{os.getpid()}.tmp")
+    tmp_path.unlink(missing_ok=True)
+    conn = sqlite3.connect(tmp_path)
+    try:
+        conn.executescript(SCHEMA)
+        positions = {}
+        next_id = 1
+        for source in sources:
+            with open(source, "r", encoding="utf-8") as f:
+                questions = json.load(f)["questions"]
+            for question in questions:
+                qid = question.get("id") or next_id
+                next_id = max(next_id, qid) + 1
+                q_theme = question.get("theme", theme)
+                try:
+                    conn.execute(
+                        "INSERT INTO questions (id, theme, season, q, options) VALUES (?, ?, ?, ?, ?)",
+                        (qid, q_theme, question.get("season"), question["q"],
+                         json.dumps(question["options"], ensure_ascii=False))
+                    )
+                except sqlite3.IntegrityError:
+                    raise ValueError(f"Duplicate question id {qid} in {source}")
+                conn.executemany(
+                    "INSERT OR IGNORE INTO question_tags (tag, question_id) VALUES (?, ?)",
+                    [(tag, qid) for tag in question.get("tags", [])]
+                )
+                for index_theme in (q_theme, ALL_THEMES):
+                    pos = positions.get(index_theme, 0)
+                    conn.execute(
+                        "INSERT INTO theme_index (theme, pos, question_id) VALUES (?, ?, ?)",
+                        (index_theme, pos, qid)
+                    )
+                    positions[index_theme] = pos + 1
+        conn.executemany("INSERT INTO themes (theme, count) VALUES (?, ?)", positions.items())
+        conn.commit()
+    finally:
+        conn.close()
+    os.replace(tmp_path, db_path)
+    return positions.get(ALL_THEMES, 0)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Convert questions.json files into a question database.")
+    parser.add_argument("sources", nargs="+", help="questions.json files")
+    parser.add_argument("output", help="database file to write")
+    parser.add_argument("--theme", default=DEFAULT_THEME, help="theme for questions without one")
+    args = parser.parse_args()
+    count = build_question_store(args.sources, args.output, theme=args.theme)
+    print(f"Wrote {count} questions to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,171 @@
+"""Deadline-aware reply generation.
+
+Replies are generated on a background pool. An answer click waits at most a
+latency budget for the reply; if it is late, the UI shows a fallback line
+right away and upgrades the bubble when the real reply arrives. The budget
+adapts to recently observed provider latency.
+"""
+
+import contextvars
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError
+
+from . import metrics
+from .cancellation import CallCancelled
+from .config import get_setting
+from .profiling import timed
+
+
+# Budget defaults in seconds (override with settings of the same name)
+REPLY_BUDGET = 0.8
+REPLY_BUDGET_MIN = 0.3
+REPLY_BUDGET_MAX = 1.5
+# Late replies arriving after this many seconds are no longer shown
+REPLY_UPGRADE_WINDOW = 15.0
+REPLY_WORKERS = 16
+
+# Recent latency samples considered when adapting the budget
+BUDGET_SAMPLE_WINDOW = 50
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def _get_executor() -> ThreadPoolExecutor:
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            workers = int(get_setting("REPLY_WORKERS", REPLY_WORKERS))
+            _executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="reply")
+        return _executor
+
+
+def submit_reply(fn, *args, **kwargs):
+    """Start generating a reply in the background.
+
+    The worker runs in a copy of the caller's context, so the AI call keeps
+    the caller's scheduling class and session (``utils.scheduler``).
+
+    Returns:
+        Future resolving to the reply text (or raising the provider error)
+    """
+    def timed_call():
+        started = time.perf_counter()
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            metrics.observe("reply.latency", time.perf_counter() - started)
+
+    return _get_executor().submit(contextvars.copy_context().run, timed_call)
+
+
+def submit_prefetch(fn, *args, **kwargs):
+    """Start generating replies before they are needed (REPLY_MODE=batch).
+
+    Runs on the reply pool like submit_reply, but its latency is kept out of
+    the samples the reply budget adapts to.
+    """
+    def timed_call():
+        started = time.perf_counter()
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            metrics.observe("reply.batch.latency", time.perf_counter() - started)
+
+    return _get_executor().submit(contextvars.copy_context().run, timed_call)
+
+
+def prefetched_reply(future, index: int) -> str:
+    """Reply for option ``index`` from a finished prefetch, or None.
+
+    A prefetch still in flight is not waited for; the caller generates the
+    single reply instead.
+    """
+    if not future.done():
+        metrics.incr("reply.prefetch.pending")
+        return None
+    try:
+        replies = future.result(timeout=0)
+    except CallCancelled:
+        metrics.incr("reply.prefetch.cancelled")
+        return None
+    except Exception:
+        metrics.incr("reply.prefetch.failed")
+        return None
+    metrics.incr("reply.prefetch.hit")
+    return replies[index]
+
+
+def reply_budget() -> float:
+    """Seconds an answer click should wait for the reply.
+
+    Tracks the 75th percentile of recent provider latency (with 20% headroom)
+    between REPLY_BUDGET_MIN and REPLY_BUDGET_MAX. When the provider is
+    slower than the maximum, waiting rarely pays off, so the budget drops to
+    the minimum and players get the fallback line quickly.
+    """
+    base = float(get_setting("REPLY_BUDGET", REPLY_BUDGET))
+    low = float(get_setting("REPLY_BUDGET_MIN", REPLY_BUDGET_MIN))
+    high = float(get_setting("REPLY_BUDGET_MAX", REPLY_BUDGET_MAX))
+
+    recent = metrics.samples("reply.latency")[-BUDGET_SAMPLE_WINDOW:]
+    if not recent:
+        return base
+    p75 = metrics.percentile(recent, 75)
+    if p75 > high:
+        return low
+    return max(low, min(high, p75 * 1.2))
+
+
+@timed("reply.wait")
+def wait_for_reply(future, budget: float) -> str:
+    """Wait up to ``budget`` seconds for a reply.
+
+    Returns:
+        The reply text, or None if it is late or failed
+    """
+    try:
+        reply = future.result(timeout=budget)
+    except TimeoutError:
+        metrics.incr("reply.late")
+        return None
+    except CallCancelled:
+        metrics.incr("reply.cancelled")
+        return None
+    except Exception:
+        metrics.incr("reply.failed")
+        return None
+    if not reply:
+        metrics.incr("reply.failed")
+        return None
+    metrics.incr("reply.on_time")
+    return reply
+
+
+def collect_late_reply(future) -> str:
+    """Return a late reply once it has arrived, or None if it failed."""
+    try:
+        reply = future.result(timeout=0)
+    except Exception:
+        metrics.incr("reply.upgrade_failed")
+        return None
+    if reply:
+        metrics.incr("reply.upgraded")
+    return reply or None
+
+
+def reply_rates() -> dict:
+    """Share of replies served on time, upgraded late, or left as fallback."""
+    on_time = metrics.counter("reply.on_time")
+    late = metrics.counter("reply.late")
+    failed = metrics.counter("reply.failed")
+    total = on_time + late + failed
+    if not total:
+        return {}
+    return {
+        "on_time": on_time / total,
+        "fallback_then_upgraded": metrics.counter("reply.upgraded") / total,
+        "fallback_only": (total - on_time - metrics.counter("reply.upgraded")) / total,
+        "budget": reply_budget()
+    }
@@ -0,0 +1,274 @@
+"""Priority and fair-share scheduling for outbound AI calls.
+
+Every provider call goes through a lane (one per API, e.g. "openai.chat")
+with a fixed number of concurrent slots. Callers wait for a slot in one of
+three priority classes:
+
+    interactive  - a player is waiting on the result (replies, portraits)
+    speculative  - work that may be useful soon (prefetches)
+    batch        - offline work (cache refills, evaluations)
+
+Interactive calls are always served first, and background classes may hold
+at most AI_BACKGROUND_SHARE of a lane's slots, so a free slot is usually
+waiting for the next interactive call. Within a class, sessions take turns,
+so one player restarting over and over cannot crowd out the rest. Queued
+speculative calls are dropped (``CallDropped``) when interactive calls back
+up or they wait too long; calls already sent to the provider are left to
+finish. Calls whose session cancellation token is cancelled leave the queue
+with ``CallCancelled`` (``utils.cancellation``).
+
+The class, session and cancellation token come from ``ai_context`` (context
+variables), so helpers deep inside ``utils.ai_client`` need no extra
+arguments.
+"""
+
+import contextvars
+import threading
+import time
+from collections import OrderedDict, deque
+from contextlib import contextmanager
+
+from . import metrics
+from .cancellation import CallCancelled, CancelToken, enforced, get_cancellation
+from .config import get_setting
+
+
+PRIORITIES = ("interactive", "speculative", "batch")
+
+# Concurrent provider calls per lane: (setting name, default)
+LANE_SLOTS = {
+    "openai.chat": ("AI_CHAT_SLOTS", 16),
+    "gemini.image": ("AI_IMAGE_SLOTS", 6),
+}
+DEFAULT_SLOTS = 8
+# Share of a lane's slots speculative and batch calls may hold together
+AI_BACKGROUND_SHARE = 0.5
+# Queued speculative calls are dropped once this many interactive calls wait
+AI_SPECULATIVE_DROP_DEPTH = 2
+# ... or after waiting this many seconds
+AI_SPECULATIVE_MAX_WAIT = 5.0
+
+_priority = contextvars.ContextVar("ai_priority", default="interactive")
+_session = contextvars.ContextVar("ai_session", default=None)
+_cancel_token = contextvars.ContextVar("ai_cancel_token", default=None)
+
+
+class CallDropped(Exception):
+    """Raised when a queued speculative call is dropped instead of run."""
+
+
+@contextmanager
+def ai_context(priority: str = None, session: str = None, scope: str = None):
+    """Run AI calls made inside the block with this class and session.
+
+    Calls are bound to the session's current cancellation token for
+    ``scope`` (see ``utils.cancellation``). Work handed to
+    ``utils.replies``, ``utils.jobs`` or ``utils.speed_dating`` inside the
+    block keeps the context, since they copy it into their worker threads.
+    """
+    if priority is not None and priority not in PRIORITIES:
+        raise ValueError(f"Unknown priority {priority!r}")
+    tokens = []
+    if priority is not None:
+        tokens.append((_priority, _priority.set(priority)))
+    if session is not None:
+        tokens.append((_session, _session.set(session)))
+    if session is not None or scope is not None:
+        bound = session if session is not None else _session.get()
+        if bound is not None:
+            tokens.append((_cancel_token, _cancel_token.set(get_cancellation().token(bound, scope))))
+    try:
+        yield
+    finally:
+        for var, token in reversed(tokens):
+            var.reset(token)
+
+
+def current_priority() -> str:
+    return _priority.get()
+
+
+def current_session() -> str:
+    return _session.get()
+
+
+def current_cancel_token() -> CancelToken:
+    return _cancel_token.get()
+
+
+class _Ticket:
+    __slots__ = ("priority", "session", "enqueued", "granted", "dropped", "cancelled")
+
+    def __init__(self, priority: str, session: str):
+        self.priority = priority
+        self.session = session
+        self.enqueued = time.perf_counter()
+        self.granted = False
+        self.dropped = False
+        self.cancelled = False
+
+
+class AIScheduler:
+    """Slot scheduler for one lane of provider calls."""
+
+    def __init__(self, name: str, slots: int, background_share: float = AI_BACKGROUND_SHARE,
+                 drop_depth: int = AI_SPECULATIVE_DROP_DEPTH,
+                 speculative_max_wait: float = AI_SPECULATIVE_MAX_WAIT):
+        """
+        Args:
+            name: Lane name used in metrics (e.g., "openai.chat")
+            slots: Maximum concurrent calls
+            background_share: Share of slots speculative and batch calls may hold
+            drop_depth: Waiting interactive calls that make queued speculative calls drop
+            speculative_max_wait: Seconds a speculative call may wait before it is dropped
+        """
+        self.name = name
+        self.slots = max(1, slots)
+        self.background_slots = max(1, int(self.slots * background_share))
+        self.drop_depth = drop_depth
+        self.speculative_max_wait = speculative_max_wait
+        self._cond = threading.Condition()
+        # priority -> session -> queued tickets; session order is the round-robin turn
+        self._queues = {priority: OrderedDict() for priority in PRIORITIES}
+        self._waiting = dict.fromkeys(PRIORITIES, 0)
+        self._running = dict.fromkeys(PRIORITIES, 0)
+
+    @contextmanager
+    def slot(self, priority: str = None, session: str = None):
+        """Hold one of the lane's slots for the duration of the block.
+
+        Args:
+            priority: Priority class (default: the current ai_context)
+            session: Fair-share key (default: the current ai_context)
+
+        Raises:
+            CallDropped: If a speculative call was dropped while queued
+            CallCancelled: If the call's cancellation token was cancelled
+                before it got a slot
+        """
+        token = current_cancel_token()
+        ticket = self._acquire(priority or current_priority(), session or current_session() or "", token)
+        try:
+            yield
+        finally:
+            self._release(ticket)
+            if token is not None and token.cancelled:
+                # Sent to the provider, but nobody is waiting for the result anymore
+                metrics.incr(f"ai.wasted.{self.name}")
+
+    def stats(self) -> dict:
+        """Running and waiting calls per priority class."""
+        with self._cond:
+            return {"running": dict(self._running), "waiting": dict(self._waiting)}
+
+    def _wake(self):
+        with self._cond:
+            self._cond.notify_all()
+
+    def _acquire(self, priority: str, session: str, token: CancelToken = None) -> _Ticket:
+        ticket = _Ticket(priority, session)
+        if token is not None and not enforced():
+            token = None
+        if token is not None:
+            token.on_cancel(self._wake)
+        with self._cond:
+            self._queues[priority].setdefault(session, deque()).append(ticket)
+            self._waiting[priority] += 1
+            self._dispatch()
+            while not (ticket.granted or ticket.dropped):
+                if token is not None and token.cancelled:
+                    self._drop(ticket)
+                    ticket.cancelled = True
+                    break
+                timeout = None
+                if priority == "speculative":
+                    timeout = ticket.enqueued + self.speculative_max_wait - time.perf_counter()
+                    if timeout <= 0:
+                        self._drop(ticket)
+                        break
+                self._cond.wait(timeout)
+
+        if token is not None:
+            token.remove_callback(self._wake)
+            if ticket.granted and token.cancelled:
+                # Cancelled just as the slot came free: hand it on unused
+                ticket.cancelled = True
+                self._release(ticket)
+        waited = time.perf_counter() - ticket.enqueued
+        metrics.observe(f"ai.queue_wait.{priority}", waited)
+        if ticket.cancelled:
+            metrics.incr(f"ai.cancelled.{self.name}")
+            raise CallCancelled(f"{self.name}: call cancelled ({token.reason}) after {waited:.2f}s")
+        if ticket.dropped:
+            metrics.incr(f"ai.dropped.{priority}")
+            raise CallDropped(f"{self.name}: {priority} call dropped after {waited:.2f}s")
+        metrics.incr(f"ai.calls.{priority}")
+        return ticket
+
+    def _release(self, ticket: _Ticket):
+        with self._cond:
+            self._running[ticket.priority] -= 1
+            self._dispatch()
+
+    def _drop(self, ticket: _Ticket):
+        sessions = self._queues[ticket.priority]
+        queue = sessions[ticket.session]
+        queue.remove(ticket)
+        if not queue:
+            del sessions[ticket.session]
+        self._waiting[ticket.priority] -= 1
+        ticket.dropped = True
+
+    def _dispatch(self):
+        """Grant free slots to waiting tickets; called with the lock held."""
+        while sum(self._running.values()) < self.slots:
+            ticket = self._next_ticket()
+            if ticket is None:
+                break
+            ticket.granted = True
+            self._waiting[ticket.priority] -= 1
+            self._running[ticket.priority] += 1
+
+        # Interactive calls are backing up: give up on queued speculative work
+        if self._waiting["interactive"] >= self.drop_depth:
+            for queue in list(self._queues["speculative"].values()):
+                for ticket in list(queue):
+                    self._drop(ticket)
+        self._cond.notify_all()
+
+    def _next_ticket(self) -> _Ticket:
+        background = self._running["speculative"] + self._running["batch"]
+        for priority in PRIORITIES:
+            sessions = self._queues[priority]
+            if not sessions:
+                continue
+            if priority != "interactive" and background >= self.background_slots:
+                return None
+            # Round-robin: serve the session whose turn it is, then move it last
+            session, queue = next(iter(sessions.items()))
+            ticket = queue.popleft()
+            if queue:
+                sessions.move_to_end(session)
+            else:
+                del sessions[session]
+            return ticket
+        return None
+
+
+_schedulers = {}
+_schedulers_lock = threading.Lock()
+
+
+def get_scheduler(lane: str) -> AIScheduler:
+    """Return the process-wide scheduler for ``lane``, creating it on first use."""
+    with _schedulers_lock:
+        if lane not in _schedulers:
+            setting, default = LANE_SLOTS.get(lane, (None, DEFAULT_SLOTS))
+            _schedulers[lane] = AIScheduler(
+                lane,
+                slots=int(get_setting(setting, default) if setting else default),
+                background_share=float(get_setting("AI_BACKGROUND_SHARE", AI_BACKGROUND_SHARE)),
+                drop_depth=int(get_setting("AI_SPECULATIVE_DROP_DEPTH", AI_SPECULATIVE_DROP_DEPTH)),
+                speculative_max_wait=float(get_setting("AI_SPECULATIVE_MAX_WAIT", AI_SPECULATIVE_MAX_WAIT))
+            )
+        return _schedulers[lane]
@@ -0,0 +1,233 @@
+"""Durable game-session checkpoints.
+
+Sessions are keyed by a resumable token (kept in the page URL) and hold the
+JSON-serializable part of ``st.session_state``. Portraits are stored once by
+content hash, so checkpointing a game after every click only rewrites a few
+hundred bytes of state. Expression variants are stored as deltas against
+the neutral portrait (``utils.portrait_delta``) when that is much smaller.
+Everything lives in the shared state backend, so a player can resume on any
+replica.
+"""
+
+import base64
+import hashlib
+import json
+import secrets
+import threading
+import time
+from collections import OrderedDict
+
+from . import metrics
+from .config import get_setting
+from .portrait_delta import decode_delta, delta_base, encode_delta, is_delta
+from .state_backend import get_backend
+
+
+# Bump when saved state changes meaning (2: question_order holds question ids,
+# 3: log entries carry question_id and option)
+CHECKPOINT_VERSION = 3
+
+# Checkpoints untouched for this long expire
+DEFAULT_SESSION_TTL = 7 * 24 * 3600
+
+# Expression the other portraits are delta-encoded against
+DELTA_BASE_EXPRESSION = "neutral"
+# Encoded blobs remembered per process (each image is stored more than once)
+BLOB_CACHE_SIZE = 64
+# Sessions whose last written checkpoint digest is remembered per process
+DIGEST_CACHE_SIZE = 10000
+# An unchanged checkpoint's expiry is refreshed at most this often
+SESSION_TOUCH_INTERVAL = 3600
+
+
+def new_session_token() -> str:
+    """Create a URL-safe token identifying a resumable session."""
+    return secrets.token_urlsafe(12)
+
+
+def image_hash(img_base64: str) -> str:
+    """Content hash used as the storage key for a base64 encoded image."""
+    return hashlib.sha256(img_base64.encode("ascii")).hexdigest()
+
+
+class SessionStore:
+    """Session checkpoints and portrait blobs on top of a ``StateBackend``."""
+
+    def __init__(self, backend, session_ttl: float = DEFAULT_SESSION_TTL, delta: bool = True):
+        self.backend = backend
+        self.session_ttl = session_ttl
+        self.delta = delta
+        # Image hash -> (ref, blob, stored image), so repeated puts skip re-encoding
+        self._blobs = OrderedDict()
+        self._blobs_lock = threading.Lock()
+        # Portraits outlive the sessions that reference them
+        self.blob_ttl = 2 * session_ttl
+        # Token -> (last digest written, when its expiry was last set), so
+        # unchanged state is never rewritten; least recently saved first
+        self._digests = OrderedDict()
+        self._digests_lock = threading.Lock()
+
+    def put_images(self, images: dict) -> tuple:
+        """Store images by content hash.
+
+        A variant stored as a delta is replaced by its reconstruction, which
+        is what every later read returns; show the returned images, not the
+        ones passed in, so a resumed session looks the same.
+
+        Args:
+            images: Expression keys mapped to base64 image data (or None)
+
+        Returns:
+            ``(refs, stored)``: expression keys mapped to content hashes (or
+            None), and to the stored base64 image data (or None)
+        """
+        refs = {}
+        stored = {}
+        blobs = {}
+        base = images.get(DELTA_BASE_EXPRESSION)
+        base_hash = image_hash(base) if base else None
+        for expr, img in images.items():
+            if not img:
+                refs[expr] = stored[expr] = None
+                continue
+            digest, blob, stored[expr] = self._encode(img, base_hash, base)
+            refs[expr] = digest
+            blobs[f"blob:{digest}"] = blob
+
+        self.backend.put_many(blobs, ttl=self.blob_ttl)
+        return refs, stored
+
+    def _encode(self, img: str, base_hash: str, base: str) -> tuple:
+        """Stored form of one image: a delta against ``base`` or the full bytes.
+
+        Returns:
+            ``(content hash, blob, stored base64 image)``
+        """
+        key = image_hash(img)
+        with self._blobs_lock:
+            encoded = self._blobs.get(key)
+        if encoded is not None:
+            return encoded
+
+        data = base64.b64decode(img)
+        encoded = (key, data, img)
+        if self.delta and base_hash and key != base_hash:
+            try:
+                base_data = base64.b64decode(base)
+                delta = encode_delta(base_data, base_hash, data)
+                rebuilt = base64.b64encode(decode_delta(base_data, delta)).decode("utf-8") if delta else None
+            except Exception:
+                # Undecodable image; keep it as it is
+                delta = None
+            if delta:
+                encoded = (image_hash(rebuilt), delta, rebuilt)
+                metrics.incr("portrait.delta.stored")
+                metrics.observe("portrait.delta.ratio", len(delta) / len(data))
+            else:
+                metrics.incr("portrait.delta.full")
+
+        with self._blobs_lock:
+            self._blobs[key] = encoded
+            while len(self._blobs) > BLOB_CACHE_SIZE:
+                self._blobs.popitem(last=False)
+        return encoded
+
+    def get_images(self, refs: dict) -> dict:
+        """Resolve content hashes back into base64 image data.
+
+        Returns:
+            Expression keys mapped to base64 data, or None if any blob is missing
+        """
+        wanted = {h for h in refs.values() if h}
+        found = self.backend.get_many([f"blob:{h}" for h in wanted])
+        if len(found) != len(wanted):
+            return None
+
+        bases = {delta_base(blob) for blob in found.values() if is_delta(blob)}
+        missing = [f"blob:{h}" for h in bases if f"blob:{h}" not in found]
+        if missing:
+            found.update(self.backend.get_many(missing))
+        images = {}
+        for h in wanted:
+            blob = found[f"blob:{h}"]
+            if is_delta(blob):
+                base = found.get(f"blob:{delta_base(blob)}")
+                if base is None:
+                    return None
+                started = time.perf_counter()
+                blob = decode_delta(base, blob)
+                metrics.observe("portrait.delta.decode", time.perf_counter() - started)
+            img = base64.b64encode(blob).decode("utf-8")
+            if image_hash(img) != h:
+                # Written by a version that keyed deltas by the original image
+                metrics.incr("portrait.delta.mismatch")
+                return None
+            images[h] = img
+        return {expr: images[h] if h else None for expr, h in refs.items()}
+
+    def save(self, token: str, state: dict) -> bool:
+        """Write a checkpoint for ``token`` if the state changed.
+
+        An unchanged checkpoint only has its expiry refreshed, at most once
+        per SESSION_TOUCH_INTERVAL.
+
+        Returns:
+            True if the checkpoint was written
+        """
+        payload = json.dumps(
+            {"version": CHECKPOINT_VERSION, "state": state},
+            ensure_ascii=False, sort_keys=True
+        ).encode("utf-8")
+        digest = hashlib.sha256(payload).hexdigest()
+        now = time.monotonic()
+        with self._digests_lock:
+            last = self._digests.get(token)
+        if last and last[0] == digest:
+            if now - last[1] >= min(SESSION_TOUCH_INTERVAL, self.session_ttl / 2):
+                self.backend.touch(f"session:{token}", self.session_ttl)
+                self._remember(token, digest, now)
+            return False
+
+        self.backend.put(f"session:{token}", payload, ttl=self.session_ttl)
+        self._remember(token, digest, now)
+        return True
+
+    def load(self, token: str) -> dict:
+        """Load the checkpoint for ``token``, or None if unknown or outdated."""
+        payload = self.backend.get(f"session:{token}")
+        if not payload:
+            return None
+        checkpoint = json.loads(payload)
+        if checkpoint.get("version") != CHECKPOINT_VERSION:
+            return None
+        # Expiry unknown: the first unchanged save of a resumed session refreshes it
+        self._remember(token, hashlib.sha256(payload).hexdigest(), float("-inf"))
+        return checkpoint["state"]
+
+    def delete(self, token: str):
+        """Remove the checkpoint for ``token``."""
+        self.backend.delete(f"session:{token}")
+        with self._digests_lock:
+            self._digests.pop(token, None)
+
+    def _remember(self, token: str, digest: str, touched: float):
+        with self._digests_lock:
+            self._digests[token] = (digest, touched)
+            self._digests.move_to_end(token)
+            while len(self._digests) > DIGEST_CACHE_SIZE:
+                self._digests.popitem(last=False)
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_session_store() -> SessionStore:
+    """Return the process-wide session store, creating it on first use."""
+    global _store
+    with _store_lock:
+        if _store is None:
+            ttl = float(get_setting("SESSION_TTL", DEFAULT_SESSION_TTL))
+            delta = str(get_setting("PORTRAIT_DELTA", "on")).lower() not in ("0", "off", "false")
+            _store = SessionStore(get_backend(), session_ttl=ttl, delta=delta)
+        return _store
@@ -0,0 +1,193 @@
+"""Speed-dating mode: several characters at one table.
+
+The player answers each question once and every character still at the
+table grades the same answer against its own MBTI, keeping its own
+affection and ending. Each character is an ordinary ``GameState`` sharing
+the question order and content version, so ``GameEngine`` applies the usual
+rules to each of them.
+
+AI work is fanned out per character with ``fan_out``: portraits for the
+whole cast are generated concurrently at setup, and each turn's replies are
+requested together, so a turn takes about as long as the slowest single
+reply instead of the sum. Results are returned as futures so the UI can
+fill each character's panel as soon as its own result arrives.
+"""
+
+import contextvars
+import random
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor, wait
+
+from . import metrics
+from .config import get_setting
+from .engine import MBTI_TYPES, GameEngine, GameState
+
+
+# Characters at the table
+SPEED_DATING_SIZES = (2, 3, 4)
+SPEED_DATING_SIZE = 3
+# Calls one fan-out keeps in flight (SPEED_DATING_CONCURRENCY setting)
+SPEED_DATING_CONCURRENCY = 4
+FAN_OUT_WORKERS = 32
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def _get_executor() -> ThreadPoolExecutor:
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=FAN_OUT_WORKERS, thread_name_prefix="fanout")
+        return _executor
+
+
+def fan_out(fn, items: list, limit: int = None) -> list:
+    """Run ``fn(item)`` for every item with at most ``limit`` calls in flight.
+
+    Items start in order; each finished call starts the next one. Calls run
+    in copies of the caller's context, so AI calls keep its scheduling class
+    and session (``utils.scheduler``).
+
+    Args:
+        fn: Callable applied to each item
+        items: Work items
+        limit: Concurrent calls (default: SPEED_DATING_CONCURRENCY setting)
+
+    Returns:
+        One future per item, in item order
+    """
+    limit = max(1, limit or int(get_setting("SPEED_DATING_CONCURRENCY", SPEED_DATING_CONCURRENCY)))
+    context = contextvars.copy_context()
+    futures = [Future() for _ in items]
+    queue = deque(enumerate(items))
+    lock = threading.Lock()
+
+    def start_next():
+        with lock:
+            if not queue:
+                return
+            index, item = queue.popleft()
+        inner = _get_executor().submit(context.copy().run, fn, item)
+        inner.add_done_callback(lambda done: finish(index, done))
+
+    def finish(index: int, done: Future):
+        try:
+            futures[index].set_result(done.result())
+        except Exception as e:
+            futures[index].set_exception(e)
+        start_next()
+
+    for _ in range(min(limit, len(items))):
+        start_next()
+    return futures
+
+
+def pick_cast(mbti: str, size: int, rng: random.Random = None) -> list:
+    """``mbti`` followed by ``size - 1`` other distinct random types."""
+    rng = rng or random
+    others = rng.sample([other for other in MBTI_TYPES if other != mbti], size - 1)
+    return [mbti] + others
+
+
+def create_cast_images(job, appearance: dict, mbtis: list, limit: int = None) -> list:
+    """Job function generating every character's portraits concurrently.
+
+    Each expression is reported as job stage ``"{index}:{expression}"`` as
+    soon as it is ready.
+
+    Returns:
+        Image dicts (see ``generate_character_images``) in cast order, None
+        for characters whose generation failed
+    """
+    from .ai_client import generate_character_images
+    from .image_profiles import select_profile
+
+    # One profile for the whole cast so the portraits match
+    profile = select_profile()
+
+    def create(item):
+        index, mbti = item
+        return generate_character_images(
+            appearance,
+            mbti,
+            on_progress=lambda stage, value, ok=True: job.report_stage(f"{index}:{stage}", value, ok),
+            should_cancel=lambda: job.cancelled,
+            profile=profile
+        )
+
+    futures = fan_out(create, list(enumerate(mbtis)), limit)
+    wait(futures)
+    return [None if future.exception() else future.result() for future in futures]
+
+
+def new_table(engine: GameEngine, mbtis: list, session: str = None, rng: random.Random = None) -> list:
+    """One GameState per character, all asked the same questions."""
+    first = engine.new_game(mbtis[0], session=session, rng=rng)
+    return [first] + [
+        GameState(mbti, list(first.question_order), session=session, content_version=first.content_version)
+        for mbti in mbtis[1:]
+    ]
+
+
+def answer_all(engine: GameEngine, states: list, option: int = None, text: str = None) -> list:
+    """Apply one answer (option index or free text) to every character still playing.
+
+    Returns:
+        The new log entry per state, None for characters who already left
+    """
+    entries = []
+    for state in states:
+        if engine.is_over(state):
+            entries.append(None)
+        elif text is not None:
+            entries.append(engine.answer_text(state, text))
+        else:
+            entries.append(engine.answer(state, option))
+    return entries
+
+
+def advance_all(engine: GameEngine, states: list) -> bool:
+    """Move every character past the answered question.
+
+    Returns:
+        True once no character is left at the table
+    """
+    for state in states:
+        if not engine.is_over(state):
+            engine.advance(state)
+    return all(engine.is_over(state) for state in states)
+
+
+def submit_replies(states: list, entries: list, mbti_traits: dict, reply_fn=None, limit: int = None) -> list:
+    """Request every character's reply to this turn's answer at once.
+
+    Args:
+        states: The characters' GameStates
+        entries: Log entries from ``answer_all`` (None entries are skipped)
+        mbti_traits: Traits of the table's content version
+        reply_fn: ``fn(mbti, mbti_traits, question, answer, grade)``
+            (default: ``generate_response``)
+        limit: Concurrent calls
+
+    Returns:
+        One future per state (None where there was no answer)
+    """
+    if reply_fn is None:
+        from .ai_client import generate_response
+        reply_fn = generate_response
+
+    def reply(item):
+        state, entry = item
+        started = time.perf_counter()
+        try:
+            return reply_fn(state.mbti, mbti_traits, entry["question"], entry["answer"], entry["grade"])
+        finally:
+            # Same samples as submit_reply, so the reply budget adapts to these too
+            metrics.observe("reply.latency", time.perf_counter() - started)
+
+    items = [(state, entry) for state, entry in zip(states, entries) if entry]
+    futures = iter(fan_out(reply, items, limit))
+    return [next(futures) if entry else None for entry in entries]
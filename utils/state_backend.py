@@ -0,0 +1,276 @@
+"""Pluggable key-value backends for state shared between app replicas.
+
+Session checkpoints, portrait blobs and the AI result caches all go through
+a ``StateBackend``. The default SQLite backend keeps everything in a local
+file (replicas on one host, or a shared volume); the Redis backend speaks
+the Redis protocol directly so any Redis-compatible server can be shared by
+every replica behind the load balancer.
+
+Configure with the ``STATE_BACKEND_URL`` setting:
+    sqlite:///path/to/state.db   (default: <DATA_DIR>/state.db)
+    redis://[:password@]host:port/db
+"""
+
+import socket
+import sqlite3
+import threading
+import time
+from urllib.parse import urlparse
+
+from .config import get_data_dir, get_setting
+
+
+class StateBackend:
+    """Interface for byte-valued key-value stores with per-key TTLs."""
+
+    def get(self, key: str) -> bytes:
+        """Return the value for ``key``, or None if missing or expired."""
+        return self.get_many([key]).get(key)
+
+    def put(self, key: str, value: bytes, ttl: float = None):
+        """Store ``value`` under ``key``, expiring after ``ttl`` seconds."""
+        self.put_many({key: value}, ttl=ttl)
+
+    def get_many(self, keys: list) -> dict:
+        """Fetch several keys in one round trip.
+
+        Returns:
+            Dictionary with only the keys that were found
+        """
+        raise NotImplementedError
+
+    def put_many(self, items: dict, ttl: float = None):
+        """Store several values in one round trip with a shared TTL."""
+        raise NotImplementedError
+
+    def delete(self, key: str):
+        """Remove ``key`` if present."""
+        raise NotImplementedError
+
+    def touch(self, key: str, ttl: float):
+        """Restart the expiry of ``key`` (if present) at ``ttl`` seconds from now."""
+        value = self.get(key)
+        if value is not None:
+            self.put(key, value, ttl=ttl)
+
+
+class SQLiteBackend(StateBackend):
+    """Backend storing values in a local SQLite file."""
+
+    # Expired rows are purged after this many writes
+    PURGE_INTERVAL = 500
+
+    def __init__(self, path):
+        self.path = str(path)
+        self._lock = threading.Lock()
+        self._writes = 0
+        self._conn = sqlite3.connect(self.path, check_same_thread=False, timeout=10)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS kv (
+                key TEXT PRIMARY KEY,
+                value BLOB NOT NULL,
+                expires_at REAL
+            )
+        """)
+        self._conn.commit()
+
+    def get_many(self, keys: list) -> dict:
+        keys = list(dict.fromkeys(keys))
+        if not keys:
+            return {}
+        placeholders = ",".join("?" * len(keys))
+        with self._lock:
+            cursor = self._conn.execute(
+                f"SELECT key, value FROM kv WHERE key IN ({placeholders}) "
+                "AND (expires_at IS NULL OR expires_at > ?)",
+                [*keys, time.time()]
+            )
+            return {key: bytes(value) for key, value in cursor}
+
+    def put_many(self, items: dict, ttl: float = None):
+        if not items:
+            return
+        expires_at = time.time() + ttl if ttl else None
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO kv (key, value, expires_at) VALUES (?, ?, ?)",
+                [(key, value, expires_at) for key, value in items.items()]
+            )
+            self._writes += len(items)
+            if self._writes >= self.PURGE_INTERVAL:
+                self._writes = 0
+                self._conn.execute(
+                    "DELETE FROM kv WHERE expires_at IS NOT NULL AND expires_at <= ?",
+                    (time.time(),)
+                )
+            self._conn.commit()
+
+    def delete(self, key: str):
+        with self._lock:
+            self._conn.execute("DELETE FROM kv WHERE key = ?", (key,))
+            self._conn.commit()
+
+    def touch(self, key: str, ttl: float):
+        with self._lock:
+            self._conn.execute(
+                "UPDATE kv SET expires_at = ? WHERE key = ? AND (expires_at IS NULL OR expires_at > ?)",
+                (time.time() + ttl, key, time.time())
+            )
+            self._conn.commit()
+
+
+class RedisError(Exception):
+    """Error reply returned by a Redis-protocol server."""
+
+
+class RedisBackend(StateBackend):
+    """Backend for any server speaking the Redis (RESP2) protocol.
+
+    Keeps one connection per thread and pipelines batched operations so that
+    get_many/put_many cost a single round trip.
+    """
+
+    def __init__(self, host: str = "localhost", port: int = 6379, db: int = 0,
+                 password: str = None, prefix: str = "matchplay:", timeout: float = 5.0):
+        self.host = host
+        self.port = port
+        self.db = db
+        self.password = password
+        self.prefix = prefix
+        self.timeout = timeout
+        self._local = threading.local()
+
+    def get_many(self, keys: list) -> dict:
+        keys = list(dict.fromkeys(keys))
+        if not keys:
+            return {}
+        values = self._execute([["MGET", *(self.prefix + key for key in keys)]])[0]
+        return {key: value for key, value in zip(keys, values) if value is not None}
+
+    def put_many(self, items: dict, ttl: float = None):
+        if not items:
+            return
+        commands = []
+        for key, value in items.items():
+            command = ["SET", self.prefix + key, value]
+            if ttl:
+                command += ["PX", int(ttl * 1000)]
+            commands.append(command)
+        self._execute(commands)
+
+    def delete(self, key: str):
+        self._execute([["DEL", self.prefix + key]])
+
+    def touch(self, key: str, ttl: float):
+        self._execute([["PEXPIRE", self.prefix + key, int(ttl * 1000)]])
+
+    def _connect(self):
+        sock = socket.create_connection((self.host, self.port), timeout=self.timeout)
+        sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        self._local.sock = sock
+        self._local.reader = sock.makefile("rb")
+        setup = []
+        if self.password:
+            setup.append(["AUTH", self.password])
+        if self.db:
+            setup.append(["SELECT", self.db])
+        if setup:
+            self._send_and_read(setup)
+
+    def _close(self):
+        sock = getattr(self._local, "sock", None)
+        if sock is not None:
+            try:
+                sock.close()
+            except OSError:
+                pass
+        self._local.sock = None
+
+    def _execute(self, commands: list) -> list:
+        """Send pipelined commands and return their replies in order."""
+        for attempt in range(2):
+            if getattr(self._local, "sock", None) is None:
+                self._connect()
+            try:
+                return self._send_and_read(commands)
+            except (OSError, ConnectionError):
+                # Stale pooled connection - reconnect once
+                self._close()
+                if attempt:
+                    raise
+
+    def _send_and_read(self, commands: list) -> list:
+        self._local.sock.sendall(b"".join(_encode_command(c) for c in commands))
+        replies = [_read_reply(self._local.reader) for _ in commands]
+        for reply in replies:
+            if isinstance(reply, RedisError):
+                raise reply
+        return replies
+
+
+def _encode_command(args: list) -> bytes:
+    parts = [b"*%d\r\n" % len(args)]
+    for arg in args:
+        if isinstance(arg, bytes):
+            data = arg
+        else:
+            data = str(arg).encode("utf-8")
+        parts.append(b"$%d\r\n%s\r\n" % (len(data), data))
+    return b"".join(parts)
+
+
+def _read_reply(reader):
+    line = reader.readline()
+    if not line:
+        raise ConnectionError("Connection closed by server")
+    kind, payload = line[:1], line[1:-2]
+    if kind == b"+":
+        return payload.decode("utf-8")
+    if kind == b"-":
+        return RedisError(payload.decode("utf-8"))
+    if kind == b":":
+        return int(payload)
+    if kind == b"$":
+        length = int(payload)
+        if length < 0:
+            return None
+        data = reader.read(length + 2)
+        return data[:-2]
+    if kind == b"*":
+        count = int(payload)
+        if count < 0:
+            return None
+        return [_read_reply(reader) for _ in range(count)]
+    raise RedisError(f"Unexpected reply: {line!r}")
+
+
+def create_backend(url: str) -> StateBackend:
+    """Create a backend from a ``sqlite://`` or ``redis://`` URL."""
+    parsed = urlparse(url)
+    if parsed.scheme == "sqlite":
+        return SQLiteBackend(parsed.path or get_data_dir() / "state.db")
+    if parsed.scheme == "redis":
+        db = int(parsed.path.lstrip("/") or 0)
+        return RedisBackend(
+            host=parsed.hostname or "localhost",
+            port=parsed.port or 6379,
+            db=db,
+            password=parsed.password
+        )
+    raise ValueError(f"Unsupported state backend URL: {url}")
+
+
+_backend = None
+_backend_lock = threading.Lock()
+
+
+def get_backend() -> StateBackend:
+    """Return the process-wide backend configured by ``STATE_BACKEND_URL``."""
+    global _backend
+    with _backend_lock:
+        if _backend is None:
+            url = get_setting("STATE_BACKEND_URL") or f"sqlite://{get_data_dir() / 'state.db'}"
+            _backend = create_backend(url)
+        return _backend